@@ -1,11 +1,10 @@
 """TRV Regulator integration."""
 import asyncio
 import logging
-import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import HomeAssistant, callback
 import homeassistant.helpers.config_validation as cv
 
 from .const import (
@@ -17,14 +16,50 @@ from .const import (
     DEFAULT_MAX_VALID_OVERSHOOT,
     DEFAULT_COOLDOWN_DURATION,
     DEFAULT_RECOVERY_THRESHOLD,
+    DEFAULT_COMMAND_RATE_LIMIT,
+    DEFAULT_RESTART_RESET_WINDOW,
+    DEFAULT_TEMPERATURE_FILTER,
+    DEFAULT_WINDOW_DETECTION,
+    DEFAULT_TEMPERATURE_SOURCE_TIMEOUT,
+    DEFAULT_TRV_TEMPERATURE_FALLBACK,
+    DEFAULT_CONTROL_MODE,
+    DEFAULT_PWM_PERIOD,
+    DEFAULT_MIN_OFF_TIME,
+    DEFAULT_MAX_CYCLES_PER_HOUR,
+    DEFAULT_HYSTERESIS_AUTO_TUNE,
+    DEFAULT_LEARNING_PRIOR,
+    DEFAULT_FILTER_MEASUREMENT_NOISE,
+    DEFAULT_FILTER_PROCESS_NOISE,
+    DATA_COMMAND_SCHEDULER,
+    DATA_DEMAND_AGGREGATOR,
+    DATA_SUBSCRIPTION_HUB,
+    DATA_LEARNED_PARAMS_STORE,
+    DATA_RUNTIME_STATE_STORE,
+    DATA_ROOM_INDEX,
     TARGET_DEBOUNCE_DELAY,
-    TRV_OFF,
 )
+from .command_scheduler import TrvCommandScheduler
 from .coordinator import TrvRegulatorCoordinator
+from .demand import HeatDemandAggregator
+from .hub import EntitySubscriptionHub
 from .room_controller import RoomController
+from .services import RoomIndex, async_setup_services
+from .storage import LearnedParamsStore, RuntimeStateStore
 
 _LOGGER = logging.getLogger(__name__)
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: dict) -> bool:
+    """Nastavení domény - sdílené úložiště, index místností a služby (jednou)."""
+    hass.data.setdefault(DOMAIN, {})
+    hass.data[DOMAIN][DATA_LEARNED_PARAMS_STORE] = LearnedParamsStore(hass)
+    hass.data[DOMAIN][DATA_RUNTIME_STATE_STORE] = RuntimeStateStore(hass)
+    hass.data[DOMAIN][DATA_ROOM_INDEX] = RoomIndex(hass)
+    async_setup_services(hass)
+    return True
+
 
 async def _wait_for_entities(hass, entry, max_wait=60):
     """Počká až budou dostupné všechny potřebné entity."""
@@ -118,23 +153,78 @@ async def async_migrate_entry(hass, config_entry: ConfigEntry) -> bool:
     return True
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Nastavení po přidání přes UI."""
-    # Počkat až budou dostupné všechny entity
-    await _wait_for_entities(hass, entry)
-    
-    # Vytvoř RoomController z config entry
-    trv_entities_data = entry.data.get("trv_entities", [])
-    
-    # Normalize trv_entities - může být list[str] nebo list[dict]
+def _get_config_value(entry: ConfigEntry, key, default):
+    """Hodnota z options nebo data (with backward compatibility for vent_delay)."""
+    value = entry.options.get(key, entry.data.get(key))
+    # Backward compatibility: if window_open_delay not found, try vent_delay
+    if value is None and key == "window_open_delay":
+        value = entry.options.get("vent_delay", entry.data.get("vent_delay"))
+    return value if value is not None else default
+
+
+def _trv_entities(entry: ConfigEntry) -> list[dict]:
+    """TRV z config entry - normalize trv_entities (může být list[str] nebo list[dict])."""
     trv_entities = []
-    for trv in trv_entities_data:
+    for trv in entry.data.get("trv_entities", []):
         if isinstance(trv, dict):
             # Již ve formátu dict
             trv_entities.append(trv)
         else:
             # String formát - konvertovat na dict
             trv_entities.append({"entity": trv, "enabled": True})
+    return trv_entities
+
+
+def _live_options(entry: ConfigEntry) -> dict:
+    """Parametry, které RoomController umí převzít za běhu (async_apply_options)."""
+    def get_config_value(key, default):
+        return _get_config_value(entry, key, default)
+
+    return {
+        "trv_entities": _trv_entities(entry),
+        "hysteresis": get_config_value("hysteresis", 0.3),
+        "window_open_delay": get_config_value("window_open_delay", 120),
+        "learning_cycles_required": get_config_value("learning_cycles_required", DEFAULT_LEARNING_CYCLES),
+        "desired_overshoot": get_config_value("desired_overshoot", DEFAULT_DESIRED_OVERSHOOT),
+        "min_heating_duration": get_config_value("min_heating_duration", DEFAULT_MIN_HEATING_DURATION),
+        "max_heating_duration": get_config_value("max_heating_duration", DEFAULT_MAX_HEATING_DURATION),
+        "max_valid_overshoot": get_config_value("max_valid_overshoot", DEFAULT_MAX_VALID_OVERSHOOT),
+        "cooldown_duration": get_config_value("cooldown_duration", DEFAULT_COOLDOWN_DURATION),
+        "recovery_threshold": get_config_value("recovery_threshold", DEFAULT_RECOVERY_THRESHOLD),
+        "control_mode": get_config_value("control_mode", DEFAULT_CONTROL_MODE),
+        "pwm_period": get_config_value("pwm_period", DEFAULT_PWM_PERIOD),
+        "min_off_time": get_config_value("min_off_time", DEFAULT_MIN_OFF_TIME),
+        "max_cycles_per_hour": get_config_value("max_cycles_per_hour", DEFAULT_MAX_CYCLES_PER_HOUR),
+        "hysteresis_auto_tune": get_config_value("hysteresis_auto_tune", DEFAULT_HYSTERESIS_AUTO_TUNE),
+        "learning_prior": get_config_value("learning_prior", DEFAULT_LEARNING_PRIOR),
+    }
+
+
+def _structural_options(entry: ConfigEntry) -> dict:
+    """Parametry, jejichž změna vyžaduje reload entry (odběry entit, filtr, fúze)."""
+    return {
+        key: entry.options.get(key, entry.data.get(key))
+        for key in (
+            "window_entities",
+            "temperature_sources",
+            "temperature_weights",
+            "temperature_source_timeout",
+            "trv_temperature_fallback",
+            "temperature_filter",
+            "filter_measurement_noise",
+            "filter_process_noise",
+            "window_detection",
+        )
+    }
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Nastavení po přidání přes UI."""
+    # Počkat až budou dostupné všechny entity
+    await _wait_for_entities(hass, entry)
+    
+    # Vytvoř RoomController z config entry
+    trv_entities_data = entry.data.get("trv_entities", [])
 
     # Merge window_entities and door_entities (for backward compatibility)
     # Prefer options if exists, otherwise use data
@@ -142,49 +232,81 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     door_entities = entry.data.get("door_entities", [])
     all_window_entities = list(window_entities) + list(door_entities)
 
-    # Helper function to read from options or data (with backward compatibility for vent_delay)
     def get_config_value(key, default):
-        value = entry.options.get(key, entry.data.get(key))
-        # Backward compatibility: if window_open_delay not found, try vent_delay
-        if value is None and key == "window_open_delay":
-            value = entry.options.get("vent_delay", entry.data.get("vent_delay"))
-        return value if value is not None else default
+        return _get_config_value(entry, key, default)
+
+    # Centrální fronta příkazů - jedna pro celou doménu
+    hass.data.setdefault(DOMAIN, {})
+    command_scheduler = hass.data[DOMAIN].get(DATA_COMMAND_SCHEDULER)
+    if command_scheduler is None:
+        command_scheduler = TrvCommandScheduler(hass)
+        hass.data[DOMAIN][DATA_COMMAND_SCHEDULER] = command_scheduler
+    command_scheduler.register_room(
+        entry.data["room_name"],
+        get_config_value("command_rate_limit", DEFAULT_COMMAND_RATE_LIMIT),
+    )
+
+    # Sdílené odběry změn entit - jeden HA listener na entitu pro celou doménu
+    subscription_hub = hass.data[DOMAIN].get(DATA_SUBSCRIPTION_HUB)
+    if subscription_hub is None:
+        subscription_hub = EntitySubscriptionHub(hass)
+        hass.data[DOMAIN][DATA_SUBSCRIPTION_HUB] = subscription_hub
+
+    # Teplotní zdroje: primární senzor + volitelné další (váhy z options, výchozí 1.0)
+    temperature_weights = get_config_value("temperature_weights", {})
+    extra_temperature_entities = get_config_value("temperature_sources", [])
+    temperature_sources = [
+        {"entity": entity_id, "weight": temperature_weights.get(entity_id, 1.0)}
+        for entity_id in [entry.data["temperature_entity"], *extra_temperature_entities]
+    ]
 
     room = RoomController(
         hass,
         room_name=entry.data["room_name"],
         temperature_entity=entry.data["temperature_entity"],
         target_entity=entry.data["target_entity"],
-        trv_entities=trv_entities,
         window_entities=all_window_entities,
-        hysteresis=get_config_value("hysteresis", 0.3),
-        window_open_delay=get_config_value("window_open_delay", 120),
-        learning_cycles_required=get_config_value("learning_cycles_required", DEFAULT_LEARNING_CYCLES),
-        desired_overshoot=get_config_value("desired_overshoot", DEFAULT_DESIRED_OVERSHOOT),
-        min_heating_duration=get_config_value("min_heating_duration", DEFAULT_MIN_HEATING_DURATION),
-        max_heating_duration=get_config_value("max_heating_duration", DEFAULT_MAX_HEATING_DURATION),
-        max_valid_overshoot=get_config_value("max_valid_overshoot", DEFAULT_MAX_VALID_OVERSHOOT),
-        cooldown_duration=get_config_value("cooldown_duration", DEFAULT_COOLDOWN_DURATION),
-        recovery_threshold=get_config_value("recovery_threshold", DEFAULT_RECOVERY_THRESHOLD),
+        command_scheduler=command_scheduler,
+        subscription_hub=subscription_hub,
+        learned_params_store=hass.data[DOMAIN][DATA_LEARNED_PARAMS_STORE],
+        runtime_state_store=hass.data[DOMAIN][DATA_RUNTIME_STATE_STORE],
+        room_index=hass.data[DOMAIN][DATA_ROOM_INDEX],
+        temperature_filter=get_config_value("temperature_filter", DEFAULT_TEMPERATURE_FILTER),
+        filter_measurement_noise=get_config_value("filter_measurement_noise", DEFAULT_FILTER_MEASUREMENT_NOISE),
+        filter_process_noise=get_config_value("filter_process_noise", DEFAULT_FILTER_PROCESS_NOISE),
+        window_detection=get_config_value("window_detection", DEFAULT_WINDOW_DETECTION),
+        temperature_sources=temperature_sources,
+        temperature_source_timeout=get_config_value(
+            "temperature_source_timeout", DEFAULT_TEMPERATURE_SOURCE_TIMEOUT
+        ),
+        trv_temperature_fallback=get_config_value(
+            "trv_temperature_fallback", DEFAULT_TRV_TEMPERATURE_FALLBACK
+        ),
+        **_live_options(entry),
     )
 
     # Načíst naučené parametry asynchronně
     await room._load_learned_params()
 
-    # ✅ BEZPEČNOSTNÍ RESET PO RESTARTU
-    _LOGGER.info(
-        f"TRV [{room._room_name}]: "
-        "Post-restart safety: Resetting to safe state (all TRVs OFF)"
-    )
-    await room._set_all_trv(TRV_OFF)
-    
-    # Zrušit případný rozpracovaný cyklus
-    room.reset_cycle_state()
-    
-    _LOGGER.debug(
-        f"TRV [{room._room_name}]: "
-        "Post-restart: Cleared any in-progress heating cycle"
-    )
+    # Warm restart - čerstvý snapshot stavu obnoví rozpracovaný cyklus
+    if not await room.async_restore_runtime_state():
+        # ✅ BEZPEČNOSTNÍ RESET PO RESTARTU (zastaralý nebo neznámý stav)
+        # Běží na pozadí: TRV už v OFF se přeskočí, ostatní se rozloží do okna
+        entry.async_create_background_task(
+            hass,
+            room.async_post_restart_reset(
+                get_config_value("restart_reset_window", DEFAULT_RESTART_RESET_WINDOW)
+            ),
+            f"trv_regulator post-restart reset {room._room_name}",
+        )
+        
+        # Zrušit případný rozpracovaný cyklus
+        room.reset_cycle_state()
+        
+        _LOGGER.debug(
+            f"TRV [{room._room_name}]: "
+            "Post-restart: Cleared any in-progress heating cycle"
+        )
 
     # Vytvoř coordinator
     coordinator = TrvRegulatorCoordinator(hass, room)
@@ -192,6 +314,18 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Set refresh callback to avoid circular import
     room.set_refresh_callback(coordinator.async_request_refresh)
 
+    # Spustit watchdog a listenery controlleru, zastavit při unloadu
+    room.async_start()
+    entry.async_on_unload(room.async_stop)
+
+    # Uložit stav stavového automatu při vypínání HA (warm restart)
+    async def _async_save_on_stop(event):
+        await room.async_save_runtime_state()
+
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_save_on_stop)
+    )
+
     # Track změny relevantních entit
     # Target entity má debounce přímo v room_controller
     # Extrahovat entity IDs z trv_entities (může být list[str] nebo list[dict])
@@ -204,17 +338,21 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     tracked_entities = [
         entry.data["temperature_entity"],
+        *extra_temperature_entities,
         entry.data["target_entity"],
         *trv_entity_ids,
         *all_window_entities,
     ]
 
-    async def _entity_listener(event):
-        """Listener pro změny entit."""
+    @callback
+    def _entity_changed(change):
+        """Změna závislé entity (přes sdílený hub)."""
         # Pro target_entity nechat room_controller zpracovat debounce
-        await coordinator.async_request_refresh()
+        hass.async_create_task(coordinator.async_request_refresh())
 
-    async_track_state_change_event(hass, tracked_entities, _entity_listener)
+    entry.async_on_unload(
+        subscription_hub.async_subscribe(tracked_entities, _entity_changed)
+    )
 
     # První update
     await coordinator.async_refresh()
@@ -223,67 +361,88 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
-    # Forward setup pro sensor platform
-    await hass.config_entries.async_forward_entry_setups(entry, ["sensor", "binary_sensor"])
+    # Poptávka tepla celého domu - jeden agregátor pro doménu, push z coordinatoru
+    demand_aggregator = hass.data[DOMAIN].get(DATA_DEMAND_AGGREGATOR)
+    if demand_aggregator is None:
+        demand_aggregator = HeatDemandAggregator(hass)
+        hass.data[DOMAIN][DATA_DEMAND_AGGREGATOR] = demand_aggregator
+    demand_aggregator.register_room(entry.entry_id, room)
+    entry.async_on_unload(
+        coordinator.async_add_listener(demand_aggregator.async_schedule_update)
+    )
 
-    # Registrovat service pro reset naučených parametrů
-    async def handle_reset_learned_params(call):
-        """Handle reset learned parameters service."""
-        entity_id = call.data.get("entity_id")
-        room_name = call.data.get("room")
-        
-        # Najít správnou místnost
-        if entity_id:
-            # Extrahovat room_name z entity_id
-            # Formát: climate.trv_regulator_{room_name}
-            room_name = entity_id.split(".")[-1].replace("trv_regulator_", "")
-        
-        if not room_name:
-            _LOGGER.error("reset_learned_params: room or entity_id required")
-            return
-        
-        # Najít room_controller
-        domain_data = hass.data.get(DOMAIN, {})
-        room = None
-        
-        for key, value in domain_data.items():
-            try:
-                # Coordinator má atribut _room, který je RoomController
-                if hasattr(value, "_room") and value._room._room_name == room_name:
-                    room = value._room
-                    break
-            except (AttributeError, TypeError):
-                # Skip entries that don't match expected structure
-                continue
-        
-        if not room:
-            _LOGGER.error(f"reset_learned_params: room '{room_name}' not found")
+    # Index místností pro služby domény
+    hass.data[DOMAIN][DATA_ROOM_INDEX].register(entry.entry_id, room)
+
+    # Změny options se aplikují za běhu, reload jen při strukturální změně
+    structural_options = _structural_options(entry)
+
+    async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry):
+        """Options flow uložil změny."""
+        if _structural_options(entry) != structural_options:
+            _LOGGER.info(
+                f"TRV [{room._room_name}]: Entity/filter options changed, reloading entry"
+            )
+            await hass.config_entries.async_reload(entry.entry_id)
             return
         
-        # Resetovat parametry
-        await room.reset_learned_params()
-        
-        _LOGGER.info(f"TRV [{room_name}]: Learned parameters manually reset via service")
-    
-    hass.services.async_register(
-        DOMAIN,
-        "reset_learned_params",
-        handle_reset_learned_params,
-        schema=vol.Schema({
-            vol.Optional("entity_id"): cv.entity_id,
-            vol.Optional("room"): cv.string,
-        })
-    )
+        command_scheduler.register_room(
+            room._room_name,
+            _get_config_value(entry, "command_rate_limit", DEFAULT_COMMAND_RATE_LIMIT),
+        )
+        await room.async_apply_options(**_live_options(entry))
+        # TRV / last_seen / ventily se mohly změnit - přeindexovat entity místnosti
+        hass.data[DOMAIN][DATA_ROOM_INDEX].register(entry.entry_id, room)
+        await coordinator.async_request_refresh()
+
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
+
+    # Forward setup pro sensor platform
+    await hass.config_entries.async_forward_entry_setups(entry, ["sensor", "binary_sensor"])
 
     return True
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Odebrání místnosti - smazat její naučené parametry a běhový stav.
+
+    Záloha (`snapshot_learned_params`) se nemění - slouží právě k obnově.
+    """
+    room_name = entry.data["room_name"]
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    stores = (
+        domain_data.setdefault(DATA_LEARNED_PARAMS_STORE, LearnedParamsStore(hass)),
+        domain_data.setdefault(DATA_RUNTIME_STATE_STORE, RuntimeStateStore(hass)),
+    )
+    for store in stores:
+        await store.async_remove_room(room_name)
+    
+    _LOGGER.info(f"TRV [{room_name}]: Entry removed, learned params and runtime state deleted")
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Odinstalace integrace."""
     # Unload sensor and binary_sensor platforms
     unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor", "binary_sensor"])
     
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        
+        # Reload/odebrání - rozpracovaný cyklus lze převzít při dalším setupu
+        await coordinator.room.async_save_runtime_state()
+        
+        # TRV řízené ventilem drží ON setpoint - bez controlleru zavřít ventil
+        # (při reloadu ho warm restart / watchdog znovu otevře)
+        await coordinator.room.async_close_valves()
+        
+        command_scheduler = hass.data[DOMAIN].get(DATA_COMMAND_SCHEDULER)
+        if command_scheduler is not None:
+            command_scheduler.unregister_room(coordinator.room._room_name)
+        
+        demand_aggregator = hass.data[DOMAIN].get(DATA_DEMAND_AGGREGATOR)
+        if demand_aggregator is not None:
+            demand_aggregator.unregister_room(entry.entry_id)
+        
+        hass.data[DOMAIN][DATA_ROOM_INDEX].unregister(entry.entry_id)
     
     return unload_ok
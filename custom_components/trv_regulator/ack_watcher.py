@@ -0,0 +1,146 @@
+"""Měření latence potvrzení příkazů od TRV (setpoint nebo last_seen)."""
+import asyncio
+import time
+from typing import Optional
+
+from homeassistant.core import callback
+
+from .const import TRV_TEMP_TOLERANCE
+from .hub import EntityChange, EntitySubscriptionHub
+
+
+class TrvAckWatcher:
+    """Sleduje kdy TRV potvrdí příkaz.
+
+    Potvrzení = TRV nahlásí změnu setpointu na očekávanou hodnotu, nebo
+    (po odeslání příkazu) jakoukoliv aktualizaci stavu / změnu `last_seen`.
+    Latence se počítá od okamžiku kdy byl příkaz odeslán (`mark_sent`,
+    volá fronta těsně před service callem).
+    TRV je "usazená" (lze ji verifikovat) jakmile se změní `last_seen`,
+    u hlavic bez last_seen senzoru jakmile potvrdí setpoint.
+    Hlavice, která už při odeslání hlásí očekávaný setpoint, žádnou změnu
+    stavu nepošle - bez last_seen senzoru je usazená hned (bez vzorku
+    latence i bez timeoutu).
+    """
+
+    def __init__(
+        self,
+        hub: EntitySubscriptionHub,
+        expected: dict[str, float],
+        last_seen_sensors: dict[str, str],
+    ):
+        """Inicializace (expected = entity_id → očekávaný setpoint)."""
+        self._hub = hub
+        self._expected = expected
+        self._sensor_to_trv = {
+            sensor: entity_id
+            for entity_id, sensor in last_seen_sensors.items()
+            if sensor and entity_id in expected
+        }
+        self._sent_at: dict[str, float] = {}
+        self._acked_at: dict[str, float] = {}
+        self._last_seen_changed: set[str] = set()
+        self._current_temp: dict[str, Optional[float]] = {}
+        self._already_matching: set[str] = set()
+        self._changed = asyncio.Event()
+        self._unsub = None
+
+    def start(self):
+        """Začít poslouchat změny stavu TRV a last_seen senzorů."""
+        entities = list(self._expected) + list(self._sensor_to_trv)
+        self._unsub = self._hub.async_subscribe(entities, self._async_state_listener)
+        # Výchozí setpointy - další změny dorazí přes listener
+        for entity_id in self._expected:
+            state = self._hub.get_state(entity_id)
+            self._current_temp[entity_id] = (
+                state.attributes.get("temperature") if state is not None else None
+            )
+
+    def stop(self):
+        """Přestat poslouchat."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    def mark_sent(self, entity_id: str):
+        """Příkaz pro TRV byl právě odeslán."""
+        self._sent_at[entity_id] = time.monotonic()
+        if self._matches(entity_id, self._current_temp.get(entity_id)):
+            self._already_matching.add(entity_id)
+            self._changed.set()
+
+    def is_acked(self, entity_id: str) -> bool:
+        """Zda TRV příkaz potvrdila."""
+        return entity_id in self._acked_at
+
+    def is_settled(self, entity_id: str) -> bool:
+        """Zda má smysl TRV verifikovat (odpověď dorazila)."""
+        if entity_id in self._sensor_to_trv.values():
+            return entity_id in self._last_seen_changed
+        return entity_id in self._acked_at or entity_id in self._already_matching
+
+    async def async_wait(self, deadlines: dict[str, float]):
+        """Počkat až se všechny TRV usadí nebo vyprší jejich deadline.
+
+        deadlines = entity_id → timeout v sekundách od `mark_sent`.
+        """
+        while True:
+            now = time.monotonic()
+            remaining = [
+                self._sent_at.get(entity_id, now) + timeout - now
+                for entity_id, timeout in deadlines.items()
+                if not self.is_settled(entity_id)
+            ]
+            remaining = [r for r in remaining if r > 0]
+            if not remaining:
+                return
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), min(remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    def latency(self, entity_id: str) -> Optional[float]:
+        """Latence potvrzení v sekundách (None pokud nepotvrzeno)."""
+        acked_at = self._acked_at.get(entity_id)
+        sent_at = self._sent_at.get(entity_id)
+        if acked_at is None or sent_at is None:
+            return None
+        return max(0.0, acked_at - sent_at)
+
+    def _matches(self, entity_id: str, actual_temp: Optional[float]) -> bool:
+        """Zda setpoint odpovídá očekávanému."""
+        return (
+            actual_temp is not None
+            and abs(actual_temp - self._expected[entity_id]) <= TRV_TEMP_TOLERANCE
+        )
+
+    @callback
+    def _async_state_listener(self, change: EntityChange):
+        """Zpracovat změnu stavu TRV nebo last_seen senzoru."""
+        entity_id = change.entity_id
+        new_state = change.new_state
+        old_state = change.old_state
+        if not change.available:
+            return
+
+        if entity_id in self._sensor_to_trv:
+            trv_entity = self._sensor_to_trv[entity_id]
+            if old_state is not None and old_state.state == new_state.state:
+                return
+            # Stejně jako verifikace: změna last_seen po zahájení příkazu = odpověď
+            self._last_seen_changed.add(trv_entity)
+            if trv_entity in self._sent_at:
+                self._acked_at.setdefault(trv_entity, time.monotonic())
+            self._changed.set()
+            return
+
+        actual_temp = new_state.attributes.get("temperature")
+        self._current_temp[entity_id] = actual_temp
+        if entity_id in self._acked_at or entity_id not in self._sent_at:
+            return
+
+        if self._matches(entity_id, actual_temp):
+            self._acked_at[entity_id] = time.monotonic()
+            self._changed.set()
@@ -10,7 +10,12 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    DATA_DEMAND_AGGREGATOR,
+    CALL_FOR_HEAT_MIN_RUN,
+    CALL_FOR_HEAT_MIN_OFF,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,6 +34,11 @@ async def async_setup_entry(
     ]
     
     async_add_entities(sensors)
+    
+    # Call-for-heat pro kotel/TČ - jen jednou pro celou integraci
+    if "call_for_heat_sensor_created" not in hass.data[DOMAIN]:
+        async_add_entities([TrvCallForHeatSensor(hass.data[DOMAIN][DATA_DEMAND_AGGREGATOR])])
+        hass.data[DOMAIN]["call_for_heat_sensor_created"] = True
 
 
 class TrvCommunicationProblemSensor(CoordinatorEntity, BinarySensorEntity):
@@ -90,3 +100,55 @@ class TrvCommunicationProblemSensor(CoordinatorEntity, BinarySensorEntity):
             "total_problem_trvs": len(problem_trvs),
             "total_failures_24h": room._reliability_tracker.get_failed_commands_24h() if hasattr(room._reliability_tracker, 'get_failed_commands_24h') else 0,
         }
+
+
+class TrvCallForHeatSensor(BinarySensorEntity):
+    """Call-for-heat celého domu s min. dobou běhu a pauzy.
+
+    Ve výchozím stavu vypnutá entita - zapnout v registru entit, pokud
+    ji má používat automatizace kotle.
+    """
+
+    def __init__(self, aggregator):
+        """Inicializace binary sensoru."""
+        self._aggregator = aggregator
+        self._attr_unique_id = f"{DOMAIN}_call_for_heat"
+        self._attr_name = "TRV Regulator Call For Heat"
+        self._attr_device_class = BinarySensorDeviceClass.HEAT
+        self._attr_icon = "mdi:water-boiler"
+        self._attr_should_poll = False
+        self._attr_entity_registry_enabled_default = False
+        self._attr_has_entity_name = True
+
+    @property
+    def device_info(self):
+        """Informace o zařízení (sdílí summary zařízení)."""
+        return {
+            "identifiers": {(DOMAIN, "summary")},
+            "name": "TRV Regulator Summary",
+            "manufacturer": "Custom",
+            "model": "TRV Regulator Summary",
+            "via_device": None,
+        }
+
+    async def async_added_to_hass(self):
+        """Přihlásit se k aktualizacím agregátoru."""
+        self.async_on_remove(self._aggregator.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def is_on(self):
+        """ON = kotel/TČ má topit."""
+        return self._aggregator.call_for_heat
+
+    @property
+    def extra_state_attributes(self):
+        """Poptávka a ochrana kotle."""
+        stats = self._aggregator.get_stats()
+        return {
+            "demand": stats["demand"],
+            "rooms_heating": stats["rooms_heating"],
+            "held_until": stats["call_for_heat_held_until"],
+            "burns": stats["burns"],
+            "min_run": CALL_FOR_HEAT_MIN_RUN,
+            "min_off": CALL_FOR_HEAT_MIN_OFF,
+        }
@@ -0,0 +1,333 @@
+"""Centrální fronta příkazů pro TRV s limitem vysílacího času (airtime)."""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from .const import (
+    COMMAND_PRIORITY_SAFETY,
+    COMMAND_PRIORITY_HEATING,
+    COMMAND_PRIORITY_WATCHDOG,
+    COMMAND_WAIT_HISTORY,
+    DEFAULT_COMMAND_RATE_LIMIT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_NAMES = {
+    COMMAND_PRIORITY_SAFETY: "safety",
+    COMMAND_PRIORITY_HEATING: "heating",
+    COMMAND_PRIORITY_WATCHDOG: "watchdog",
+}
+
+
+class _PendingCommand:
+    """Příkaz čekající ve frontě.
+
+    hvac_mode=None = nastavení `number` entity (otevření ventilu) na `temperature`.
+    `on_dispatch` se zavolá těsně před prvním service callem (měření latence).
+    """
+
+    __slots__ = (
+        "entity_id", "hvac_mode", "temperature", "priority", "seq", "room",
+        "on_dispatch", "enqueued_at", "waiters",
+    )
+
+    def __init__(
+        self,
+        entity_id: str,
+        hvac_mode: Optional[str],
+        temperature: float,
+        priority: int,
+        seq: int,
+        room: Optional[str],
+        on_dispatch: Optional[Callable[[], None]] = None,
+    ):
+        self.entity_id = entity_id
+        self.hvac_mode = hvac_mode
+        self.temperature = temperature
+        self.priority = priority
+        self.seq = seq
+        self.room = room
+        self.on_dispatch = on_dispatch
+        self.enqueued_at = time.monotonic()
+        self.waiters: list[asyncio.Future] = []
+
+    @property
+    def cost(self) -> int:
+        """Počet service callů příkazu (climate = režim + teplota)."""
+        return 1 if self.hvac_mode is None else 2
+
+
+class _TokenBucket:
+    """Rozpočet service callů jedné místnosti (token bucket).
+
+    Kapacita odpovídá jednomu climate příkazu (2 cally), takže režim
+    a teplota jdou hned po sobě a rozpočet se doplňuje rychlostí `rate`.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float = 2.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: int, now: float) -> float:
+        """Za jak dlouho bude v rozpočtu `cost` callů (0 = hned)."""
+        self._refill(now)
+        missing = min(cost, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, cost: int, now: float):
+        """Odečíst cally z rozpočtu."""
+        self._refill(now)
+        self.tokens -= cost
+
+
+class TrvCommandScheduler:
+    """Fronta příkazů pro všechny TRV v domácnosti.
+
+    - Rozpočet service callů za sekundu per místnost (token bucket) -
+      agresivní místnost nebrzdí ostatní
+    - Priority: safety OFF > heating ON > watchdog korekce (mezi
+      místnostmi s volným rozpočtem)
+    - Latest-intent-wins: novější příkaz pro stejnou TRV nahradí čekající
+    """
+
+    def __init__(self, hass, rate_limit: float = DEFAULT_COMMAND_RATE_LIMIT):
+        """Inicializace scheduleru."""
+        self._hass = hass
+        self._default_rate_limit = rate_limit
+        # room_name → rozpočet (None = příkazy bez místnosti)
+        self._buckets: dict[Optional[str], _TokenBucket] = {}
+
+        self._pending: dict[str, _PendingCommand] = {}
+        self._heap: list[tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+        # Metriky
+        self._calls_total = 0
+        self._commands_total = 0
+        self._superseded_total = 0
+        self._max_queue_depth = 0
+        self._waits = deque(maxlen=COMMAND_WAIT_HISTORY)
+
+    def rate_limit(self, room_name: Optional[str]) -> float:
+        """Limit service callů za sekundu pro místnost."""
+        bucket = self._buckets.get(room_name)
+        return bucket.rate if bucket is not None else self._default_rate_limit
+
+    @property
+    def queue_depth(self) -> int:
+        """Počet TRV s čekajícím příkazem."""
+        return len(self._pending)
+
+    def register_room(self, room_name: str, rate_limit: float):
+        """Zaregistrovat místnost a její limit příkazů (změna limitu zachová rozpočet)."""
+        bucket = self._buckets.get(room_name)
+        if bucket is None:
+            self._buckets[room_name] = _TokenBucket(rate_limit)
+        else:
+            bucket._refill(time.monotonic())
+            bucket.rate = rate_limit
+
+    def unregister_room(self, room_name: str):
+        """Odregistrovat místnost (unload)."""
+        self._buckets.pop(room_name, None)
+
+    def _bucket(self, room_name: Optional[str]) -> _TokenBucket:
+        """Rozpočet místnosti (neznámá místnost dostane výchozí limit)."""
+        bucket = self._buckets.get(room_name)
+        if bucket is None:
+            bucket = self._buckets[room_name] = _TokenBucket(self._default_rate_limit)
+        return bucket
+
+    async def async_send(
+        self,
+        entity_id: str,
+        hvac_mode: str,
+        temperature: float,
+        priority: int = COMMAND_PRIORITY_HEATING,
+        room: Optional[str] = None,
+        on_dispatch: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """Zařadit příkaz do fronty a počkat na odeslání.
+
+        Vrací True pokud byl příkaz odeslán, False pokud byl nahrazen
+        novějším příkazem pro stejnou TRV (volající ho nemá verifikovat).
+        `on_dispatch` se zavolá těsně před service callem (ne při nahrazení).
+        """
+        return await self._async_enqueue(
+            entity_id, hvac_mode, temperature, priority, room, on_dispatch
+        )
+
+    async def async_send_number(
+        self,
+        entity_id: str,
+        value: float,
+        priority: int = COMMAND_PRIORITY_HEATING,
+        room: Optional[str] = None,
+    ) -> bool:
+        """Zařadit nastavení `number` entity (otevření ventilu TRV) do fronty."""
+        return await self._async_enqueue(entity_id, None, value, priority, room)
+
+    async def _async_enqueue(
+        self,
+        entity_id: str,
+        hvac_mode: Optional[str],
+        temperature: float,
+        priority: int,
+        room: Optional[str],
+        on_dispatch: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """Zařadit příkaz (latest-intent-wins per entita) a počkat na odeslání."""
+        future = self._hass.loop.create_future()
+
+        pending = self._pending.get(entity_id)
+        if pending is not None:
+            # Latest intent wins - starší čekající příkaz zahodit
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_result(False)
+            self._superseded_total += 1
+            _LOGGER.debug(
+                f"TRV scheduler: {entity_id} {PRIORITY_NAMES.get(pending.priority)} command "
+                f"({pending.temperature}°C) superseded by {PRIORITY_NAMES.get(priority)} "
+                f"({temperature}°C)"
+            )
+            enqueued_at = pending.enqueued_at
+        else:
+            enqueued_at = None
+
+        command = _PendingCommand(
+            entity_id, hvac_mode, temperature, priority, next(self._seq), room, on_dispatch
+        )
+        if enqueued_at is not None:
+            # Čekací doba se počítá od prvního záměru pro tuto TRV
+            command.enqueued_at = enqueued_at
+        command.waiters.append(future)
+
+        self._pending[entity_id] = command
+        heapq.heappush(self._heap, (priority, command.seq, entity_id))
+        self._max_queue_depth = max(self._max_queue_depth, len(self._pending))
+
+        self._wakeup.set()
+        self._ensure_worker()
+        return await future
+
+    def _ensure_worker(self):
+        """Spustit worker pokud neběží."""
+        if self._worker is None or self._worker.done():
+            self._worker = self._hass.async_create_background_task(
+                self._async_worker(), "trv_regulator command scheduler"
+            )
+
+    def _next_ready(self) -> tuple[Optional[_PendingCommand], float]:
+        """Nejprioritnější příkaz, jehož místnost má volný rozpočet.
+
+        Vrací (příkaz, 0) nebo (None, za kolik sekund se nejdřív uvolní rozpočet).
+        """
+        now = time.monotonic()
+        deferred = []
+        ready = None
+        min_wait = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            priority, seq, entity_id = entry
+            command = self._pending.get(entity_id)
+            if command is None or command.seq != seq:
+                # Zastaralý záznam (příkaz byl nahrazen)
+                continue
+            wait = self._bucket(command.room).wait_time(command.cost, now)
+            if wait <= 0:
+                ready = command
+                break
+            deferred.append(entry)
+            min_wait = wait if min_wait is None else min(min_wait, wait)
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return ready, min_wait or 0.0
+
+    async def _async_worker(self):
+        """Odbavovat frontu dokud není prázdná."""
+        while self._heap:
+            self._wakeup.clear()
+            command, wait = self._next_ready()
+            if command is None:
+                if not self._heap:
+                    break
+                # Počkat na rozpočet (nebo na nový příkaz jiné místnosti)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            entity_id = command.entity_id
+            del self._pending[entity_id]
+            now = time.monotonic()
+            self._bucket(command.room).consume(command.cost, now)
+            # Čekání včetně čekání na rozpočet místnosti
+            self._waits.append(now - command.enqueued_at)
+
+            try:
+                self._calls_total += command.cost
+                if command.on_dispatch is not None:
+                    command.on_dispatch()
+                if command.hvac_mode is None:
+                    await self._hass.services.async_call(
+                        "number",
+                        "set_value",
+                        {"entity_id": entity_id, "value": command.temperature},
+                        blocking=True,
+                    )
+                else:
+                    await self._hass.services.async_call(
+                        "climate",
+                        "set_hvac_mode",
+                        {"entity_id": entity_id, "hvac_mode": command.hvac_mode},
+                        blocking=True,
+                    )
+                    await self._hass.services.async_call(
+                        "climate",
+                        "set_temperature",
+                        {"entity_id": entity_id, "temperature": command.temperature},
+                        blocking=True,
+                    )
+            except Exception as err:
+                for waiter in command.waiters:
+                    if not waiter.done():
+                        waiter.set_exception(err)
+                continue
+
+            self._commands_total += 1
+            for waiter in command.waiters:
+                if not waiter.done():
+                    waiter.set_result(True)
+
+    def get_metrics(self) -> dict:
+        """Metriky fronty (hloubka, čekání, odeslané a nahrazené příkazy)."""
+        waits = list(self._waits)
+        return {
+            "rate_limits": {
+                room: bucket.rate for room, bucket in self._buckets.items() if room is not None
+            },
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self._max_queue_depth,
+            "commands_total": self._commands_total,
+            "service_calls_total": self._calls_total,
+            "superseded_total": self._superseded_total,
+            "avg_wait": round(sum(waits) / len(waits), 2) if waits else 0.0,
+            "max_wait": round(max(waits), 2) if waits else 0.0,
+        }
@@ -0,0 +1,137 @@
+"""Spolehlivost naučených parametrů - streamový průměr a rozptyl (Welford)."""
+import math
+from typing import Iterable, Optional
+
+from .const import (
+    LEARNING_CONFIDENCE_Z,
+    LEARNING_DURATION_CI,
+    LEARNING_OVERSHOOT_CI,
+)
+
+
+class RunningStats:
+    """Welfordův streamový průměr a rozptyl (numericky stabilní, O(1) na vzorek)."""
+
+    def __init__(self):
+        """Inicializace prázdných statistik."""
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float):
+        """Přidat vzorek."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> Optional[float]:
+        """Výběrový rozptyl (None pro méně než 2 vzorky)."""
+        if self.count < 2:
+            return None
+        return self._m2 / (self.count - 1)
+
+    @property
+    def half_width(self) -> Optional[float]:
+        """Polovina intervalu spolehlivosti průměru."""
+        variance = self.variance
+        if variance is None:
+            return None
+        return LEARNING_CONFIDENCE_Z * math.sqrt(variance / self.count)
+
+    def to_dict(self) -> dict:
+        """Serializace pro JSON úložiště."""
+        return {"count": self.count, "mean": self.mean, "m2": self._m2}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "RunningStats":
+        """Obnovit z úložiště."""
+        stats = cls()
+        if data:
+            stats.count = data.get("count", 0)
+            stats.mean = data.get("mean", 0.0)
+            stats._m2 = data.get("m2", 0.0)
+        return stats
+
+
+class LearningConfidence:
+    """Spolehlivost odhadu doby topení a překmitu z dosavadních cyklů.
+
+    Spolehlivost 1.0 = interval spolehlivosti průměrné doby topení je
+    v ±LEARNING_DURATION_CI (relativně) a překmitu v ±LEARNING_OVERSHOOT_CI.
+    Rozptýlené cykly ji snižují - hodnota je horší z obou poměrů.
+    """
+
+    def __init__(self):
+        """Inicializace bez cyklů."""
+        self.duration = RunningStats()
+        self.overshoot = RunningStats()
+
+    @classmethod
+    def from_cycles(cls, cycles: Iterable[dict]) -> "LearningConfidence":
+        """Spolehlivost z výčtu cyklů (performance history)."""
+        confidence = cls()
+        for cycle in cycles:
+            confidence.add(cycle["heating_duration"], cycle["overshoot"])
+        return confidence
+
+    @property
+    def cycles(self) -> int:
+        """Počet započtených cyklů."""
+        return self.duration.count
+
+    def add(self, heating_duration: float, overshoot: float):
+        """Započítat validní cyklus."""
+        self.duration.add(heating_duration)
+        self.overshoot.add(overshoot)
+
+    @property
+    def duration_ci(self) -> Optional[float]:
+        """Relativní interval spolehlivosti průměrné doby topení."""
+        half_width = self.duration.half_width
+        if half_width is None or self.duration.mean <= 0:
+            return None
+        return half_width / self.duration.mean
+
+    @property
+    def overshoot_ci(self) -> Optional[float]:
+        """Interval spolehlivosti průměrného překmitu (°C)."""
+        return self.overshoot.half_width
+
+    @property
+    def confidence(self) -> float:
+        """Spolehlivost 0-1 (1 = oba intervaly v cílových mezích)."""
+        duration_ci = self.duration_ci
+        overshoot_ci = self.overshoot_ci
+        if duration_ci is None or overshoot_ci is None:
+            return 0.0
+        ratios = [
+            LEARNING_DURATION_CI / duration_ci if duration_ci > 0 else 1.0,
+            LEARNING_OVERSHOOT_CI / overshoot_ci if overshoot_ci > 0 else 1.0,
+        ]
+        return min(1.0, *ratios)
+
+    def get_stats(self) -> dict:
+        """Stav pro senzory a diagnostiku."""
+        duration_ci = self.duration_ci
+        overshoot_ci = self.overshoot_ci
+        return {
+            "cycles": self.cycles,
+            "confidence": round(self.confidence * 100),
+            "duration_ci": round(duration_ci * 100, 1) if duration_ci is not None else None,
+            "overshoot_ci": round(overshoot_ci, 2) if overshoot_ci is not None else None,
+        }
+
+    def to_dict(self) -> dict:
+        """Serializace pro JSON úložiště."""
+        return {"duration": self.duration.to_dict(), "overshoot": self.overshoot.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "LearningConfidence":
+        """Obnovit z úložiště."""
+        confidence = cls()
+        if data:
+            confidence.duration = RunningStats.from_dict(data.get("duration"))
+            confidence.overshoot = RunningStats.from_dict(data.get("overshoot"))
+        return confidence
@@ -16,6 +16,22 @@ from .const import (
     DEFAULT_MAX_VALID_OVERSHOOT,
     DEFAULT_COOLDOWN_DURATION,
     DEFAULT_RECOVERY_THRESHOLD,
+    DEFAULT_COMMAND_RATE_LIMIT,
+    DEFAULT_RESTART_RESET_WINDOW,
+    TEMPERATURE_FILTERS,
+    DEFAULT_TEMPERATURE_FILTER,
+    DEFAULT_WINDOW_DETECTION,
+    DEFAULT_TEMPERATURE_SOURCE_TIMEOUT,
+    DEFAULT_TRV_TEMPERATURE_FALLBACK,
+    CONTROL_MODES,
+    DEFAULT_CONTROL_MODE,
+    DEFAULT_PWM_PERIOD,
+    DEFAULT_MIN_OFF_TIME,
+    DEFAULT_MAX_CYCLES_PER_HOUR,
+    DEFAULT_HYSTERESIS_AUTO_TUNE,
+    DEFAULT_LEARNING_PRIOR,
+    DEFAULT_FILTER_MEASUREMENT_NOISE,
+    DEFAULT_FILTER_PROCESS_NOISE,
 )
 
 
@@ -101,10 +117,12 @@ class TrvRegulatorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             
             for trv_id in trv_entities:
                 last_seen_sensor = user_input.get(f"last_seen_{trv_id}", "")
+                valve_entity = user_input.get(f"valve_{trv_id}", "")
                 trv_entities_with_last_seen.append({
                     "entity": trv_id,
                     "enabled": True,
-                    "last_seen_sensor": last_seen_sensor
+                    "last_seen_sensor": last_seen_sensor,
+                    "valve_entity": valve_entity,
                 })
             
             self._data["trv_entities"] = trv_entities_with_last_seen
@@ -129,6 +147,11 @@ class TrvRegulatorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     device_class="timestamp"
                 )
             )
+            
+            # Přidat optional selector pro polohu ventilu (number entita)
+            schema_dict[vol.Optional(f"valve_{trv_id}", description=f"{friendly_name} ({trv_id})")] = selector.EntitySelector(
+                selector.EntitySelectorConfig(domain="number")
+            )
         
         return self.async_show_form(
             step_id="last_seen",
@@ -180,6 +203,53 @@ class TrvRegulatorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     vol.Optional(
                         "recovery_threshold", default=DEFAULT_RECOVERY_THRESHOLD
                     ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=3.0)),
+                    vol.Optional(
+                        "command_rate_limit", default=DEFAULT_COMMAND_RATE_LIMIT
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=10.0)),
+                    vol.Optional(
+                        "restart_reset_window", default=DEFAULT_RESTART_RESET_WINDOW
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=600)),
+                    vol.Optional(
+                        "temperature_filter", default=DEFAULT_TEMPERATURE_FILTER
+                    ): vol.In(TEMPERATURE_FILTERS),
+                    vol.Optional(
+                        "filter_measurement_noise", default=DEFAULT_FILTER_MEASUREMENT_NOISE
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.01, max=1.0)),
+                    vol.Optional(
+                        "filter_process_noise", default=DEFAULT_FILTER_PROCESS_NOISE
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=10.0)),
+                    vol.Optional(
+                        "window_detection", default=DEFAULT_WINDOW_DETECTION
+                    ): bool,
+                    vol.Optional("temperature_sources", default=[]): selector.EntitySelector(
+                        selector.EntitySelectorConfig(
+                            domain="sensor", device_class="temperature", multiple=True
+                        )
+                    ),
+                    vol.Optional(
+                        "temperature_source_timeout", default=DEFAULT_TEMPERATURE_SOURCE_TIMEOUT
+                    ): vol.All(vol.Coerce(int), vol.Range(min=300, max=14400)),
+                    vol.Optional(
+                        "trv_temperature_fallback", default=DEFAULT_TRV_TEMPERATURE_FALLBACK
+                    ): bool,
+                    vol.Optional(
+                        "control_mode", default=DEFAULT_CONTROL_MODE
+                    ): vol.In(CONTROL_MODES),
+                    vol.Optional(
+                        "pwm_period", default=DEFAULT_PWM_PERIOD
+                    ): vol.All(vol.Coerce(int), vol.Range(min=600, max=7200)),
+                    vol.Optional(
+                        "min_off_time", default=DEFAULT_MIN_OFF_TIME
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                    vol.Optional(
+                        "max_cycles_per_hour", default=DEFAULT_MAX_CYCLES_PER_HOUR
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=12)),
+                    vol.Optional(
+                        "hysteresis_auto_tune", default=DEFAULT_HYSTERESIS_AUTO_TUNE
+                    ): bool,
+                    vol.Optional(
+                        "learning_prior", default=DEFAULT_LEARNING_PRIOR
+                    ): bool,
                 }
             ),
         )
@@ -213,38 +283,47 @@ class TrvRegulatorOptionsFlow(config_entries.OptionsFlow):
                     if isinstance(trv, dict):
                         entity_id = trv["entity"]
                         current_last_seen = trv.get("last_seen_sensor", "")
+                        current_valve = trv.get("valve_entity", "")
                     else:
                         entity_id = trv
                         current_last_seen = ""
+                        current_valve = ""
                     
-                    # Získat last_seen z user_input nebo zachovat současný
+                    # Získat last_seen / ventil z user_input nebo zachovat současný
                     last_seen_sensor = user_input.get(f"last_seen_{entity_id}", current_last_seen)
+                    valve_entity = user_input.get(f"valve_{entity_id}", current_valve)
                     
                     new_trv_entities.append({
                         "entity": entity_id,
                         "enabled": entity_id in enabled_trv_ids,
-                        "last_seen_sensor": last_seen_sensor
+                        "last_seen_sensor": last_seen_sensor,
+                        "valve_entity": valve_entity,
                     })
                 
                 # Aktualizovat config entry s novými daty
                 new_data = {**self.config_entry.data, "trv_entities": new_trv_entities}
                 
-                # Uložit options (bez trv_entities a last_seen_*, to je v data)
+                # Uložit options (bez trv_entities, last_seen_* a valve_*, to je v data)
                 new_options = {
                     k: v for k, v in user_input.items() 
-                    if k != "enabled_trv_entities" and not k.startswith("last_seen_")
+                    if k != "enabled_trv_entities"
+                    and not k.startswith("last_seen_")
+                    and not k.startswith("valve_")
+                    and not k.startswith("weight_")
+                }
+                
+                # Váhy teplotních zdrojů (weight_<entity_id> → dict)
+                new_options["temperature_weights"] = {
+                    k[len("weight_"):]: v for k, v in user_input.items() if k.startswith("weight_")
                 }
                 
                 self.hass.config_entries.async_update_entry(
                     self.config_entry,
                     data=new_data,
-                    options=new_options
                 )
                 
-                # Reload entry pro aplikaci změn
-                await self.hass.config_entries.async_reload(self.config_entry.entry_id)
-                
-                return self.async_create_entry(title="", data={})
+                # Options uloží HA, update listener je aplikuje za běhu (bez reloadu)
+                return self.async_create_entry(title="", data=new_options)
         
         # Načíst aktuální TRV
         trv_entities = self.config_entry.data.get("trv_entities", [])
@@ -293,9 +372,11 @@ class TrvRegulatorOptionsFlow(config_entries.OptionsFlow):
             if isinstance(trv, dict):
                 entity_id = trv["entity"]
                 current_last_seen = trv.get("last_seen_sensor", "")
+                current_valve = trv.get("valve_entity", "")
             else:
                 entity_id = trv
                 current_last_seen = ""
+                current_valve = ""
             
             # Získat friendly name
             state = self.hass.states.get(entity_id)
@@ -311,6 +392,14 @@ class TrvRegulatorOptionsFlow(config_entries.OptionsFlow):
                     device_class="timestamp"
                 )
             )
+            
+            schema_dict[vol.Optional(
+                f"valve_{entity_id}",
+                default=current_valve,
+                description=f"Poloha ventilu pro {friendly_name}"
+            )] = selector.EntitySelector(
+                selector.EntitySelectorConfig(domain="number")
+            )
         
         # Přidat ostatní konfigurace
         schema_dict.update({
@@ -358,7 +447,86 @@ class TrvRegulatorOptionsFlow(config_entries.OptionsFlow):
                 "recovery_threshold",
                 default=current_options.get("recovery_threshold", current_data.get("recovery_threshold", DEFAULT_RECOVERY_THRESHOLD))
             ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=3.0)),
+            vol.Optional(
+                "command_rate_limit",
+                default=current_options.get("command_rate_limit", current_data.get("command_rate_limit", DEFAULT_COMMAND_RATE_LIMIT))
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=10.0)),
+            vol.Optional(
+                "restart_reset_window",
+                default=current_options.get("restart_reset_window", current_data.get("restart_reset_window", DEFAULT_RESTART_RESET_WINDOW))
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=600)),
+            vol.Optional(
+                "temperature_filter",
+                default=current_options.get("temperature_filter", current_data.get("temperature_filter", DEFAULT_TEMPERATURE_FILTER))
+            ): vol.In(TEMPERATURE_FILTERS),
+            vol.Optional(
+                "filter_measurement_noise",
+                default=current_options.get("filter_measurement_noise", current_data.get("filter_measurement_noise", DEFAULT_FILTER_MEASUREMENT_NOISE))
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.01, max=1.0)),
+            vol.Optional(
+                "filter_process_noise",
+                default=current_options.get("filter_process_noise", current_data.get("filter_process_noise", DEFAULT_FILTER_PROCESS_NOISE))
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=10.0)),
+            vol.Optional(
+                "window_detection",
+                default=current_options.get("window_detection", current_data.get("window_detection", DEFAULT_WINDOW_DETECTION))
+            ): bool,
+            vol.Optional(
+                "temperature_sources",
+                default=current_options.get("temperature_sources", current_data.get("temperature_sources", []))
+            ): selector.EntitySelector(
+                selector.EntitySelectorConfig(
+                    domain="sensor", device_class="temperature", multiple=True
+                )
+            ),
+            vol.Optional(
+                "temperature_source_timeout",
+                default=current_options.get("temperature_source_timeout", current_data.get("temperature_source_timeout", DEFAULT_TEMPERATURE_SOURCE_TIMEOUT))
+            ): vol.All(vol.Coerce(int), vol.Range(min=300, max=14400)),
+            vol.Optional(
+                "trv_temperature_fallback",
+                default=current_options.get("trv_temperature_fallback", current_data.get("trv_temperature_fallback", DEFAULT_TRV_TEMPERATURE_FALLBACK))
+            ): bool,
+            vol.Optional(
+                "control_mode",
+                default=current_options.get("control_mode", current_data.get("control_mode", DEFAULT_CONTROL_MODE))
+            ): vol.In(CONTROL_MODES),
+            vol.Optional(
+                "pwm_period",
+                default=current_options.get("pwm_period", current_data.get("pwm_period", DEFAULT_PWM_PERIOD))
+            ): vol.All(vol.Coerce(int), vol.Range(min=600, max=7200)),
+            vol.Optional(
+                "min_off_time",
+                default=current_options.get("min_off_time", current_data.get("min_off_time", DEFAULT_MIN_OFF_TIME))
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+            vol.Optional(
+                "max_cycles_per_hour",
+                default=current_options.get("max_cycles_per_hour", current_data.get("max_cycles_per_hour", DEFAULT_MAX_CYCLES_PER_HOUR))
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=12)),
+            vol.Optional(
+                "hysteresis_auto_tune",
+                default=current_options.get("hysteresis_auto_tune", current_data.get("hysteresis_auto_tune", DEFAULT_HYSTERESIS_AUTO_TUNE))
+            ): bool,
+            vol.Optional(
+                "learning_prior",
+                default=current_options.get("learning_prior", current_data.get("learning_prior", DEFAULT_LEARNING_PRIOR))
+            ): bool,
         })
+        
+        # Váha každého teplotního zdroje (primární + aktuálně nastavené další)
+        current_weights = current_options.get("temperature_weights", {})
+        temperature_entities = [
+            current_data["temperature_entity"],
+            *current_options.get("temperature_sources", current_data.get("temperature_sources", [])),
+        ]
+        for entity_id in temperature_entities:
+            state = self.hass.states.get(entity_id)
+            friendly_name = state.attributes.get("friendly_name", entity_id) if state else entity_id
+            schema_dict[vol.Optional(
+                f"weight_{entity_id}",
+                default=current_weights.get(entity_id, 1.0),
+                description=f"Váha teploty {friendly_name}"
+            )] = vol.All(vol.Coerce(float), vol.Range(min=0.1, max=10.0))
 
         return self.async_show_form(
             step_id="init",
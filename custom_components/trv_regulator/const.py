@@ -11,6 +11,11 @@ STATE_ERROR = "error"
 TRV_ON = {"hvac_mode": "heat", "temperature": 35}
 TRV_OFF = {"hvac_mode": "heat", "temperature": 5}
 
+# Ořezání ON/OFF setpointu podle schopností TRV (min_temp/max_temp)
+SETPOINT_CLAMP_ON_MIN = 25  # °C - nižší nahlášený ON setpoint už není ořezání, ale chyba
+SETPOINT_CLAMP_OFF_MAX = 10  # °C - vyšší nahlášený OFF setpoint už není ořezání, ale chyba
+SETPOINT_CLAMP_CONFIRMATIONS = 3  # Po sobě jdoucí stejná ořezání po vlastním příkazu nutná k naučení
+
 # Výchozí hodnoty
 DEFAULT_HYSTERESIS = 0.3
 DEFAULT_WINDOW_OPEN_DELAY = 120  # sekundy
@@ -24,18 +29,104 @@ DEFAULT_MAX_HEATING_DURATION = 7200  # sekund (120 min)
 DEFAULT_MAX_VALID_OVERSHOOT = 3.0  # °C
 DEFAULT_COOLDOWN_DURATION = 1200  # sekund (20 min)
 
+# Konec učení řízený spolehlivostí (Welford průměr a rozptyl cyklů)
+LEARNING_MIN_CYCLES = 4  # min. validních cyklů pro předčasný konec učení
+LEARNING_CONFIDENCE_Z = 2.0  # násobek směrodatné chyby průměru (~95% interval)
+LEARNING_DURATION_CI = 0.10  # relativní interval doby topení (±10 %) = plná spolehlivost
+LEARNING_OVERSHOOT_CI = 0.15  # °C - interval překmitu = plná spolehlivost
+LEARNING_EXTEND_CONFIDENCE = 0.5  # po learning_cycles_required stačí tato spolehlivost
+LEARNING_MAX_CYCLES_FACTOR = 2  # učení se prodlouží max. na N × learning_cycles_required
+LEARNING_RELEARN_CONFIDENCE = 0.35  # spolehlivost posledních cyklů pod touto hodnotou → znovu učit
+
+# Warm-start učení - prior z naučených podobných místností
+DEFAULT_LEARNING_PRIOR = False
+PRIOR_MAX_WEIGHT = 6.0  # pseudo-cyklů - váha prioru od identické místnosti
+PRIOR_MIN_CYCLES = 3  # vlastních validních cyklů, než může učení skončit díky prioru
+PRIOR_MIN_SIMILARITY = 0.3  # méně podobné místnosti se do prioru nezapočítají
+PRIOR_RATE_SCALE = 0.5  # podobnost rychlosti topení = exp(-|ln(poměr)| / scale)
+PRIOR_TRV_MISMATCH = 0.5  # násobek podobnosti při jiném počtu TRV
+PRIOR_DURATION_CV = 0.25  # variační koef. dob mezi místnostmi, při kterém váha klesne na polovinu
+
+# Detekce vrcholu teploty v COOLDOWN (sklon z klouzavé regrese)
+PEAK_SLOPE_WINDOW = 600  # sekund - okno regrese
+PEAK_MIN_SAMPLES = 4  # min. vzorků v okně
+PEAK_MIN_SPAN = 240  # sekund - min. časový rozsah vzorků
+PEAK_FALL_SLOPE = 0.15  # °C/h - sklon pod -tuto hodnotu = vrchol potvrzen
+
 # Historie a persistence
 HISTORY_SIZE = 100
 STORAGE_DIR = ".storage"
 STORAGE_FILE = "trv_regulator_learned_params.json"
+STORAGE_SNAPSHOT_FILE = "trv_regulator_learned_params_snapshot.json"  # záloha přes službu
+STORAGE_RUNTIME_FILE = "trv_regulator_runtime_state.json"  # běhový stav pro warm restart
+
+# Warm restart - obnovení rozpracovaného cyklu po restartu HA
+WARM_RESTART_MAX_AGE = 900  # sekund - starší snapshot stavu = bezpečnostní reset
+
+# Dlouhodobé statistiky (Recorder external statistics)
+STATISTICS_KEEP_HOURS = 48  # hodin - kolik hodinových bucketů držet pro přepočet
 
 # Timeouty pro error handling
 SENSOR_OFFLINE_TIMEOUT = 120  # sekund (2 min)
 TRV_OFFLINE_TIMEOUT = 300  # sekund (5 min)
 TARGET_DEBOUNCE_DELAY = 15  # sekund
-TRV_COMMAND_VERIFY_DELAY = 15  # sekund - cekani na potvrzeni TRV prikazu
+TRV_COMMAND_VERIFY_DELAY = 15  # sekund - výchozí čekání na potvrzení TRV příkazu (bez naměřené latence)
 TRV_TEMP_TOLERANCE = 0.5  # stupne Celsia - tolerance pro kontrolu teploty TRV
 
+# Watchdog (kontrola stavu TRV mimo řídicí smyčku)
+WATCHDOG_INTERVAL = 60  # sekund - kadence kontroly TRV
+WATCHDOG_BACKOFF_BASE = 60  # sekund - čekání po první korekci, dále exponenciálně
+WATCHDOG_BACKOFF_MAX = 1800  # sekund - max čekání mezi korekcemi stejné TRV
+BREAKER_FAILURE_THRESHOLD = 3  # po N no_response v řadě se TRV přestane opravovat
+BREAKER_OPEN_TIMEOUT = 600  # sekund - první zkušební pokus (half-open)
+BREAKER_OPEN_TIMEOUT_MAX = 7200  # sekund - max doba OPEN
+
+# Post-restart bezpečnostní reset
+DEFAULT_RESTART_RESET_WINDOW = 60  # sekund - okno pro rozložení OFF příkazů po restartu
+POST_RESTART_VERIFY_TIMEOUT = 60  # sekund - max čekání na potvrzení OFF od TRV
+
+# Centrální fronta příkazů (airtime budget)
+DEFAULT_COMMAND_RATE_LIMIT = 2.0  # service callů za sekundu pro celou domácnost
+COMMAND_PRIORITY_SAFETY = 0  # TRV OFF (bezpečnost)
+COMMAND_PRIORITY_HEATING = 1  # TRV ON
+COMMAND_PRIORITY_WATCHDOG = 2  # watchdog korekce
+COMMAND_WAIT_HISTORY = 100  # posledních N čekacích dob pro metriky
+DATA_COMMAND_SCHEDULER = "command_scheduler"  # klíč v hass.data[DOMAIN]
+DATA_SUBSCRIPTION_HUB = "subscription_hub"  # klíč v hass.data[DOMAIN] - sdílené odběry entit
+DATA_LEARNED_PARAMS_STORE = "learned_params_store"  # klíč v hass.data[DOMAIN] - sdílené úložiště
+DATA_RUNTIME_STATE_STORE = "runtime_state_store"  # klíč v hass.data[DOMAIN] - běhový stav místností
+DATA_ROOM_INDEX = "room_index"  # klíč v hass.data[DOMAIN] - index místností pro služby
+
+# Poptávka tepla celého domu (pro automatizace kotle / tepelného čerpadla)
+DATA_DEMAND_AGGREGATOR = "demand_aggregator"  # klíč v hass.data[DOMAIN]
+DEMAND_DEBOUNCE = 10  # sekund - sloučit změny více místností do jedné aktualizace
+DEMAND_REMAINING_HORIZON = 600  # sekund - místnost s kratším zbytkem cyklu má menší váhu
+DEMAND_RATE_WEIGHT_MIN = 0.5  # váha poptávky rychle se ohřívající místnosti (vůči mediánu)
+DEMAND_RATE_WEIGHT_MAX = 2.0  # váha poptávky pomalu se ohřívající místnosti (vůči mediánu)
+CALL_FOR_HEAT_THRESHOLD = 0.5  # ekvivalent plně topících místností pro zapnutí
+CALL_FOR_HEAT_MIN_RUN = 600  # sekund - min. doba běhu kotle
+CALL_FOR_HEAT_MIN_OFF = 300  # sekund - min. pauza kotle
+
+# Časování fází update smyčky (diagnostika výkonu)
+PHASE_LATENCY_BUCKETS_MS = (
+    1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000, 120000
+)  # horní meze bucketů histogramu (ms)
+PHASE_HISTOGRAM_WINDOW = 500  # vzorků - po překročení se histogram "zestárne" (čítače / 2)
+PHASE_SLOW_THRESHOLD_MS = 1000  # ms - volání delší než tohle se počítá jako pomalé
+
+# Latence potvrzení příkazů od TRV (setpoint / last_seen)
+ACK_LATENCY_BUCKETS = (
+    0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120
+)  # horní meze bucketů histogramu (sekundy)
+ACK_HISTOGRAM_WINDOW = 200  # vzorků na TRV - pak histogram "zestárne" (čítače / 2)
+
+# Adaptivní timeout verifikace per TRV (z naměřené latence potvrzení)
+VERIFY_TIMEOUT_PERCENTILE = 99  # percentil latence potvrzení
+VERIFY_TIMEOUT_MARGIN = 3  # sekund - rezerva nad percentilem
+VERIFY_TIMEOUT_MIN = 3  # sekund - spodní mez
+VERIFY_TIMEOUT_MAX = 60  # sekund - horní mez
+VERIFY_TIMEOUT_MIN_SAMPLES = 5  # méně vzorků → TRV_COMMAND_VERIFY_DELAY
+
 # Reliability tracking
 RELIABILITY_STRONG_THRESHOLD = 98  # %
 RELIABILITY_MEDIUM_THRESHOLD = 90  # %
@@ -50,6 +141,8 @@ FAILURE_REASON_TEMP_MISMATCH = "temperature_mismatch"  # teplota nesedi (REALNE
 FAILURE_REASON_MODE_MISMATCH = "mode_mismatch"  # mode nesedi, teplota OK (TRV preference)
 FAILURE_REASON_OFFLINE = "offline"  # TRV offline/unavailable
 FAILURE_REASON_NO_RESPONSE = "no_response"  # last_seen se nezmenil (baterie/signal)
+FAILURE_REASON_VALVE_MISMATCH = "valve_mismatch"  # poloha ventilu nesedi (REALNE selhani)
+FAILURE_REASON_SETPOINT_CLAMPED = "setpoint_clamped"  # TRV ořízla setpoint na svůj rozsah (neni chyba)
 
 # Rate limiting
 ERROR_LOG_RATE_LIMIT = 1800  # 30 minut v sekundach - max frekvence ERROR logu
@@ -57,5 +150,66 @@ ERROR_LOG_RATE_LIMIT = 1800  # 30 minut v sekundach - max frekvence ERROR logu
 # Recovery mode
 DEFAULT_RECOVERY_THRESHOLD = 1.0  # °C - aktivace RECOVERY mode při velkém teplotním rozdílu
 
+# Filtr teploty (volitelný)
+TEMPERATURE_FILTER_NONE = "none"
+TEMPERATURE_FILTER_EMA = "ema"
+TEMPERATURE_FILTER_KALMAN = "kalman"
+TEMPERATURE_FILTERS = [TEMPERATURE_FILTER_NONE, TEMPERATURE_FILTER_EMA, TEMPERATURE_FILTER_KALMAN]
+DEFAULT_TEMPERATURE_FILTER = TEMPERATURE_FILTER_NONE
+DEFAULT_FILTER_MEASUREMENT_NOISE = 0.15  # °C - směrodatná odchylka šumu senzoru
+DEFAULT_FILTER_PROCESS_NOISE = 1.0  # °C/h za √h - jak rychle se může měnit sklon teploty
+
+# Detekce otevřeného okna z poklesu teploty (místnosti bez kontaktů)
+DEFAULT_WINDOW_DETECTION = False
+WINDOW_DETECT_WINDOW = 300  # sekund - okno regrese sklonu
+WINDOW_DETECT_MIN_SAMPLES = 4  # min. vzorků v okně
+WINDOW_DETECT_MIN_SPAN = 180  # sekund - min. časový rozsah vzorků
+WINDOW_DETECT_MIN_RATE = 2.0  # °C/h - pokles musí být alespoň takhle strmý
+WINDOW_DETECT_MIN_DROP = 0.3  # °C - a teplota musí klesnout alespoň o tolik pod maximum okna
+WINDOW_DETECT_SIGMA = 4.0  # násobek směrodatné odchylky naučeného sklonu
+WINDOW_DETECT_BASELINE_ALPHA = 0.01  # EWMA váha nového vzorku sklonu
+WINDOW_DETECT_BASELINE_MIN_SAMPLES = 60  # méně vzorků → jen WINDOW_DETECT_MIN_RATE
+WINDOW_DETECT_CLOSE_RATE = 0.5  # °C/h - pokles mírnější než tohle = okno zavřené
+WINDOW_DETECT_MIN_OPEN = 300  # sekund - min. doba "otevřeného" okna
+WINDOW_DETECT_MAX_OPEN = 1800  # sekund - max. doba, pak se detekce uvolní
+WINDOW_DETECT_FP_DROP = 0.5  # °C - celkový pokles menší než tohle = falešný poplach
+WINDOW_DETECT_LATENCY_BUCKETS = (
+    30, 60, 90, 120, 180, 240, 300, 450, 600, 900, 1200
+)  # horní meze bucketů histogramu latence detekce (sekundy)
+WINDOW_DETECT_HISTOGRAM_WINDOW = 100  # vzorků - pak histogram "zestárne"
+
+# Fúze více teplotních senzorů
+DEFAULT_TEMPERATURE_SOURCE_TIMEOUT = 3600  # sekund - zdroj bez hlášení déle = zastaralý
+DEFAULT_TRV_TEMPERATURE_FALLBACK = False  # bez senzorů použít current_temperature z TRV
+
+# Režim řízení
+CONTROL_MODE_ONOFF = "onoff"  # ON/OFF cykly s naučenou dobou topení
+CONTROL_MODE_PWM = "pwm"  # časově proporcionální řízení s pevnou periodou
+CONTROL_MODES = [CONTROL_MODE_ONOFF, CONTROL_MODE_PWM]
+DEFAULT_CONTROL_MODE = CONTROL_MODE_ONOFF
+DEFAULT_PWM_PERIOD = 1800  # sekund - perioda PWM
+PWM_MIN_ON = 120  # sekund - kratší pulz se vynechá (nevyplatí se příkaz)
+PWM_MIN_OFF = 180  # sekund - min. vypnutá část periody (max. střída < 100 %)
+PWM_HOLD_GAIN = 0.5  # integrační zesílení střídy pro udržení targetu
+PWM_GAIN_ALPHA = 0.3  # EWMA váha nového cyklu pro tepelný zisk
+PWM_DEFAULT_HOLD_DUTY = 0.2  # výchozí střída pro udržení targetu
+BENCHMARK_MAX_TICK_GAP = 300  # sekund - delší mezera mezi ticky se do srovnání nepočítá
+
+# Ochrana proti krátkým cyklům (0 = vypnuto)
+DEFAULT_MIN_OFF_TIME = 0  # sekund - min. doba mezi koncem topení a dalším startem
+DEFAULT_MAX_CYCLES_PER_HOUR = 0  # strop startů topení za hodinu
+DEFAULT_HYSTERESIS_AUTO_TUNE = False  # ladit hysterezi podle stropu cyklů
+CYCLE_GUARD_WINDOW = 3600  # sekund - okno pro počítání cyklů
+HYSTERESIS_TUNE_STEP = 0.05  # °C - krok auto-tuneru
+HYSTERESIS_TUNE_MIN = 0.1  # °C - nejužší efektivní hystereze
+HYSTERESIS_TUNE_MIN_FACTOR = 0.5  # auto-tuner nezúží hysterezi pod 50 % nastavené
+HYSTERESIS_TUNE_MAX = 1.0  # °C - nejširší efektivní hystereze
+
+# Řízení polohou ventilu (number entita TRV, 0-100 %)
+VALVE_MIN_OPENING = 20  # % - menší otevření už prakticky netopí
+VALVE_FULL_RATE_HORIZON = 0.5  # hodin - chybu dorovnat zhruba za tuto dobu (při plném otevření)
+VALVE_TOLERANCE = 2  # % - tolerance pro kontrolu polohy ventilu
+VALVE_UPDATE_STEP = 10  # % - menší změna otevření během HEATING se neposílá
+
 # Domain
 DOMAIN = "trv_regulator"
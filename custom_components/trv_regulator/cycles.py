@@ -0,0 +1,98 @@
+"""Záznam cyklu topení - kompaktní objekt se sloty, dict jen pro JSON a senzory."""
+from collections import deque
+from typing import Iterable, Optional
+
+from .const import HISTORY_SIZE
+
+
+class CycleRecord:
+    """Jeden cyklus topení (HEATING + COOLDOWN).
+
+    Pole jsou pevně daná (změna schématu historie = změna zde). Volitelná
+    pole jsou None, dokud je cyklus nevyplní, a do dict se nezapisují.
+    """
+
+    __slots__ = (
+        "timestamp",            # Začátek topení (unix s)
+        "start_temp",           # Teplota na začátku topení
+        "target",               # Cílová teplota
+        "valid",                # Použitelný pro učení
+        "post_vent",            # POST-VENT cyklus (nepoužívá se pro učení)
+        "mode",                 # CONTROL_MODE_PWM pro PWM pulz, jinak None
+        "planned_duration",     # Plánovaná doba zapnutí PWM pulzu (s)
+        "valve_opening",        # Nejmenší otevření ventilu v cyklu (%)
+        "heating_duration",     # Skutečná doba topení (s)
+        "stop_temp",            # Teplota při vypnutí
+        "max_temp",             # Maximum v COOLDOWN
+        "overshoot",            # Překmit nad cíl (°C)
+        "cooldown_duration",    # Doba COOLDOWN (s)
+        "cooldown_end",         # Důvod konce COOLDOWN
+        "invalidation_reason",  # Proč byl cyklus invalidován
+        "resumed_after",        # Výpadek při warm restartu (s)
+    )
+
+    # Pole vždy zapisovaná do dict (i bez hodnoty)
+    _REQUIRED = ("timestamp", "start_temp", "target", "valid", "post_vent")
+
+    def __init__(
+        self,
+        timestamp: int,
+        start_temp: Optional[float] = None,
+        target: Optional[float] = None,
+        valid: bool = True,
+        post_vent: bool = False,
+        mode: Optional[str] = None,
+        planned_duration: Optional[float] = None,
+        valve_opening: Optional[float] = None,
+        heating_duration: Optional[float] = None,
+        stop_temp: Optional[float] = None,
+        max_temp: Optional[float] = None,
+        overshoot: Optional[float] = None,
+        cooldown_duration: Optional[float] = None,
+        cooldown_end: Optional[str] = None,
+        invalidation_reason: Optional[str] = None,
+        resumed_after: Optional[int] = None,
+    ):
+        """Inicializace záznamu."""
+        self.timestamp = timestamp
+        self.start_temp = start_temp
+        self.target = target
+        self.valid = valid
+        self.post_vent = post_vent
+        self.mode = mode
+        self.planned_duration = planned_duration
+        self.valve_opening = valve_opening
+        self.heating_duration = heating_duration
+        self.stop_temp = stop_temp
+        self.max_temp = max_temp
+        self.overshoot = overshoot
+        self.cooldown_duration = cooldown_duration
+        self.cooldown_end = cooldown_end
+        self.invalidation_reason = invalidation_reason
+        self.resumed_after = resumed_after
+
+    def invalidate(self, reason: str):
+        """Vyřadit cyklus z učení (okno, změna cíle)."""
+        self.valid = False
+        self.invalidation_reason = reason
+
+    def to_dict(self) -> dict:
+        """Serializace pro JSON úložiště a atributy senzorů."""
+        return {
+            field: value
+            for field in self.__slots__
+            if (value := getattr(self, field)) is not None or field in self._REQUIRED
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CycleRecord":
+        """Obnovit z úložiště (neznámé klíče starších verzí se ignorují)."""
+        return cls(**{field: data[field] for field in cls.__slots__ if field in data})
+
+
+def history_from_dicts(cycles: Iterable[dict]) -> deque:
+    """Historie cyklů z JSON (ring buffer posledních HISTORY_SIZE cyklů)."""
+    return deque(
+        (CycleRecord.from_dict(cycle) for cycle in cycles if "timestamp" in cycle),
+        maxlen=HISTORY_SIZE,
+    )
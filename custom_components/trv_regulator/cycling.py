@@ -0,0 +1,237 @@
+"""Ochrana proti krátkým cyklům - min. doba vypnutí, strop cyklů za hodinu."""
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+from .const import (
+    CYCLE_GUARD_WINDOW,
+    HYSTERESIS_TUNE_STEP,
+    HYSTERESIS_TUNE_MIN,
+    HYSTERESIS_TUNE_MIN_FACTOR,
+    HYSTERESIS_TUNE_MAX,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+SUPPRESS_MIN_OFF_TIME = "min_off_time"
+SUPPRESS_CYCLES_PER_HOUR = "cycles_per_hour"
+
+
+class ShortCycleGuard:
+    """Rozhoduje, zda smí místnost právě teď začít topit.
+
+    Potlačený start se počítá jednou za epizodu (poptávka trvá přes víc
+    ticků). Pokud poptávka zmizí dřív, než start povolíme, cyklus se
+    ušetřil - i s příkazy ON+OFF pro všechny TRV.
+
+    Auto-tuner po každém požadovaném startu porovná počet požadavků na
+    topení za poslední hodinu (povolené starty + potlačené epizody) se
+    stropem a efektivní hysterezi rozšíří (víc požadavků než strop) nebo
+    zúží (výrazně méně, přesnější regulace). Povolené starty strop nikdy
+    nepřekročí, proto se počítají požadavky. Zúžení má spodní mez
+    (HYSTERESIS_TUNE_MIN_FACTOR × nastavená hystereze).
+    """
+
+    def __init__(
+        self,
+        room_name: str,
+        hysteresis: float,
+        min_off_time: int,
+        max_cycles_per_hour: int,
+        auto_tune: bool,
+    ):
+        """Inicializace ochrany."""
+        self._room_name = room_name
+        self._base_hysteresis = hysteresis
+        self._min_off_time = min_off_time
+        self._max_cycles_per_hour = max_cycles_per_hour
+        self._auto_tune = auto_tune and max_cycles_per_hour > 0
+        self._hysteresis = hysteresis
+
+        self._starts: deque = deque()
+        self._demands: deque = deque()  # Požadované starty (pro auto-tuner)
+        self._off_since: Optional[float] = None
+
+        # Epizoda potlačeného startu (důvod) - None = žádná
+        self._suppressing: Optional[str] = None
+        self._suppressed = {SUPPRESS_MIN_OFF_TIME: 0, SUPPRESS_CYCLES_PER_HOUR: 0}
+        self._cycles_avoided = 0
+        self._commands_saved = 0
+
+    @property
+    def hysteresis(self) -> float:
+        """Efektivní hystereze (°C) - s auto-tunerem se liší od nastavené."""
+        return self._hysteresis
+
+    @property
+    def base_hysteresis(self) -> float:
+        """Nastavená hystereze (°C)."""
+        return self._base_hysteresis
+
+    @property
+    def min_off_time(self) -> int:
+        """Min. doba od konce topení do dalšího startu (s)."""
+        return self._min_off_time
+
+    @property
+    def max_cycles_per_hour(self) -> int:
+        """Strop startů za hodinu (0 = bez limitu)."""
+        return self._max_cycles_per_hour
+
+    @property
+    def auto_tune(self) -> bool:
+        """Zda běží auto-tuner hystereze (vyžaduje strop startů)."""
+        return self._auto_tune
+
+    @property
+    def _min_hysteresis(self) -> float:
+        """Nejužší hystereze, na kterou smí auto-tuner zúžit."""
+        return max(HYSTERESIS_TUNE_MIN, self._base_hysteresis * HYSTERESIS_TUNE_MIN_FACTOR)
+
+    def _prune(self, now: float):
+        """Zahodit starty a požadavky starší než okno."""
+        for starts in (self._starts, self._demands):
+            while starts and starts[0] <= now - CYCLE_GUARD_WINDOW:
+                starts.popleft()
+
+    def blocked_reason(self, now: float) -> Optional[str]:
+        """Důvod, proč teď nelze začít topit (None = start povolen)."""
+        if (
+            self._min_off_time > 0
+            and self._off_since is not None
+            and now - self._off_since < self._min_off_time
+        ):
+            return SUPPRESS_MIN_OFF_TIME
+
+        self._prune(now)
+        if self._max_cycles_per_hour > 0 and len(self._starts) >= self._max_cycles_per_hour:
+            return SUPPRESS_CYCLES_PER_HOUR
+        return None
+
+    def suppress_start(self, now: Optional[float] = None) -> bool:
+        """Místnost chce topit - vrací True pokud se start potlačí."""
+        now = now if now is not None else time.time()
+        reason = self.blocked_reason(now)
+        if reason is None:
+            self._suppressing = None
+            return False
+
+        if self._suppressing is None:
+            self._suppressed[reason] += 1
+            _LOGGER.info(
+                f"TRV [{self._room_name}]: Heating start suppressed ({reason}, "
+                f"{len(self._starts)} cycle(s) in last hour)"
+            )
+            # Nová epizoda = požadavek na start (ten se pak nepočítá znovu)
+            self._demands.append(now)
+            if self._auto_tune:
+                self._tune()
+        self._suppressing = reason
+        return True
+
+    def demand_cleared(self, commands_per_cycle: int):
+        """Poptávka zmizela - rozpracovaná epizoda potlačení = ušetřený cyklus."""
+        if self._suppressing is None:
+            return
+        self._suppressing = None
+        self._cycles_avoided += 1
+        self._commands_saved += commands_per_cycle
+        _LOGGER.debug(
+            f"TRV [{self._room_name}]: Suppressed start not needed anymore, "
+            f"saved {commands_per_cycle} command(s)"
+        )
+
+    def record_start(self, now: Optional[float] = None, tune: bool = True):
+        """Místnost začala topit (jakoukoli cestou, i RECOVERY/POST-VENT)."""
+        now = now if now is not None else time.time()
+        self._prune(now)
+        self._starts.append(now)
+        if tune and self._suppressing is None:
+            self._demands.append(now)
+        self._suppressing = None
+        self._off_since = None
+        if self._auto_tune and tune:
+            self._tune()
+
+    def record_stop(self, now: Optional[float] = None):
+        """Místnost přestala topit - od teď běží min. doba vypnutí."""
+        self._off_since = now if now is not None else time.time()
+
+    def _tune(self):
+        """Posunout efektivní hysterezi podle požadavků na start za poslední hodinu."""
+        demands = len(self._demands)
+        hysteresis = self._hysteresis
+        if demands > self._max_cycles_per_hour:
+            hysteresis = min(HYSTERESIS_TUNE_MAX, hysteresis + HYSTERESIS_TUNE_STEP)
+        elif demands * 2 <= self._max_cycles_per_hour:
+            hysteresis = max(self._min_hysteresis, hysteresis - HYSTERESIS_TUNE_STEP)
+
+        hysteresis = round(hysteresis, 2)
+        if hysteresis != self._hysteresis:
+            _LOGGER.info(
+                f"TRV [{self._room_name}]: Hysteresis auto-tuned "
+                f"{self._hysteresis:.2f}°C → {hysteresis:.2f}°C "
+                f"({demands} start request(s) in last hour, ceiling {self._max_cycles_per_hour})"
+            )
+            self._hysteresis = hysteresis
+
+    def get_stats(self, now: Optional[float] = None) -> dict:
+        """Stav ochrany pro senzory a diagnostiku."""
+        now = now if now is not None else time.time()
+        self._prune(now)
+        return {
+            "min_off_time": self._min_off_time,
+            "max_cycles_per_hour": self._max_cycles_per_hour,
+            "cycles_last_hour": len(self._starts),
+            "start_requests_last_hour": len(self._demands),
+            "blocked": self.blocked_reason(now),
+            "suppressed_starts": sum(self._suppressed.values()),
+            "suppressed_by_reason": dict(self._suppressed),
+            "cycles_avoided": self._cycles_avoided,
+            "commands_saved": self._commands_saved,
+            "hysteresis": self._base_hysteresis,
+            "effective_hysteresis": self._hysteresis,
+            "auto_tune": self._auto_tune,
+        }
+
+    def to_dict(self) -> dict:
+        """Serializace pro JSON úložiště."""
+        return {
+            "effective_hysteresis": self._hysteresis,
+            "starts": list(self._starts),
+            "demands": list(self._demands),
+            "off_since": self._off_since,
+            "suppressed": dict(self._suppressed),
+            "cycles_avoided": self._cycles_avoided,
+            "commands_saved": self._commands_saved,
+        }
+
+    @classmethod
+    def from_dict(
+        cls,
+        room_name: str,
+        hysteresis: float,
+        min_off_time: int,
+        max_cycles_per_hour: int,
+        auto_tune: bool,
+        data: Optional[dict],
+    ) -> "ShortCycleGuard":
+        """Obnovit z úložiště (naladěná hystereze jen pokud auto-tuner běží)."""
+        guard = cls(room_name, hysteresis, min_off_time, max_cycles_per_hour, auto_tune)
+        if not data:
+            return guard
+
+        if guard._auto_tune and data.get("effective_hysteresis") is not None:
+            guard._hysteresis = min(
+                HYSTERESIS_TUNE_MAX, max(guard._min_hysteresis, data["effective_hysteresis"])
+            )
+        guard._starts.extend(data.get("starts", []))
+        guard._demands.extend(data.get("demands", data.get("starts", [])))
+        guard._off_since = data.get("off_since")
+        for reason, count in data.get("suppressed", {}).items():
+            if reason in guard._suppressed:
+                guard._suppressed[reason] = count
+        guard._cycles_avoided = data.get("cycles_avoided", 0)
+        guard._commands_saved = data.get("commands_saved", 0)
+        return guard
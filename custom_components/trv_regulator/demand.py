@@ -0,0 +1,219 @@
+"""Agregace poptávky tepla přes všechny místnosti (pro automatizace kotle/TČ)."""
+import logging
+import time
+from typing import Callable, Optional
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    DEMAND_DEBOUNCE,
+    DEMAND_RATE_WEIGHT_MIN,
+    DEMAND_RATE_WEIGHT_MAX,
+    CALL_FOR_HEAT_THRESHOLD,
+    CALL_FOR_HEAT_MIN_RUN,
+    CALL_FOR_HEAT_MIN_OFF,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HeatDemandAggregator:
+    """Sečte poptávku tepla všech RoomControllerů v doméně.
+
+    Místnosti hlásí změny přes coordinator (push), přepočet je debounced,
+    takže souběžné přechody více místností znamenají jednu aktualizaci
+    entit. Call-for-heat má min. dobu běhu a min. pauzu - kotel tak
+    zapíná méně často a déle.
+
+    Poptávka místnosti se váží její naučenou rychlostí ohřevu vůči mediánu
+    domu: pomalu se ohřívající místnost (velká tepelná ztráta / setrvačnost)
+    potřebuje od zdroje víc než rychlá. Bez naučené rychlosti váha 1.
+    """
+
+    def __init__(self, hass):
+        """Inicializace agregátoru."""
+        self._hass = hass
+        self._rooms: dict = {}  # entry_id → RoomController
+        self._listeners: list[Callable[[], None]] = []
+        self._unsub_debounce = None
+        self._unsub_hold = None
+
+        self._demand = 0.0  # součet poptávek (ekvivalent plně topících místností)
+        self._room_demands: dict[str, dict] = {}
+        self._call_for_heat = False
+        self._changed_at: Optional[float] = None
+        self._held_until: Optional[float] = None
+        self._burns = 0
+        self._updates = 0
+
+    def register_room(self, entry_id: str, room):
+        """Přidat místnost do agregace."""
+        self._rooms[entry_id] = room
+        self.async_schedule_update()
+
+    def unregister_room(self, entry_id: str):
+        """Odebrat místnost (unload config entry)."""
+        self._rooms.pop(entry_id, None)
+        if self._rooms:
+            self.async_schedule_update()
+        else:
+            self.async_shutdown()
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[], None]) -> Callable[[], None]:
+        """Přihlásit entitu k push aktualizacím (vrací odhlášení)."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove():
+            if update_callback in self._listeners:
+                self._listeners.remove(update_callback)
+
+        return _remove
+
+    @callback
+    def async_schedule_update(self):
+        """Některá místnost se změnila - přepočítat po DEMAND_DEBOUNCE."""
+        if self._unsub_debounce is not None:
+            return
+        self._unsub_debounce = async_call_later(
+            self._hass, DEMAND_DEBOUNCE, self._async_debounced_update
+        )
+
+    @callback
+    def _async_debounced_update(self, _now):
+        """Debounce vypršel - přepočítat a rozeslat."""
+        self._unsub_debounce = None
+        self._async_recompute()
+
+    @callback
+    def _async_hold_expired(self, _now):
+        """Min. doba běhu/pauzy vypršela - znovu vyhodnotit call-for-heat."""
+        self._unsub_hold = None
+        self._async_recompute()
+
+    @callback
+    def _async_recompute(self):
+        """Sečíst poptávku místností a aktualizovat call-for-heat."""
+        room_demands = {
+            room._room_name: dict(room.heat_demand) for room in self._rooms.values()
+        }
+        rates = sorted(
+            room["heating_rate"]
+            for room in room_demands.values()
+            if room.get("heating_rate") is not None
+        )
+        reference = rates[len(rates) // 2] if rates else None
+        for room in room_demands.values():
+            weight = self._rate_weight(room.get("heating_rate"), reference)
+            room["weight"] = weight
+            room["weighted_demand"] = round(room["demand"] * weight, 2)
+        demand = round(sum(room["weighted_demand"] for room in room_demands.values()), 2)
+        call_for_heat = self._call_for_heat
+        self._update_call_for_heat(demand, time.time())
+
+        changed = (
+            demand != self._demand
+            or call_for_heat != self._call_for_heat
+            or room_demands != self._room_demands
+        )
+        self._demand = demand
+        self._room_demands = room_demands
+        if not changed:
+            return
+
+        self._updates += 1
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @staticmethod
+    def _rate_weight(rate: Optional[float], reference: Optional[float]) -> float:
+        """Váha poptávky podle rychlosti ohřevu vůči mediánu (neznámá = 1)."""
+        if rate is None or reference is None:
+            return 1.0
+        weight = reference / rate
+        return round(min(DEMAND_RATE_WEIGHT_MAX, max(DEMAND_RATE_WEIGHT_MIN, weight)), 2)
+
+    def _update_call_for_heat(self, demand: float, now: float):
+        """Call-for-heat s hysterezí a min. dobou běhu/pauzy."""
+        if self._call_for_heat:
+            wanted = demand > 0
+        else:
+            wanted = demand >= CALL_FOR_HEAT_THRESHOLD
+
+        if wanted == self._call_for_heat:
+            self._cancel_hold()
+            return
+
+        hold = CALL_FOR_HEAT_MIN_RUN if self._call_for_heat else CALL_FOR_HEAT_MIN_OFF
+        if self._changed_at is not None and now - self._changed_at < hold:
+            held_until = self._changed_at + hold
+            if self._held_until != held_until:
+                self._cancel_hold()
+                self._held_until = held_until
+                self._unsub_hold = async_call_later(
+                    self._hass, held_until - now, self._async_hold_expired
+                )
+            return
+
+        self._cancel_hold()
+        self._call_for_heat = wanted
+        self._changed_at = now
+        if wanted:
+            self._burns += 1
+        _LOGGER.info(
+            f"TRV heat demand: call for heat {'ON' if wanted else 'OFF'} "
+            f"(demand={demand:.2f} room(s))"
+        )
+
+    def _cancel_hold(self):
+        """Zrušit čekání na konec min. běhu/pauzy."""
+        self._held_until = None
+        if self._unsub_hold is not None:
+            self._unsub_hold()
+            self._unsub_hold = None
+
+    @callback
+    def async_shutdown(self):
+        """Zrušit časovače (unload poslední místnosti)."""
+        if self._unsub_debounce is not None:
+            self._unsub_debounce()
+            self._unsub_debounce = None
+        self._cancel_hold()
+
+    @property
+    def demand(self) -> float:
+        """Součet poptávek (ekvivalent plně topících místností)."""
+        return self._demand
+
+    @property
+    def demand_percent(self) -> float:
+        """Poptávka vůči všem místnostem (%)."""
+        if not self._rooms:
+            return 0.0
+        return round(min(100.0, 100 * self._demand / len(self._rooms)), 1)
+
+    @property
+    def call_for_heat(self) -> bool:
+        """Zda mají kotel/TČ topit."""
+        return self._call_for_heat
+
+    @property
+    def room_demands(self) -> dict[str, dict]:
+        """Poptávka jednotlivých místností z posledního přepočtu."""
+        return self._room_demands
+
+    def get_stats(self) -> dict:
+        """Atributy pro entity."""
+        return {
+            "demand": self._demand,
+            "rooms_total": len(self._rooms),
+            "rooms_heating": sum(1 for room in self._room_demands.values() if room["demand"] > 0),
+            "call_for_heat": self._call_for_heat,
+            "call_for_heat_held_until": (
+                round(self._held_until) if self._held_until is not None else None
+            ),
+            "burns": self._burns,
+            "updates": self._updates,
+        }
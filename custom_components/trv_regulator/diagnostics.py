@@ -0,0 +1,71 @@
+"""Diagnostics download pro TRV Regulator."""
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DOMAIN,
+    DATA_COMMAND_SCHEDULER,
+    DATA_SUBSCRIPTION_HUB,
+    DATA_LEARNED_PARAMS_STORE,
+    DATA_RUNTIME_STATE_STORE,
+    PHASE_SLOW_THRESHOLD_MS,
+)
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict:
+    """Diagnostika jedné místnosti (config entry)."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    room = coordinator.room
+
+    diagnostics = {
+        "entry": {
+            "title": entry.title,
+            "data": dict(entry.data),
+            "options": dict(entry.options),
+        },
+        "state": {
+            "state": room.state,
+            "is_learning": room.is_learning,
+            "valid_cycles_count": room.valid_cycles_count,
+            "avg_heating_duration": room.avg_heating_duration,
+            "time_offset": room.time_offset,
+            "avg_overshoot": room.avg_overshoot,
+            "last_cycle": room.last_cycle,
+            "temperature_sources": room.temperature_contributions,
+            "temperature_fallback": room.temperature_fallback_active,
+        },
+        "performance": {
+            "slow_threshold_ms": PHASE_SLOW_THRESHOLD_MS,
+            "phases": room.performance_stats,
+        },
+        "control": {
+            "mode": room.control_mode,
+            "active_mode": room.active_control_mode,
+            "pwm": room.pwm_stats,
+            "benchmark": room.control_benchmark,
+            "valves": room.valve_positions,
+            "short_cycle_guard": room.cycle_guard_stats,
+            "learning_prior": room.learning_prior,
+            "learning_confidence": room.learning_confidence,
+        },
+        "watchdog": room.watchdog_status,
+        "window_detection": room.window_detection_stats,
+        "reliability": room._reliability_tracker.get_metrics(),
+    }
+
+    scheduler = hass.data[DOMAIN].get(DATA_COMMAND_SCHEDULER)
+    if scheduler is not None:
+        diagnostics["command_queue"] = scheduler.get_metrics()
+
+    subscription_hub = hass.data[DOMAIN].get(DATA_SUBSCRIPTION_HUB)
+    if subscription_hub is not None:
+        diagnostics["subscription_hub"] = subscription_hub.get_metrics()
+
+    diagnostics["storage"] = {
+        "learned_params": hass.data[DOMAIN][DATA_LEARNED_PARAMS_STORE].get_metrics(),
+        "runtime_state": hass.data[DOMAIN][DATA_RUNTIME_STATE_STORE].get_metrics(),
+    }
+
+    return diagnostics
@@ -0,0 +1,269 @@
+"""Streamové filtry teploty - vyhlazená hodnota + odhad sklonu (°C/h)."""
+from abc import ABC, abstractmethod
+import math
+from collections import deque
+from typing import Optional
+
+from .const import (
+    TEMPERATURE_FILTER_NONE,
+    TEMPERATURE_FILTER_EMA,
+    TEMPERATURE_FILTER_KALMAN,
+)
+
+
+class TemperatureFilter(ABC):
+    """Společné rozhraní filtrů.
+
+    `update()` přijímá vzorky s časovou značkou (sekundy). Vzorky se stejnou
+    nebo starší značkou se ignorují, takže je lze bezpečně krmit jak
+    z událostí, tak ze snapshotu ticku.
+    """
+
+    def __init__(self):
+        """Inicializace filtru."""
+        self._last_ts: Optional[float] = None
+        self._samples = 0
+
+    @property
+    @abstractmethod
+    def value(self) -> Optional[float]:
+        """Vyhlazená teplota (°C)."""
+
+    @property
+    @abstractmethod
+    def slope(self) -> Optional[float]:
+        """Odhad sklonu teploty (°C/h)."""
+
+    @property
+    def samples(self) -> int:
+        """Počet zpracovaných vzorků."""
+        return self._samples
+
+    def update(self, measurement: float, timestamp: float) -> bool:
+        """Zpracovat vzorek. Vrací False pokud byl ignorován (duplicitní/starý)."""
+        if self._last_ts is not None and timestamp <= self._last_ts:
+            return False
+
+        dt_hours = (timestamp - self._last_ts) / 3600 if self._last_ts is not None else None
+        self._last_ts = timestamp
+        self._samples += 1
+        self._update(measurement, dt_hours)
+        return True
+
+    @abstractmethod
+    def _update(self, measurement: float, dt_hours: Optional[float]):
+        """Krok konkrétního filtru (dt_hours None = první vzorek)."""
+
+
+class EmaTemperatureFilter(TemperatureFilter):
+    """Holtovo dvojité exponenciální vyhlazení (úroveň + trend).
+
+    Časová konstanta = measurement_noise / process_noise (hodin), tj. čím
+    víc senzor šumí vůči očekávané změně teploty, tím pomalejší filtr.
+    """
+
+    def __init__(self, measurement_noise: float, process_noise: float):
+        """Inicializace EMA filtru."""
+        super().__init__()
+        self._tau = measurement_noise / process_noise
+        self._level: Optional[float] = None
+        self._trend = 0.0
+
+    @property
+    def value(self) -> Optional[float]:
+        """Vyhlazená teplota (°C)."""
+        return self._level
+
+    @property
+    def slope(self) -> Optional[float]:
+        """Odhad sklonu (°C/h)."""
+        return self._trend if self._level is not None else None
+
+    def _update(self, measurement: float, dt_hours: Optional[float]):
+        """Krok Holtova vyhlazení s proměnným dt."""
+        if self._level is None or not dt_hours:
+            self._level = measurement
+            return
+
+        alpha = 1 - math.exp(-dt_hours / self._tau)
+        beta = 1 - math.exp(-dt_hours / (2 * self._tau))
+
+        predicted = self._level + self._trend * dt_hours
+        level = predicted + alpha * (measurement - predicted)
+        self._trend += beta * ((level - self._level) / dt_hours - self._trend)
+        self._level = level
+
+
+class KalmanTemperatureFilter(TemperatureFilter):
+    """Kalmanův filtr s modelem konstantní rychlosti (teplota + sklon).
+
+    measurement_noise - směrodatná odchylka šumu senzoru (°C)
+    process_noise     - jak rychle se může měnit sklon (°C/h za √h)
+    """
+
+    def __init__(self, measurement_noise: float, process_noise: float):
+        """Inicializace Kalman filtru."""
+        super().__init__()
+        self._r = measurement_noise ** 2
+        self._q = process_noise ** 2
+        self._x: Optional[list[float]] = None  # [teplota, sklon °C/h]
+        self._p = [[0.0, 0.0], [0.0, 0.0]]
+
+    @property
+    def value(self) -> Optional[float]:
+        """Vyhlazená teplota (°C)."""
+        return self._x[0] if self._x is not None else None
+
+    @property
+    def slope(self) -> Optional[float]:
+        """Odhad sklonu (°C/h)."""
+        return self._x[1] if self._x is not None else None
+
+    def _update(self, measurement: float, dt_hours: Optional[float]):
+        """Predikce + korekce s proměnným dt."""
+        if self._x is None:
+            self._x = [measurement, 0.0]
+            # Počáteční nejistota: teplota = šum senzoru, sklon ~ 1°C/h
+            self._p = [[self._r, 0.0], [0.0, 1.0]]
+            return
+
+        dt = dt_hours or 0.0
+        (p00, p01), (p10, p11) = self._p
+
+        # Predikce: x = F x, P = F P F^T + Q (bílý šum zrychlení)
+        t = self._x[0] + self._x[1] * dt
+        v = self._x[1]
+        p00 = p00 + dt * (p10 + p01) + dt * dt * p11 + self._q * dt ** 3 / 3
+        p01 = p01 + dt * p11 + self._q * dt ** 2 / 2
+        p10 = p10 + dt * p11 + self._q * dt ** 2 / 2
+        p11 = p11 + self._q * dt
+
+        # Korekce měřením teploty (H = [1, 0])
+        s = p00 + self._r
+        k0 = p00 / s
+        k1 = p10 / s
+        innovation = measurement - t
+
+        self._x = [t + k0 * innovation, v + k1 * innovation]
+        self._p = [
+            [(1 - k0) * p00, (1 - k0) * p01],
+            [p10 - k1 * p00, p11 - k1 * p01],
+        ]
+
+
+def create_temperature_filter(
+    kind: str, measurement_noise: float, process_noise: float
+) -> Optional[TemperatureFilter]:
+    """Vytvořit filtr podle konfigurace (None = bez filtru)."""
+    if kind == TEMPERATURE_FILTER_EMA:
+        return EmaTemperatureFilter(measurement_noise, process_noise)
+    if kind == TEMPERATURE_FILTER_KALMAN:
+        return KalmanTemperatureFilter(measurement_noise, process_noise)
+    if kind not in (None, TEMPERATURE_FILTER_NONE):
+        raise ValueError(f"Unknown temperature filter: {kind}")
+    return None
+
+
+class SlopeEstimator:
+    """Klouzavá lineární regrese teploty přes posledních `window` sekund.
+
+    Slouží k detekci vrcholu teploty v COOLDOWN: vrchol je potvrzen
+    jakmile sklon přes dostatečně dlouhé okno spolehlivě klesá. Kvadratický
+    fit přes okno pak odhadne skutečnou výšku vrcholu i mezi kroky
+    rozlišení senzoru (0.1°C).
+    """
+
+    def __init__(self, window: float):
+        """Inicializace estimátoru."""
+        self._window = window
+        self._samples: deque = deque()
+
+    def reset(self):
+        """Zahodit všechny vzorky."""
+        self._samples.clear()
+
+    @property
+    def count(self) -> int:
+        """Počet vzorků v okně."""
+        return len(self._samples)
+
+    @property
+    def span(self) -> float:
+        """Časový rozsah vzorků v okně (s)."""
+        if len(self._samples) < 2:
+            return 0.0
+        return self._samples[-1][0] - self._samples[0][0]
+
+    def add(self, value: float, timestamp: float) -> bool:
+        """Přidat vzorek (starší nebo stejná časová značka se ignoruje)."""
+        if self._samples and timestamp <= self._samples[-1][0]:
+            return False
+        self._samples.append((timestamp, value))
+        cutoff = timestamp - self._window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return True
+
+    @property
+    def latest(self) -> Optional[float]:
+        """Poslední hodnota v okně."""
+        return self._samples[-1][1] if self._samples else None
+
+    def maximum(self) -> Optional[tuple[float, float]]:
+        """(timestamp, hodnota) posledního maxima v okně."""
+        best = None
+        for sample in self._samples:
+            if best is None or sample[1] >= best[1]:
+                best = sample
+        return best
+
+    @property
+    def slope(self) -> Optional[float]:
+        """Sklon regresní přímky (°C/h), None při < 2 vzorcích."""
+        n = len(self._samples)
+        if n < 2:
+            return None
+
+        t0 = self._samples[0][0]
+        mean_t = sum(t - t0 for t, _ in self._samples) / n
+        mean_v = sum(v for _, v in self._samples) / n
+        cov = sum((t - t0 - mean_t) * (v - mean_v) for t, v in self._samples)
+        var = sum((t - t0 - mean_t) ** 2 for t, _ in self._samples)
+        if var == 0:
+            return None
+        return cov / var * 3600
+
+    def peak(self) -> Optional[float]:
+        """Vrchol kvadratického fitu, pokud leží uvnitř okna (jinak None)."""
+        n = len(self._samples)
+        if n < 3:
+            return None
+
+        # Čas v hodinách, centrovaný - numerická stabilita
+        t0 = self._samples[0][0]
+        mean_t = sum(t - t0 for t, _ in self._samples) / n
+        xs = [(t - t0 - mean_t) / 3600 for t, _ in self._samples]
+        ys = [v for _, v in self._samples]
+
+        s1 = sum(xs)
+        s2 = sum(x ** 2 for x in xs)
+        s3 = sum(x ** 3 for x in xs)
+        s4 = sum(x ** 4 for x in xs)
+        sy = sum(ys)
+        sxy = sum(x * y for x, y in zip(xs, ys))
+        sx2y = sum(x * x * y for x, y in zip(xs, ys))
+
+        # Normální rovnice pro y = a x² + b x + c (Cramerovo pravidlo)
+        det = s4 * (s2 * n - s1 * s1) - s3 * (s3 * n - s1 * s2) + s2 * (s3 * s1 - s2 * s2)
+        if det == 0:
+            return None
+        a = (sx2y * (s2 * n - s1 * s1) - s3 * (sxy * n - s1 * sy) + s2 * (sxy * s1 - s2 * sy)) / det
+        b = (s4 * (sxy * n - sy * s1) - sx2y * (s3 * n - s1 * s2) + s2 * (s3 * sy - sxy * s2)) / det
+        c = (s4 * (s2 * sy - s1 * sxy) - s3 * (s3 * sy - s1 * sx2y) + sx2y * (s3 * s1 - s2 * s2)) / det
+
+        if a >= 0:
+            return None  # Není to vrchol (konvexní průběh)
+        vertex = -b / (2 * a)
+        if not xs[0] <= vertex <= xs[-1]:
+            return None
+        return c - b * b / (4 * a)
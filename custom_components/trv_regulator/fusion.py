@@ -0,0 +1,152 @@
+"""Fúze více teplotních senzorů místnosti do jedné hodnoty."""
+import logging
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+UNAVAILABLE_STATES = ("unavailable", "unknown")
+
+
+def _state_timestamp(state) -> float:
+    """Čas posledního hlášení senzoru (last_reported i při stejné hodnotě)."""
+    reported = getattr(state, "last_reported", None) or state.last_updated
+    return reported.timestamp()
+
+
+class TemperatureFusion:
+    """Vážený průměr teplotních zdrojů udržovaný inkrementálně.
+
+    Součty (váha × hodnota, váha) se upravují jen o rozdíl při změně jednoho
+    zdroje. Zdroj bez hlášení déle než `stale_after` se vyřadí - ale jen
+    pokud zůstane aspoň jeden čerstvý; když jsou zastaralé všechny,
+    použijí se všechny (lepší než ERROR). Bez jediného dostupného zdroje
+    se volitelně použije průměr `current_temperature` hlavic.
+    """
+
+    def __init__(self, room_name: str, sources: list[dict], stale_after: float, trv_fallback: bool):
+        """Inicializace (sources = [{"entity": ..., "weight": ...}], primární první)."""
+        self._room_name = room_name
+        self._weights = {
+            source["entity"]: float(source.get("weight", 1.0))
+            for source in sources
+            if float(source.get("weight", 1.0)) > 0
+        }
+        self._stale_after = stale_after
+        self._trv_fallback = trv_fallback
+
+        self._values: dict[str, float] = {}
+        self._updated_at: dict[str, float] = {}
+        self._weighted_sum = 0.0
+        self._weight_total = 0.0
+        self._using_fallback = False
+
+    @property
+    def entities(self) -> list[str]:
+        """Entity všech zdrojů."""
+        return list(self._weights)
+
+    @property
+    def updated_at(self) -> Optional[float]:
+        """Čas posledního hlášení kteréhokoliv dostupného zdroje."""
+        return max(self._updated_at.values(), default=None)
+
+    @property
+    def using_fallback(self) -> bool:
+        """Zda poslední hodnota pochází z TRV (všechny senzory nedostupné)."""
+        return self._using_fallback
+
+    def update(self, entity_id: str, value: Optional[float], timestamp: Optional[float] = None):
+        """Nová hodnota zdroje (None = nedostupný) - úprava součtů o rozdíl."""
+        weight = self._weights.get(entity_id)
+        if weight is None:
+            return
+
+        old = self._values.pop(entity_id, None)
+        if old is not None:
+            self._weighted_sum -= weight * old
+            self._weight_total -= weight
+        self._updated_at.pop(entity_id, None)
+
+        if value is not None:
+            self._values[entity_id] = value
+            self._updated_at[entity_id] = timestamp
+            self._weighted_sum += weight * value
+            self._weight_total += weight
+
+        if not self._values:
+            # Zahodit nasčítanou zaokrouhlovací chybu
+            self._weighted_sum = 0.0
+            self._weight_total = 0.0
+
+    def update_from_state(self, entity_id: str, state):
+        """Aktualizovat zdroj ze stavu HA."""
+        if state is None or state.state in UNAVAILABLE_STATES:
+            self.update(entity_id, None)
+            return
+        try:
+            value = float(state.state)
+        except ValueError:
+            _LOGGER.error(f"TRV [{self._room_name}]: Invalid temperature value from {entity_id}: {state.state}")
+            self.update(entity_id, None)
+            return
+
+        timestamp = _state_timestamp(state)
+        if self._values.get(entity_id) == value:
+            # Stejná hodnota - jen posunout čas hlášení (součty se nemění)
+            self._updated_at[entity_id] = timestamp
+            return
+        self.update(entity_id, value, timestamp)
+
+    def sync(self, hass):
+        """Dorovnat zdroje podle aktuálních stavů (hlášení bez změny hodnoty)."""
+        for entity_id in self._weights:
+            self.update_from_state(entity_id, hass.states.get(entity_id))
+
+    def _stale(self, now: float) -> list[str]:
+        """Dostupné zdroje bez hlášení déle než stale_after."""
+        return [
+            entity_id
+            for entity_id, updated_at in self._updated_at.items()
+            if now - updated_at > self._stale_after
+        ]
+
+    def value(self, now: float, trv_temperatures: Optional[list[float]] = None) -> Optional[float]:
+        """Fúzovaná teplota (None = žádný zdroj)."""
+        self._using_fallback = False
+
+        if self._values:
+            weighted_sum = self._weighted_sum
+            weight_total = self._weight_total
+            stale = self._stale(now)
+            if stale and len(stale) < len(self._values):
+                for entity_id in stale:
+                    weighted_sum -= self._weights[entity_id] * self._values[entity_id]
+                    weight_total -= self._weights[entity_id]
+            return weighted_sum / weight_total
+
+        if self._trv_fallback and trv_temperatures:
+            self._using_fallback = True
+            return sum(trv_temperatures) / len(trv_temperatures)
+
+        return None
+
+    def contributions(self, now: float) -> dict:
+        """Příspěvek jednotlivých zdrojů (hodnota, váha, podíl, stáří)."""
+        stale = set(self._stale(now))
+        all_stale = len(stale) == len(self._values)
+        active = {e for e in self._values if e not in stale or all_stale}
+        active_weight = sum(self._weights[e] for e in active)
+
+        result = {}
+        for entity_id, weight in self._weights.items():
+            if entity_id not in self._values:
+                result[entity_id] = {"weight": weight, "status": "unavailable", "share": 0.0}
+                continue
+            result[entity_id] = {
+                "value": self._values[entity_id],
+                "weight": weight,
+                "status": "stale" if entity_id in stale else "ok",
+                "share": round(100 * weight / active_weight, 1) if entity_id in active else 0.0,
+                "age": round(now - self._updated_at[entity_id]),
+            }
+        return result
@@ -0,0 +1,124 @@
+"""Sdílené odběry změn entit pro všechny místnosti domény."""
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .snapshot import UNAVAILABLE_STATES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class EntityChange:
+    """Naparsovaná změna stavu entity (sdílená všemi odběrateli)."""
+
+    entity_id: str
+    old_state: Any  # homeassistant.core.State | None
+    new_state: Any  # homeassistant.core.State | None
+    available: bool
+    value: Optional[float]  # číselný stav (teplota, target, poloha ventilu)
+    is_on: bool  # binary_sensor "on" (okna, dveře)
+    timestamp: Optional[float]  # last_updated nového stavu
+
+    @classmethod
+    def from_event(cls, event) -> "EntityChange":
+        """Naparsovat state_changed událost."""
+        new_state = event.data.get("new_state")
+        available = new_state is not None and new_state.state not in UNAVAILABLE_STATES
+
+        value = None
+        if available:
+            try:
+                value = float(new_state.state)
+            except ValueError:
+                pass
+
+        return cls(
+            entity_id=event.data.get("entity_id"),
+            old_state=event.data.get("old_state"),
+            new_state=new_state,
+            available=available,
+            value=value,
+            is_on=new_state is not None and new_state.state == "on",
+            timestamp=new_state.last_updated.timestamp() if new_state is not None else None,
+        )
+
+
+class EntitySubscriptionHub:
+    """Jeden HA listener na entitu, jedno parsování, rozeslání jen závislým.
+
+    Místnosti, které sdílí entitu (společný target helper, dveře na chodbě,
+    venkovní senzor), dostanou stejnou naparsovanou `EntityChange` a HA
+    drží jen jeden odběr. Odběr entity se zruší s posledním odběratelem.
+    """
+
+    def __init__(self, hass):
+        """Inicializace hubu."""
+        self._hass = hass
+        self._subscribers: dict[str, list[Callable[[EntityChange], None]]] = {}
+        self._unsubs: dict[str, Callable[[], None]] = {}
+        self._events_total = 0
+        self._notifications_total = 0
+        self._callback_errors_total = 0
+
+    @callback
+    def async_subscribe(
+        self, entity_ids, change_callback: Callable[[EntityChange], None]
+    ) -> Callable[[], None]:
+        """Odebírat změny entit (vrací funkci pro odhlášení)."""
+        entity_ids = list(dict.fromkeys(entity_id for entity_id in entity_ids if entity_id))
+        for entity_id in entity_ids:
+            subscribers = self._subscribers.setdefault(entity_id, [])
+            subscribers.append(change_callback)
+            if entity_id not in self._unsubs:
+                self._unsubs[entity_id] = async_track_state_change_event(
+                    self._hass, [entity_id], self._async_state_changed
+                )
+
+        @callback
+        def _unsubscribe():
+            for entity_id in entity_ids:
+                subscribers = self._subscribers.get(entity_id)
+                if not subscribers or change_callback not in subscribers:
+                    continue
+                subscribers.remove(change_callback)
+                if not subscribers:
+                    del self._subscribers[entity_id]
+                    self._unsubs.pop(entity_id)()
+
+        return _unsubscribe
+
+    def get_state(self, entity_id: str):
+        """Aktuální stav entity (výchozí hodnota pro nové odběratele)."""
+        return self._hass.states.get(entity_id)
+
+    @callback
+    def _async_state_changed(self, event):
+        """Naparsovat jednou a rozeslat odběratelům entity."""
+        self._events_total += 1
+        change = EntityChange.from_event(event)
+        for change_callback in list(self._subscribers.get(change.entity_id, ())):
+            self._notifications_total += 1
+            # Chyba jednoho odběratele nesmí připravit ostatní o změnu
+            try:
+                change_callback(change)
+            except Exception:
+                self._callback_errors_total += 1
+                _LOGGER.exception(
+                    f"TRV subscription hub: subscriber {change_callback!r} failed "
+                    f"for {change.entity_id}"
+                )
+
+    def get_metrics(self) -> dict:
+        """Metriky hubu pro summary senzor a diagnostiku."""
+        return {
+            "entities": len(self._subscribers),
+            "subscriptions": sum(len(subs) for subs in self._subscribers.values()),
+            "shared_entities": sum(1 for subs in self._subscribers.values() if len(subs) > 1),
+            "events_total": self._events_total,
+            "notifications_total": self._notifications_total,
+            "callback_errors_total": self._callback_errors_total,
+        }
@@ -0,0 +1,170 @@
+"""Lehká měření latence - histogramy s pevnými buckety a časování fází."""
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from .const import (
+    PHASE_LATENCY_BUCKETS_MS,
+    PHASE_HISTOGRAM_WINDOW,
+    PHASE_SLOW_THRESHOLD_MS,
+)
+
+
+class LatencyHistogram:
+    """Histogram s pevnými buckety a klouzavým zapomínáním.
+
+    Jakmile počet vzorků přesáhne `window`, všechny čítače se vydělí dvěma -
+    starší data tak exponenciálně ztrácí váhu a paměť zůstává konstantní.
+    Maximum se při zapomínání posune na maximum poslední epochy, takže
+    pokrývá jen poslední zhruba 1-2 okna (jednorázová špička časem zmizí).
+    """
+
+    __slots__ = ("_bounds", "_counts", "_window", "_count", "_sum", "_max", "_epoch_max")
+
+    def __init__(self, bounds: tuple, window: int):
+        """Inicializace histogramu (bounds = horní meze bucketů, vzestupně)."""
+        self._bounds = tuple(bounds)
+        # Poslední bucket je přetečení (> poslední mez)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._window = window
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._epoch_max = 0.0  # Maximum od posledního zapomínání
+
+    @property
+    def count(self) -> int:
+        """Počet vzorků (po zapomínání)."""
+        return self._count
+
+    def add(self, value: float):
+        """Přidat vzorek."""
+        index = len(self._bounds)
+        for i, bound in enumerate(self._bounds):
+            if value <= bound:
+                index = i
+                break
+
+        self._counts[index] += 1
+        self._count += 1
+        self._sum += value
+        if value > self._max:
+            self._max = value
+        if value > self._epoch_max:
+            self._epoch_max = value
+
+        if self._count > self._window:
+            self._counts = [c // 2 for c in self._counts]
+            self._sum /= 2
+            self._count = sum(self._counts)
+            self._max = self._epoch_max
+            self._epoch_max = 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Odhad percentilu (lineární interpolace uvnitř bucketu)."""
+        if self._count == 0:
+            return None
+
+        rank = q / 100 * self._count
+        cumulative = 0
+        for i, bucket_count in enumerate(self._counts):
+            if bucket_count == 0:
+                continue
+            if cumulative + bucket_count >= rank:
+                lower = self._bounds[i - 1] if i > 0 else 0.0
+                upper = self._bounds[i] if i < len(self._bounds) else max(self._max, lower)
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, self._max)
+            cumulative += bucket_count
+
+        return self._max
+
+    def summary(self, digits: int = 1) -> dict:
+        """Souhrn pro atributy senzorů."""
+        if self._count == 0:
+            return {"count": 0}
+
+        def _round(value):
+            return round(value, digits) if value is not None else None
+
+        return {
+            "count": self._count,
+            "avg": _round(self._sum / self._count),
+            "p50": _round(self.percentile(50)),
+            "p95": _round(self.percentile(95)),
+            "p99": _round(self.percentile(99)),
+            "max": _round(self._max),
+        }
+
+    def to_dict(self) -> dict:
+        """Serializace pro JSON."""
+        return {
+            "counts": list(self._counts),
+            "sum": self._sum,
+            "max": self._max,
+            "epoch_max": self._epoch_max,
+        }
+
+    @classmethod
+    def from_dict(cls, bounds: tuple, window: int, data: Optional[dict]):
+        """Deserializace z JSON (při změně bucketů se začíná znovu)."""
+        histogram = cls(bounds, window)
+        if not data:
+            return histogram
+
+        counts = data.get("counts", [])
+        if len(counts) == len(histogram._counts):
+            histogram._counts = [int(c) for c in counts]
+            histogram._count = sum(histogram._counts)
+            histogram._sum = data.get("sum", 0.0)
+            histogram._max = data.get("max", 0.0)
+            histogram._epoch_max = data.get("epoch_max", histogram._max)
+        return histogram
+
+
+class PhaseTimer:
+    """Časování fází update smyčky (time.perf_counter, bez alokací navíc)."""
+
+    def __init__(self):
+        """Inicializace časovače."""
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._slow_calls: dict[str, int] = {}
+        self._last_ms: dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, phase: str):
+        """Změřit dobu běhu bloku (funguje i kolem `await`)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, (time.perf_counter() - start) * 1000)
+
+    def record(self, phase: str, elapsed_ms: float):
+        """Zaznamenat změřenou dobu fáze."""
+        histogram = self._histograms.get(phase)
+        if histogram is None:
+            histogram = LatencyHistogram(PHASE_LATENCY_BUCKETS_MS, PHASE_HISTOGRAM_WINDOW)
+            self._histograms[phase] = histogram
+            self._slow_calls[phase] = 0
+
+        histogram.add(elapsed_ms)
+        self._last_ms[phase] = elapsed_ms
+        if elapsed_ms >= PHASE_SLOW_THRESHOLD_MS:
+            self._slow_calls[phase] += 1
+
+    def percentile(self, phase: str, q: float) -> Optional[float]:
+        """Percentil doby fáze v ms."""
+        histogram = self._histograms.get(phase)
+        return histogram.percentile(q) if histogram else None
+
+    def get_stats(self) -> dict:
+        """Statistiky všech fází (ms)."""
+        return {
+            phase: {
+                **histogram.summary(),
+                "last": round(self._last_ms.get(phase, 0.0), 1),
+                "slow_calls": self._slow_calls.get(phase, 0),
+            }
+            for phase, histogram in self._histograms.items()
+        }
@@ -0,0 +1,128 @@
+"""Warm-start učení - apriorní odhad naučených parametrů z podobných místností."""
+import logging
+import math
+from typing import Optional
+
+from .const import (
+    PRIOR_MAX_WEIGHT,
+    PRIOR_MIN_SIMILARITY,
+    PRIOR_RATE_SCALE,
+    PRIOR_TRV_MISMATCH,
+    PRIOR_DURATION_CV,
+)
+from .cycles import CycleRecord
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def heating_rate(cycle: CycleRecord) -> Optional[float]:
+    """Rychlost ohřevu cyklu (°C/h), None pokud ji z cyklu nelze určit."""
+    duration = cycle.heating_duration
+    start_temp = cycle.start_temp
+    stop_temp = cycle.stop_temp
+    if not duration or start_temp is None or stop_temp is None:
+        return None
+    rate = (stop_temp - start_temp) / (duration / 3600)
+    return rate if rate > 0 else None
+
+
+def similarity(
+    trv_count: int, rate: float, other_trv_count: int, other_rate: float
+) -> float:
+    """Podobnost dvou místností (0-1) podle počtu TRV a rychlosti ohřevu."""
+    score = math.exp(-abs(math.log(rate / other_rate)) / PRIOR_RATE_SCALE)
+    if trv_count != other_trv_count:
+        score *= PRIOR_TRV_MISMATCH
+    return score
+
+
+class LearningPrior:
+    """Prior pro dobu topení a překmit ve formě pseudo-cyklů.
+
+    Normální model se známým rozptylem: prior odpovídá `weight` cyklům
+    s průměry `duration`/`overshoot`, posterior po n vlastních cyklech je
+    vážený průměr (weight·prior + Σ cyklů) / (weight + n). Vlastní cykly
+    prior postupně přebijí, po naplnění performance history se nepoužívá.
+    """
+
+    def __init__(self, duration: float, overshoot: float, weight: float, sources: dict[str, float]):
+        """Inicializace prioru."""
+        self.duration = duration
+        self.overshoot = overshoot
+        self.weight = weight
+        self.sources = sources  # místnost → podobnost
+
+    def posterior(self, durations: list[float], overshoots: list[float]) -> tuple[float, float]:
+        """Posteriorní průměr doby topení a překmitu."""
+        total = self.weight + len(durations)
+        return (
+            (self.weight * self.duration + sum(durations)) / total,
+            (self.weight * self.overshoot + sum(overshoots)) / total,
+        )
+
+    def get_stats(self) -> dict:
+        """Stav prioru pro senzory a diagnostiku."""
+        return {
+            "duration": round(self.duration),
+            "overshoot": round(self.overshoot, 2),
+            "weight": round(self.weight, 2),
+            "sources": {room: round(score, 2) for room, score in self.sources.items()},
+        }
+
+    def to_dict(self) -> dict:
+        """Serializace pro JSON úložiště."""
+        return {
+            "duration": self.duration,
+            "overshoot": self.overshoot,
+            "weight": self.weight,
+            "sources": self.sources,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["LearningPrior"]:
+        """Obnovit z úložiště (None = prior nebyl sestaven)."""
+        if not data:
+            return None
+        return cls(data["duration"], data["overshoot"], data["weight"], data.get("sources", {}))
+
+
+def build_learning_prior(
+    room_name: str, trv_count: int, rate: float, candidates: list[dict]
+) -> Optional[LearningPrior]:
+    """Sestavit prior z profilů naučených místností.
+
+    `candidates` jsou profily (viz RoomController.learning_profile):
+    room, trv_count, heating_rate, avg_heating_duration, avg_overshoot.
+    Váha prioru roste s podobností a klesá, když se podobné místnosti
+    v době topení neshodují.
+    """
+    scored = []
+    for profile in candidates:
+        score = similarity(trv_count, rate, profile["trv_count"], profile["heating_rate"])
+        if score >= PRIOR_MIN_SIMILARITY:
+            scored.append((score, profile))
+    if not scored:
+        _LOGGER.debug(f"TRV [{room_name}]: No similar learned room for learning prior")
+        return None
+
+    total = sum(score for score, _ in scored)
+    duration = sum(score * p["avg_heating_duration"] for score, p in scored) / total
+    overshoot = sum(score * p["avg_overshoot"] for score, p in scored) / total
+    variance = sum(score * (p["avg_heating_duration"] - duration) ** 2 for score, p in scored) / total
+    cv = math.sqrt(variance) / duration if duration > 0 else 0.0
+
+    mean_similarity = sum(score * score for score, _ in scored) / total
+    weight = PRIOR_MAX_WEIGHT * mean_similarity / (1 + (cv / PRIOR_DURATION_CV) ** 2)
+
+    prior = LearningPrior(
+        duration,
+        overshoot,
+        weight,
+        {p["room"]: score for score, p in scored},
+    )
+    _LOGGER.info(
+        f"TRV [{room_name}]: Learning prior from {len(scored)} similar room(s): "
+        f"duration={duration:.0f}s, overshoot={overshoot:.2f}°C, "
+        f"weight={weight:.1f} cycle(s)"
+    )
+    return prior
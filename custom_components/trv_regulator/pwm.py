@@ -0,0 +1,226 @@
+"""Časově proporcionální (PWM) řízení a srovnání režimů řízení."""
+import logging
+import math
+import time
+from typing import Optional
+
+from .const import (
+    PWM_MIN_ON,
+    PWM_MIN_OFF,
+    PWM_HOLD_GAIN,
+    PWM_GAIN_ALPHA,
+    PWM_DEFAULT_HOLD_DUTY,
+    BENCHMARK_MAX_TICK_GAP,
+)
+from .cycles import CycleRecord
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PwmController:
+    """Výpočet střídy pro pevnou periodu z naučeného tepelného zisku místnosti.
+
+    Tepelný zisk (°C/h při plně otevřené TRV) se učí z validních cyklů
+    (ON/OFF i PWM): (max_temp - start_temp) / doba topení. Střída periody:
+
+        duty = hold_duty + (target - temp) / (zisk × perioda_h)
+
+    `hold_duty` je integrační složka - na konci každé periody se posune
+    podle zbývající odchylky, takže se ustálí na střídě, která drží target.
+    """
+
+    def __init__(self, room_name: str, period: float):
+        """Inicializace PWM regulátoru."""
+        self._room_name = room_name
+        self._period = period
+        self._gain: Optional[float] = None  # °C/h
+        self._hold_duty = PWM_DEFAULT_HOLD_DUTY
+
+        self._period_start: Optional[float] = None
+        self._on_time = 0.0
+        self._duty = 0.0
+        self._pulses = 0
+        self._skipped_periods = 0
+
+    @property
+    def period(self) -> float:
+        """Délka periody (s)."""
+        return self._period
+
+    @property
+    def gain(self) -> Optional[float]:
+        """Naučený tepelný zisk (°C/h), None dokud není žádný cyklus."""
+        return self._gain
+
+    @property
+    def ready(self) -> bool:
+        """Zda je model dost naučený pro PWM."""
+        return self._gain is not None
+
+    @property
+    def on_time(self) -> float:
+        """Doba zapnutí v aktuální periodě (s)."""
+        return self._on_time
+
+    @property
+    def period_elapsed(self) -> bool:
+        """Zda aktuální perioda skončila (nebo ještě žádná nezačala)."""
+        return self._period_start is None or time.time() - self._period_start >= self._period
+
+    def observe_cycle(self, cycle: CycleRecord):
+        """Zpřesnit tepelný zisk z validního cyklu."""
+        if cycle.valve_opening is not None and cycle.valve_opening < 100:
+            return  # Přivřený ventil - zisk by vyšel podhodnocený
+        duration = cycle.heating_duration or 0
+        rise = (cycle.max_temp or 0) - (cycle.start_temp or 0)
+        if duration <= 0 or rise <= 0:
+            return
+
+        gain = rise / (duration / 3600)
+        if self._gain is None:
+            self._gain = gain
+        else:
+            self._gain += PWM_GAIN_ALPHA * (gain - self._gain)
+
+    def start_period(self, temp: float, target: float) -> float:
+        """Začít novou periodu - vrací dobu zapnutí v sekundách (0 = bez pulzu)."""
+        now = time.time()
+        period_h = self._period / 3600
+
+        # Integrační složka: odchylka na konci předchozí periody
+        if self._period_start is not None:
+            self._hold_duty += PWM_HOLD_GAIN * (target - temp) / (self._gain * period_h)
+            self._hold_duty = min(1.0, max(0.0, self._hold_duty))
+
+        duty = self._hold_duty + (target - temp) / (self._gain * period_h)
+        max_duty = (self._period - PWM_MIN_OFF) / self._period
+        duty = min(max_duty, max(0.0, duty))
+
+        on_time = duty * self._period
+        if on_time < PWM_MIN_ON:
+            on_time = 0.0
+            self._skipped_periods += 1
+        else:
+            self._pulses += 1
+
+        self._period_start = now
+        self._duty = duty
+        self._on_time = on_time
+        _LOGGER.debug(
+            f"TRV [{self._room_name}]: PWM period started "
+            f"(duty={duty:.2f}, on_time={on_time:.0f}s, hold_duty={self._hold_duty:.2f}, "
+            f"gain={self._gain:.2f}°C/h)"
+        )
+        return on_time
+
+    def reset_period(self):
+        """Zahodit rozběhnutou periodu (okno, změna targetu, návrat z jiného režimu)."""
+        self._period_start = None
+        self._on_time = 0.0
+
+    def set_period(self, period: float):
+        """Změnit délku periody (live options) - rozběhnutá perioda doběhne."""
+        self._period = period
+
+    def period_state(self) -> dict:
+        """Rozběhnutá perioda pro warm restart."""
+        return {"period_start": self._period_start, "on_time": self._on_time}
+
+    def restore_period(self, data: Optional[dict]):
+        """Obnovit rozběhnutou periodu po restartu."""
+        if data:
+            self._period_start = data.get("period_start")
+            self._on_time = data.get("on_time", 0.0)
+
+    def get_stats(self) -> dict:
+        """Stav PWM pro senzory."""
+        return {
+            "period": self._period,
+            "gain": round(self._gain, 2) if self._gain is not None else None,
+            "hold_duty": round(self._hold_duty, 3),
+            "duty": round(self._duty, 3),
+            "on_time": round(self._on_time),
+            "pulses": self._pulses,
+            "skipped_periods": self._skipped_periods,
+        }
+
+    def to_dict(self) -> dict:
+        """Serializace naučeného stavu."""
+        return {
+            "gain": self._gain,
+            "hold_duty": self._hold_duty,
+            "pulses": self._pulses,
+            "skipped_periods": self._skipped_periods,
+        }
+
+    @classmethod
+    def from_dict(cls, room_name: str, period: float, data: Optional[dict]) -> "PwmController":
+        """Obnovit z persistence."""
+        controller = cls(room_name, period)
+        if data:
+            controller._gain = data.get("gain")
+            controller._hold_duty = data.get("hold_duty", PWM_DEFAULT_HOLD_DUTY)
+            controller._pulses = data.get("pulses", 0)
+            controller._skipped_periods = data.get("skipped_periods", 0)
+        return controller
+
+
+class ControlBenchmark:
+    """Srovnání režimů řízení: příkazy za hodinu a odchylka od targetu.
+
+    Každý tick přičte čas, počet nových příkazů pro TRV a odchylku teploty
+    k aktuálně aktivnímu režimu. VENT/ERROR se nezapočítávají.
+    """
+
+    def __init__(self):
+        """Inicializace."""
+        self._modes: dict[str, dict] = {}
+        self._last_tick: Optional[float] = None
+        self._last_commands: Optional[int] = None
+
+    def tick(self, mode: Optional[str], temp: float, target: float, commands_total: int, now: float):
+        """Započítat uplynulý interval do režimu `mode` (None = nepočítat)."""
+        last_tick, last_commands = self._last_tick, self._last_commands
+        self._last_tick, self._last_commands = now, commands_total
+        if mode is None or last_tick is None:
+            return
+
+        dt = now - last_tick
+        if dt <= 0 or dt > BENCHMARK_MAX_TICK_GAP:
+            return
+
+        stats = self._modes.setdefault(
+            mode, {"seconds": 0.0, "commands": 0, "abs_error": 0.0, "sq_error": 0.0}
+        )
+        error = temp - target
+        stats["seconds"] += dt
+        stats["commands"] += max(0, commands_total - last_commands)
+        stats["abs_error"] += abs(error) * dt
+        stats["sq_error"] += error * error * dt
+
+    def get_stats(self) -> dict:
+        """Souhrn per režim."""
+        result = {}
+        for mode, stats in self._modes.items():
+            seconds = stats["seconds"]
+            if seconds <= 0:
+                continue
+            result[mode] = {
+                "hours": round(seconds / 3600, 1),
+                "commands_per_hour": round(stats["commands"] / (seconds / 3600), 2),
+                "mean_abs_error": round(stats["abs_error"] / seconds, 3),
+                "rms_error": round(math.sqrt(stats["sq_error"] / seconds), 3),
+            }
+        return result
+
+    def to_dict(self) -> dict:
+        """Serializace."""
+        return {mode: dict(stats) for mode, stats in self._modes.items()}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "ControlBenchmark":
+        """Obnovit z persistence."""
+        benchmark = cls()
+        if data:
+            benchmark._modes = {mode: dict(stats) for mode, stats in data.items()}
+        return benchmark
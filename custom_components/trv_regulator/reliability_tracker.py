@@ -4,6 +4,18 @@ from collections import deque, defaultdict
 from datetime import datetime, timedelta
 from typing import Optional
 
+from .const import (
+    ACK_LATENCY_BUCKETS,
+    ACK_HISTOGRAM_WINDOW,
+    TRV_COMMAND_VERIFY_DELAY,
+    VERIFY_TIMEOUT_PERCENTILE,
+    VERIFY_TIMEOUT_MARGIN,
+    VERIFY_TIMEOUT_MIN,
+    VERIFY_TIMEOUT_MAX,
+    VERIFY_TIMEOUT_MIN_SAMPLES,
+)
+from .perf import LatencyHistogram
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -16,9 +28,11 @@ class ReliabilityTracker:
         
         # Counters
         self._commands_sent_total = 0
+        self._commands_superseded_total = 0  # Nahrazené ve frontě (neodeslané)
         self._commands_failed_total = 0
         self._watchdog_corrections_total = 0
         self._mode_mismatches_total = 0  # NEW!
+        self._setpoint_clamps_total = 0
         
         # Per-TRV tracking
         self._per_trv_sent = defaultdict(int)
@@ -26,6 +40,11 @@ class ReliabilityTracker:
         self._per_trv_last_seen = {}
         self._per_trv_mode_mismatches = defaultdict(int)  # NEW!
         self._per_trv_preferred_mode = {}  # NEW!
+        self._per_trv_setpoint_clamps = defaultdict(int)
+        self._per_trv_effective_setpoints = defaultdict(dict)
+        self._per_trv_ack_latency = {}
+        self._per_trv_ack_timeouts = defaultdict(int)
+        self._per_trv_consecutive_ack_timeouts = defaultdict(int)
         
         # Per-TRV detailed statistics (v3.0.25+)
         self._trv_stats = defaultdict(lambda: {
@@ -51,6 +70,21 @@ class ReliabilityTracker:
         self._command_history = deque(maxlen=10)
         self._correction_history = deque(maxlen=10)
 
+    @property
+    def commands_sent_total(self) -> int:
+        """Total commands sent to TRVs (superseded commands excluded)."""
+        return self._commands_sent_total
+
+    @property
+    def commands_failed_total(self) -> int:
+        """Total failed commands."""
+        return self._commands_failed_total
+
+    @property
+    def effective_setpoints(self) -> dict[str, dict[str, float]]:
+        """Learned effective ON/OFF setpoints per TRV (copy)."""
+        return {entity_id: dict(setpoints) for entity_id, setpoints in self._per_trv_effective_setpoints.items()}
+
     def command_sent(self, entity_id: str):
         """Track command sent to TRV."""
         now = datetime.now()
@@ -71,13 +105,17 @@ class ReliabilityTracker:
         self._events_7d.append(event)
         self._events_30d.append(event)
 
+    def command_superseded(self, entity_id: str):
+        """Příkaz nahrazený ve frontě novějším záměrem (nepočítá se jako odeslaný)."""
+        self._commands_superseded_total += 1
+
     def command_failed(self, entity_id: str, expected: dict, actual: dict, reason: Optional[str] = None):
         """Track failed command - only REAL failures!"""
         now = datetime.now()
         timestamp = now.timestamp()
         
-        # COUNT only REAL failures (temp mismatch, offline, no_response)
-        if reason in ["temperature_mismatch", "offline", "no_response"]:
+        # COUNT only REAL failures (temp/valve mismatch, offline, no_response)
+        if reason in ["temperature_mismatch", "valve_mismatch", "offline", "no_response"]:
             self._commands_failed_total += 1
             self._per_trv_failed[entity_id] += 1
             
@@ -188,6 +226,68 @@ class ReliabilityTracker:
             "note": f"TRV prefers {actual_mode} mode",
         })
 
+    def setpoint_clamped(self, entity_id: str, requested: float, effective: float):
+        """Track learned setpoint clamp (confirmed by repeated observations) - NOT a failure!"""
+        self._setpoint_clamps_total += 1
+        self._per_trv_setpoint_clamps[entity_id] += 1
+        
+        key = "on" if requested > effective else "off"
+        self._per_trv_effective_setpoints[entity_id][key] = effective
+        
+        _LOGGER.debug(
+            f"Reliability [{self._room_name}]: Setpoint for {entity_id} clamped "
+            f"{requested}°C → {effective}°C (TRV capability)"
+        )
+
+    def setpoint_clamp_cleared(self, entity_id: str, key: str):
+        """Forget learned clamp ("on"/"off") - TRV accepted a setpoint beyond it."""
+        self._per_trv_effective_setpoints[entity_id].pop(key, None)
+        if not self._per_trv_effective_setpoints[entity_id]:
+            del self._per_trv_effective_setpoints[entity_id]
+
+    def ack_received(self, entity_id: str, latency: float):
+        """Track acknowledgement latency (service call → setpoint/last_seen change)."""
+        self._ack_histogram(entity_id).add(latency)
+        self._per_trv_consecutive_ack_timeouts[entity_id] = 0
+
+    def ack_timed_out(self, entity_id: str):
+        """Track command without acknowledgement within verification window."""
+        self._per_trv_ack_timeouts[entity_id] += 1
+        self._per_trv_consecutive_ack_timeouts[entity_id] += 1
+
+    def verify_timeout(self, entity_id: str) -> float:
+        """Return verification timeout for TRV learned from acknowledgement latency.
+
+        High percentile + margin, clamped to floor/ceiling. Without enough samples
+        the fixed TRV_COMMAND_VERIFY_DELAY is used. Every consecutive timeout doubles
+        the value (late acks are never sampled, so the histogram alone would stay low).
+        """
+        if self.ack_latency_count(entity_id) < VERIFY_TIMEOUT_MIN_SAMPLES:
+            timeout = TRV_COMMAND_VERIFY_DELAY
+        else:
+            timeout = self.ack_latency_percentile(entity_id, VERIFY_TIMEOUT_PERCENTILE) + VERIFY_TIMEOUT_MARGIN
+        
+        timeout *= 2 ** min(self._per_trv_consecutive_ack_timeouts.get(entity_id, 0), 3)
+        return round(max(VERIFY_TIMEOUT_MIN, min(VERIFY_TIMEOUT_MAX, timeout)), 1)
+
+    def ack_latency_percentile(self, entity_id: str, q: float) -> Optional[float]:
+        """Return acknowledgement latency percentile in seconds (None without data)."""
+        histogram = self._per_trv_ack_latency.get(entity_id)
+        return histogram.percentile(q) if histogram else None
+
+    def ack_latency_count(self, entity_id: str) -> int:
+        """Return number of acknowledgement samples for TRV."""
+        histogram = self._per_trv_ack_latency.get(entity_id)
+        return histogram.count if histogram else 0
+
+    def _ack_histogram(self, entity_id: str) -> LatencyHistogram:
+        """Get (or create) acknowledgement latency histogram for TRV."""
+        histogram = self._per_trv_ack_latency.get(entity_id)
+        if histogram is None:
+            histogram = LatencyHistogram(ACK_LATENCY_BUCKETS, ACK_HISTOGRAM_WINDOW)
+            self._per_trv_ack_latency[entity_id] = histogram
+        return histogram
+
     def _cleanup_old_events(self):
         """Clean up events older than their window."""
         now = datetime.now().timestamp()
@@ -380,6 +480,7 @@ class ReliabilityTracker:
             failed = self._per_trv_failed.get(entity_id, 0)
             mode_mismatches = self._per_trv_mode_mismatches.get(entity_id, 0)
             preferred_mode = self._per_trv_preferred_mode.get(entity_id, "unknown")
+            setpoint_clamps = self._per_trv_setpoint_clamps.get(entity_id, 0)
             quality, rate = self._calculate_signal_quality(sent, failed)
             
             trv_statistics[entity_id] = {
@@ -389,15 +490,22 @@ class ReliabilityTracker:
                 "success_rate": round(rate, 1),
                 "signal_quality": quality,
                 "preferred_mode": preferred_mode,  # NEW!
+                "setpoint_clamps": setpoint_clamps,
+                "effective_setpoints": dict(self._per_trv_effective_setpoints.get(entity_id, {})),
+                "ack_latency": self._ack_histogram(entity_id).summary(digits=2),
+                "ack_timeouts": self._per_trv_ack_timeouts.get(entity_id, 0),
+                "verify_timeout": self.verify_timeout(entity_id),
                 "last_seen": self._per_trv_last_seen.get(entity_id),
             }
         
         return {
             # Overall metrics
             "commands_sent_total": self._commands_sent_total,
+            "commands_superseded_total": self._commands_superseded_total,
             "commands_failed_total": self._commands_failed_total,
             "watchdog_corrections_total": self._watchdog_corrections_total,
             "mode_mismatches_total": self._mode_mismatches_total,  # NEW!
+            "setpoint_clamps_total": self._setpoint_clamps_total,
             "reliability_rate": round(reliability_rate, 1),
             "signal_quality": signal_quality,
             "signal_trend": signal_trend,
@@ -433,15 +541,22 @@ class ReliabilityTracker:
         """Serialize for JSON storage."""
         return {
             "commands_sent_total": self._commands_sent_total,
+            "commands_superseded_total": self._commands_superseded_total,
             "commands_failed_total": self._commands_failed_total,
             "watchdog_corrections_total": self._watchdog_corrections_total,
             "mode_mismatches_total": self._mode_mismatches_total,  # NEW!
+            "setpoint_clamps_total": self._setpoint_clamps_total,
             
             "per_trv_sent": dict(self._per_trv_sent),
             "per_trv_failed": dict(self._per_trv_failed),
             "per_trv_last_seen": dict(self._per_trv_last_seen),
             "per_trv_mode_mismatches": dict(self._per_trv_mode_mismatches),  # NEW!
             "per_trv_preferred_mode": dict(self._per_trv_preferred_mode),  # NEW!
+            "per_trv_setpoint_clamps": dict(self._per_trv_setpoint_clamps),
+            "per_trv_effective_setpoints": {k: dict(v) for k, v in self._per_trv_effective_setpoints.items()},
+            "per_trv_ack_latency": {k: v.to_dict() for k, v in self._per_trv_ack_latency.items()},
+            "per_trv_ack_timeouts": dict(self._per_trv_ack_timeouts),
+            "per_trv_consecutive_ack_timeouts": dict(self._per_trv_consecutive_ack_timeouts),
             
             "trv_stats": dict(self._trv_stats),  # v3.0.25+
             
@@ -461,9 +576,11 @@ class ReliabilityTracker:
         
         # Restore counters
         tracker._commands_sent_total = data.get("commands_sent_total", 0)
+        tracker._commands_superseded_total = data.get("commands_superseded_total", 0)
         tracker._commands_failed_total = data.get("commands_failed_total", 0)
         tracker._watchdog_corrections_total = data.get("watchdog_corrections_total", 0)
         tracker._mode_mismatches_total = data.get("mode_mismatches_total", 0)  # NEW!
+        tracker._setpoint_clamps_total = data.get("setpoint_clamps_total", 0)
         
         # Restore per-TRV tracking
         tracker._per_trv_sent = defaultdict(int, data.get("per_trv_sent", {}))
@@ -471,6 +588,16 @@ class ReliabilityTracker:
         tracker._per_trv_last_seen = data.get("per_trv_last_seen", {})
         tracker._per_trv_mode_mismatches = defaultdict(int, data.get("per_trv_mode_mismatches", {}))  # NEW!
         tracker._per_trv_preferred_mode = dict(data.get("per_trv_preferred_mode", {}))  # NEW!
+        tracker._per_trv_setpoint_clamps = defaultdict(int, data.get("per_trv_setpoint_clamps", {}))
+        tracker._per_trv_effective_setpoints = defaultdict(dict, data.get("per_trv_effective_setpoints", {}))
+        tracker._per_trv_ack_latency = {
+            entity_id: LatencyHistogram.from_dict(ACK_LATENCY_BUCKETS, ACK_HISTOGRAM_WINDOW, histogram)
+            for entity_id, histogram in data.get("per_trv_ack_latency", {}).items()
+        }
+        tracker._per_trv_ack_timeouts = defaultdict(int, data.get("per_trv_ack_timeouts", {}))
+        tracker._per_trv_consecutive_ack_timeouts = defaultdict(
+            int, data.get("per_trv_consecutive_ack_timeouts", {})
+        )
         
         # Restore trv_stats (v3.0.25+)
         trv_stats_data = data.get("trv_stats", {})
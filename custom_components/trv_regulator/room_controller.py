@@ -1,14 +1,16 @@
 """Stavový automat pro řízení TRV v místnosti - ON/OFF režim s adaptivním učením."""
 import asyncio
-import json
+import dataclasses
 import logging
 import time
-import os
+import random
 from collections import deque
-from typing import Any, Optional
-from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Optional
+from datetime import datetime, timedelta
 
-from homeassistant.util.json import load_json
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_time_interval
 
 from .const import (
     STATE_IDLE,
@@ -25,20 +27,71 @@ from .const import (
     DEFAULT_MAX_VALID_OVERSHOOT,
     DEFAULT_COOLDOWN_DURATION,
     HISTORY_SIZE,
-    STORAGE_DIR,
-    STORAGE_FILE,
+    WARM_RESTART_MAX_AGE,
     SENSOR_OFFLINE_TIMEOUT,
     TRV_OFFLINE_TIMEOUT,
     TARGET_DEBOUNCE_DELAY,
-    TRV_COMMAND_VERIFY_DELAY,
     TRV_TEMP_TOLERANCE,
     FAILURE_REASON_TEMP_MISMATCH,
     FAILURE_REASON_MODE_MISMATCH,
     FAILURE_REASON_OFFLINE,
     FAILURE_REASON_NO_RESPONSE,
+    FAILURE_REASON_VALVE_MISMATCH,
     ERROR_LOG_RATE_LIMIT,
+    COMMAND_PRIORITY_SAFETY,
+    COMMAND_PRIORITY_HEATING,
+    COMMAND_PRIORITY_WATCHDOG,
+    POST_RESTART_VERIFY_TIMEOUT,
+    WATCHDOG_INTERVAL,
+    SETPOINT_CLAMP_ON_MIN,
+    SETPOINT_CLAMP_OFF_MAX,
+    SETPOINT_CLAMP_CONFIRMATIONS,
+    DEFAULT_TEMPERATURE_FILTER,
+    DEFAULT_FILTER_MEASUREMENT_NOISE,
+    DEFAULT_FILTER_PROCESS_NOISE,
+    PEAK_SLOPE_WINDOW,
+    PEAK_MIN_SAMPLES,
+    PEAK_MIN_SPAN,
+    PEAK_FALL_SLOPE,
+    DEFAULT_WINDOW_DETECTION,
+    DEFAULT_TEMPERATURE_SOURCE_TIMEOUT,
+    DEFAULT_TRV_TEMPERATURE_FALLBACK,
+    CONTROL_MODE_ONOFF,
+    CONTROL_MODE_PWM,
+    DEFAULT_CONTROL_MODE,
+    DEFAULT_PWM_PERIOD,
+    VALVE_MIN_OPENING,
+    VALVE_FULL_RATE_HORIZON,
+    VALVE_TOLERANCE,
+    VALVE_UPDATE_STEP,
+    DEFAULT_MIN_OFF_TIME,
+    DEFAULT_MAX_CYCLES_PER_HOUR,
+    DEFAULT_HYSTERESIS_AUTO_TUNE,
+    DEMAND_REMAINING_HORIZON,
+    DEFAULT_LEARNING_PRIOR,
+    PRIOR_MIN_CYCLES,
+    LEARNING_MIN_CYCLES,
+    LEARNING_EXTEND_CONFIDENCE,
+    LEARNING_MAX_CYCLES_FACTOR,
+    LEARNING_RELEARN_CONFIDENCE,
 )
+from .ack_watcher import TrvAckWatcher
+from .confidence import LearningConfidence
+from .cycles import CycleRecord, history_from_dicts
+from .cycling import ShortCycleGuard
+from .filters import SlopeEstimator, create_temperature_filter
+from .fusion import TemperatureFusion
+from .hub import EntityChange, EntitySubscriptionHub
+from .perf import PhaseTimer
+from .prior import LearningPrior, build_learning_prior, heating_rate
+from .pwm import ControlBenchmark, PwmController
 from .reliability_tracker import ReliabilityTracker
+from .snapshot import RoomSnapshot, build_room_snapshot
+from .statistics import CycleStatistics
+from .storage import LearnedParamsStore, RuntimeStateStore
+from .watchdog import TrvWatchdog
+from .window_detection import TemperatureWindowDetector
+from .windows import WindowContactTracker
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -68,6 +121,24 @@ class RoomController:
         max_valid_overshoot: float = DEFAULT_MAX_VALID_OVERSHOOT,
         cooldown_duration: int = DEFAULT_COOLDOWN_DURATION,
         recovery_threshold: float = 1.0,
+        command_scheduler=None,
+        temperature_filter: str = DEFAULT_TEMPERATURE_FILTER,
+        filter_measurement_noise: float = DEFAULT_FILTER_MEASUREMENT_NOISE,
+        filter_process_noise: float = DEFAULT_FILTER_PROCESS_NOISE,
+        window_detection: bool = DEFAULT_WINDOW_DETECTION,
+        temperature_sources: Optional[list[dict]] = None,
+        temperature_source_timeout: int = DEFAULT_TEMPERATURE_SOURCE_TIMEOUT,
+        trv_temperature_fallback: bool = DEFAULT_TRV_TEMPERATURE_FALLBACK,
+        control_mode: str = DEFAULT_CONTROL_MODE,
+        pwm_period: int = DEFAULT_PWM_PERIOD,
+        min_off_time: int = DEFAULT_MIN_OFF_TIME,
+        max_cycles_per_hour: int = DEFAULT_MAX_CYCLES_PER_HOUR,
+        hysteresis_auto_tune: bool = DEFAULT_HYSTERESIS_AUTO_TUNE,
+        learning_prior: bool = DEFAULT_LEARNING_PRIOR,
+        room_index=None,
+        subscription_hub: Optional[EntitySubscriptionHub] = None,
+        learned_params_store: Optional[LearnedParamsStore] = None,
+        runtime_state_store: Optional[RuntimeStateStore] = None,
     ):
         """Inicializace controlleru."""
         self._hass = hass
@@ -85,6 +156,10 @@ class RoomController:
         self._max_valid_overshoot = max_valid_overshoot
         self._cooldown_duration = cooldown_duration
         self._recovery_threshold = recovery_threshold
+        self._command_scheduler = command_scheduler
+        self._store = learned_params_store or LearnedParamsStore(hass)
+        self._runtime_store = runtime_state_store or RuntimeStateStore(hass)
+        self._control_mode = control_mode
 
         # Stavový automat
         self._state = STATE_IDLE
@@ -98,6 +173,11 @@ class RoomController:
         self._avg_overshoot = None
         self._last_learned = None
         
+        # Warm-start učení - prior z podobných místností (index místností domény)
+        self._learning_prior_enabled = learning_prior
+        self._room_index = room_index
+        self._learning_prior: Optional[LearningPrior] = None
+        
         # POST-VENT režim
         self._post_vent_mode = False
         
@@ -106,15 +186,15 @@ class RoomController:
         self._recovery_temp_delta = None  # Store temp delta for logging
         
         # Aktuální cyklus
-        self._current_cycle = {}
+        self._current_cycle: Optional[CycleRecord] = None
         self._heating_start_time = None
         self._heating_start_temp = None
         self._heating_target_temp = None
         self._cooldown_start_time = None
         self._cooldown_max_temp = None
         
-        # Historie cyklů
-        self._history = []
+        # Historie cyklů (ring buffer)
+        self._history: deque = deque(maxlen=HISTORY_SIZE)
         
         # Monthly stats
         self._monthly_stats = {}
@@ -122,6 +202,9 @@ class RoomController:
         # Performance history pro kontinuální učení (klouzavý průměr)
         self._performance_history = deque(maxlen=self._learning_cycles_required)
         
+        # Spolehlivost učení - Welford přes cykly od začátku (nového) učení
+        self._learning_confidence = LearningConfidence()
+        
         # Error handling
         self._sensor_unavailable_since = None
         self._trv_unavailable_since = {}
@@ -136,15 +219,95 @@ class RoomController:
         # Reliability tracking
         self._reliability_tracker = ReliabilityTracker(room_name)
         
+        # Dlouhodobé statistiky cyklů (Recorder)
+        self._cycle_statistics = CycleStatistics(hass, room_name)
+        
         # Rate limiting pro ERROR logy
         self._last_no_response_error_log = {}
+        
+        # TRV čekající na post-restart bezpečnostní reset (watchdog je přeskakuje)
+        self._restart_reset_pending = set()
+        self._restart_reset_abort: Optional[asyncio.Event] = None  # nastaví start topení
+        
+        # Schopnosti TRV (min_temp/max_temp) pro ořezání ON/OFF setpointů
+        self._trv_capabilities = {}
+        # Kandidáti na ořezání: (entity_id, "on"/"off") → (nahlášený setpoint, počet po sobě)
+        self._setpoint_clamp_candidates: dict[tuple[str, str], tuple[float, int]] = {}
+        
+        # Watchdog (vlastní kadence, backoff, circuit breaker per TRV)
+        self._watchdog = TrvWatchdog(room_name)
+        self._watchdog_running = False
+        self._commands_in_flight = 0
+        self._unsub_listeners = []
+        
+        # Časování fází update smyčky (diagnostika výkonu)
+        self._perf = PhaseTimer()
+        
+        # Snapshot stavů entit pro aktuální tick (sdílí ho i senzory)
+        self._snapshot: Optional[RoomSnapshot] = None
+        
+        # Odběry změn entit (sdílené s ostatními místnostmi domény)
+        self._subscription_hub = subscription_hub or EntitySubscriptionHub(hass)
+        
+        # Otevřené kontakty oken/dveří udržované z událostí (O(1) dotaz)
+        self._window_tracker = WindowContactTracker(
+            hass,
+            self._subscription_hub,
+            room_name,
+            window_entities,
+            window_open_delay,
+            on_delay_expired=self._request_refresh,
+        )
+        
+        # Fúze teplotních zdrojů (primární senzor + volitelné další, záloha z TRV)
+        self._temperature_fusion = TemperatureFusion(
+            room_name,
+            temperature_sources or [{"entity": temperature_entity, "weight": 1.0}],
+            temperature_source_timeout,
+            trv_temperature_fallback,
+        )
+        self._temperature_fallback_logged = False
+        
+        # Volitelný streamový filtr teploty (krmený událostmi senzoru)
+        self._temperature_filter = create_temperature_filter(
+            temperature_filter, filter_measurement_noise, filter_process_noise
+        )
+        self._filter_suppressed_transitions = 0
+        self._filter_suppressing = False
+        
+        # Detekce vrcholu v COOLDOWN ze sklonu teploty (nezávislá na filtru)
+        self._peak_estimator = SlopeEstimator(PEAK_SLOPE_WINDOW)
+        
+        # Detekce okna z poklesu teploty (s kontakty jen stínově - statistiky)
+        self._window_detector = (
+            TemperatureWindowDetector(room_name, active=not window_entities)
+            if window_detection
+            else None
+        )
+
+        # PWM režim (pevná perioda, střída z naučeného tepelného zisku)
+        self._pwm = PwmController(room_name, pwm_period)
+        
+        # Srovnání režimů řízení (příkazy/h, odchylka od targetu)
+        self._control_benchmark = ControlBenchmark()
+        
+        # Řízení polohou ventilu (TRV s nakonfigurovanou number entitou)
+        self._valve_opening = 0  # požadované otevření (%) pro aktuální stav
+        self._valve_failed = set()  # TRV s neověřenou polohou ventilu → řízení setpointem
+        
+        # Ochrana proti krátkým cyklům (+ volitelné ladění hystereze)
+        self._cycle_guard = ShortCycleGuard(
+            room_name, hysteresis, min_off_time, max_cycles_per_hour, hysteresis_auto_tune
+        )
 
         _LOGGER.info(
-            f"TRV [{self._room_name}] initialized (ON/OFF mode): "
+            f"TRV [{self._room_name}] initialized ({control_mode} mode): "
             f"hysteresis={self._hysteresis}°C, "
             f"window_open_delay={self._window_open_delay}s, "
             f"learning_cycles_required={self._learning_cycles_required}, "
-            f"recovery_threshold={self._recovery_threshold}°C"
+            f"recovery_threshold={self._recovery_threshold}°C, "
+            f"temperature_filter={temperature_filter}, "
+            f"window_detection={window_detection}"
         )
 
     @property
@@ -152,6 +315,22 @@ class RoomController:
         """Aktuální stav."""
         return self._state
 
+    @property
+    def window_entities(self) -> list[str]:
+        """Nakonfigurované okenní kontakty."""
+        return list(self._window_entities)
+
+    @property
+    def config_entities(self) -> set[str]:
+        """Všechny nakonfigurované entity místnosti (senzory, okna, TRV, last_seen, ventily)."""
+        entities = {self._target_entity, *self._temperature_fusion.entities, *self._window_entities}
+        for trv_config in self._trv_entities:
+            entities.update(
+                (trv_config["entity"], trv_config.get("last_seen_sensor"), trv_config.get("valve_entity"))
+            )
+        entities.discard(None)
+        return entities
+
     @property
     def is_learning(self) -> bool:
         """Zda je v učícím režimu."""
@@ -177,18 +356,69 @@ class RoomController:
         """Průměrný překmit."""
         return self._avg_overshoot
 
+    @property
+    def learning_prior(self) -> Optional[dict]:
+        """Prior z podobných místností (None = nesestaven)."""
+        if self._learning_prior is None:
+            return None
+        return self._learning_prior.get_stats()
+
+    @property
+    def learning_confidence(self) -> dict:
+        """Spolehlivost naučených parametrů (při učení od jeho začátku, jinak z okna cyklů)."""
+        if self._is_learning:
+            return self._learning_confidence.get_stats()
+        return LearningConfidence.from_cycles(self._performance_history).get_stats()
+
+    @property
+    def learning_profile(self) -> Optional[dict]:
+        """Charakteristika naučené místnosti pro prior jiných místností."""
+        if self._is_learning or self._avg_heating_duration is None:
+            return None
+        rates = sorted(
+            rate
+            for rate in (
+                heating_rate(cycle)
+                for cycle in self._history
+                if cycle.valid and cycle.mode != CONTROL_MODE_PWM
+            )
+            if rate is not None
+        )
+        if not rates:
+            return None
+        return {
+            "room": self._room_name,
+            "trv_count": self._enabled_trv_count(),
+            "heating_rate": rates[len(rates) // 2],
+            "avg_heating_duration": self._avg_heating_duration,
+            "avg_overshoot": self._avg_overshoot or 0.0,
+        }
+
+    def _enabled_trv_count(self) -> int:
+        """Počet aktivních TRV."""
+        return sum(1 for trv in self._trv_entities if trv.get("enabled", True))
+
     @property
     def last_cycle(self) -> dict:
-        """Poslední cyklus."""
+        """Poslední cyklus (dict pro senzory a diagnostiku)."""
         if self._history:
-            return self._history[-1]
+            return self._history[-1].to_dict()
         return {}
 
     @property
-    def history(self) -> list:
-        """Historie cyklů."""
+    def history(self) -> deque:
+        """Historie cyklů (CycleRecord, nejstarší první)."""
         return self._history
 
+    def _in_pwm_cycle(self) -> bool:
+        """Zda aktuální cyklus je PWM pulz."""
+        return self._current_cycle is not None and self._current_cycle.mode == CONTROL_MODE_PWM
+
+    def _invalidate_current_cycle(self, reason: str):
+        """Vyřadit rozběhnutý cyklus z učení."""
+        if self._current_cycle is not None:
+            self._current_cycle.invalidate(reason)
+
     @property
     def heating_elapsed_seconds(self) -> Optional[float]:
         """Uběhlá doba topení v sekundách."""
@@ -205,87 +435,927 @@ class RoomController:
             return max(0, planned_duration - elapsed)
         return None
 
+    @property
+    def filtered_temperature(self) -> Optional[float]:
+        """Vyhlazená teplota (None bez filtru)."""
+        return self._temperature_filter.value if self._temperature_filter else None
+
+    @property
+    def temperature_slope(self) -> Optional[float]:
+        """Odhad sklonu teploty v °C/h (None bez filtru)."""
+        return self._temperature_filter.slope if self._temperature_filter else None
+
+    @property
+    def filter_suppressed_transitions(self) -> int:
+        """Počet přechodů, které by surová teplota spustila, ale filtr potlačil."""
+        return self._filter_suppressed_transitions
+
+    @property
+    def window_detection_stats(self) -> Optional[dict]:
+        """Statistiky detekce okna z teploty (None pokud vypnutá)."""
+        return self._window_detector.get_stats() if self._window_detector else None
+
+    @property
+    def control_mode(self) -> str:
+        """Nastavený režim řízení (onoff/pwm)."""
+        return self._control_mode
+
+    @property
+    def active_control_mode(self) -> str:
+        """Skutečně použitý režim (PWM až po naučení tepelného zisku)."""
+        return CONTROL_MODE_PWM if self._pwm_active() else CONTROL_MODE_ONOFF
+
+    @property
+    def pwm_stats(self) -> dict:
+        """Stav PWM regulátoru."""
+        return self._pwm.get_stats()
+
+    @property
+    def control_benchmark(self) -> dict:
+        """Příkazy za hodinu a odchylka od targetu per režim řízení."""
+        return self._control_benchmark.get_stats()
+
+    @property
+    def cycle_guard_stats(self) -> dict:
+        """Potlačené starty, ušetřené příkazy a efektivní hystereze."""
+        return self._cycle_guard.get_stats()
+
+    @property
+    def heat_demand(self) -> dict:
+        """Poptávka tepla místnosti (0-1) pro agregaci na úrovni domu.
+
+        Běžící topení vážené zbývající dobou cyklu (místnost těsně před
+        koncem už kotel nepotřebuje) a otevřením ventilu.
+        """
+        remaining = self._remaining_heating_time() if self._state == STATE_HEATING else None
+        demand = 0.0
+        if self._state == STATE_HEATING:
+            demand = 1.0 if remaining is None else min(1.0, remaining / DEMAND_REMAINING_HORIZON)
+            if self._has_valves():
+                demand *= self._valve_opening / 100
+        
+        # Naučená rychlost ohřevu (°C/h) - agregátor podle ní poptávku převáží
+        rate = self._pwm.gain if self._pwm.ready else None
+        if rate is None and (profile := self.learning_profile) is not None:
+            rate = profile["heating_rate"]
+        return {
+            "state": self._state,
+            "demand": round(demand, 2),
+            "remaining": round(remaining) if remaining is not None else None,
+            "heating_rate": round(rate, 2) if rate is not None and rate > 0 else None,
+        }
+
+    def _remaining_heating_time(self) -> Optional[float]:
+        """Odhad zbývající doby topení (s), None pokud nejde odhadnout."""
+        if not self._heating_start_time:
+            return None
+        elapsed = time.time() - self._heating_start_time
+        
+        if self._in_pwm_cycle():
+            planned = self._current_cycle.planned_duration
+        elif (
+            not self._post_vent_mode
+            and not self._is_learning
+            and not self._recovery_mode
+            and self._avg_heating_duration is not None
+        ):
+            planned = self._avg_heating_duration - self._time_offset
+        else:
+            # Topí se do targetu - odhad z naučeného tepelného zisku
+            snapshot = self._snapshot
+            if not self._pwm.ready or snapshot is None:
+                return None
+            if snapshot.temperature is None or snapshot.target is None:
+                return None
+            return max(0.0, (snapshot.target - snapshot.temperature) / self._pwm.gain * 3600)
+        
+        return max(0.0, planned - elapsed)
+
+    @property
+    def valve_positions(self) -> dict:
+        """Požadovaná a nahlášená poloha ventilů (jen TRV s valve_entity)."""
+        positions = {}
+        for trv_config in self._trv_entities:
+            valve_entity = trv_config.get("valve_entity")
+            if not valve_entity or not trv_config.get("enabled", True):
+                continue
+            positions[trv_config["entity"]] = {
+                "valve_entity": valve_entity,
+                "target": self._valve_opening,
+                "actual": self._valve_position(self._hass.states.get(valve_entity)),
+                "setpoint_fallback": not self._valve_holds_setpoint(trv_config),
+            }
+        return positions
+
+    @property
+    def temperature_contributions(self) -> dict:
+        """Příspěvky jednotlivých teplotních zdrojů k fúzované teplotě."""
+        return self._temperature_fusion.contributions(time.time())
+
+    @property
+    def temperature_fallback_active(self) -> bool:
+        """Zda se teplota bere z TRV (všechny senzory nedostupné)."""
+        return self._temperature_fusion.using_fallback
+
+    @property
+    def snapshot(self) -> RoomSnapshot:
+        """Snapshot stavů entit z posledního ticku (před prvním tickem se vytvoří)."""
+        if self._snapshot is None:
+            return self._take_snapshot()
+        return self._snapshot
+
+    @property
+    def snapshot_age(self) -> float:
+        """Stáří snapshotu v sekundách (hodnoty z get_temperature/get_target)."""
+        return max(0.0, time.time() - self.snapshot.taken_at)
+
+    def _take_snapshot(self) -> RoomSnapshot:
+        """Jednou načíst stavy všech entit místnosti pro tento tick."""
+        snapshot = build_room_snapshot(
+            self._hass,
+            self._room_name,
+            self._temperature_entity,
+            self._target_entity,
+            self._window_entities,
+            self._trv_entities,
+            window_open=self._window_tracker.is_open,
+        )
+        
+        # Teplota místnosti = fúze zdrojů (s jedním senzorem jeho hodnota)
+        self._temperature_fusion.sync(self._hass)
+        self._snapshot = dataclasses.replace(
+            snapshot,
+            temperature=self._temperature_fusion.value(
+                snapshot.taken_at, self._trv_temperatures(snapshot)
+            ),
+        )
+        return self._snapshot
+
+    @staticmethod
+    def _trv_temperatures(snapshot: RoomSnapshot) -> list[float]:
+        """current_temperature aktivních dostupných TRV (záloha fúze)."""
+        return [
+            trv.current_temperature
+            for trv in snapshot.trvs
+            if trv.enabled and trv.available and trv.current_temperature is not None
+        ]
+
+    @callback
+    def _request_refresh(self):
+        """Vyžádat okamžité vyhodnocení (mimo 30s poll)."""
+        if self._refresh_callback:
+            self._hass.async_create_task(self._refresh_callback())
+
     def set_refresh_callback(self, callback):
         """Set the callback for requesting refresh (avoids circular import)."""
         self._refresh_callback = callback
 
+    def async_start(self):
+        """Spustit časovače a listenery controlleru."""
+        self._window_tracker.async_start()
+        
+        self._unsub_listeners.append(
+            self._subscription_hub.async_subscribe(
+                self._temperature_fusion.entities,
+                self._async_temperature_changed,
+            )
+        )
+        self._unsub_listeners.append(
+            async_track_time_interval(
+                self._hass,
+                self._async_watchdog_tick,
+                timedelta(seconds=WATCHDOG_INTERVAL),
+            )
+        )
+
+    def async_stop(self):
+        """Zastavit časovače a listenery controlleru (unload)."""
+        while self._unsub_listeners:
+            self._unsub_listeners.pop()()
+        
+        self._window_tracker.async_stop()
+        
+        if self._target_debounce_timer:
+            self._target_debounce_timer.cancel()
+            self._target_debounce_timer = None
+
+    @callback
+    def _async_temperature_changed(self, change: EntityChange):
+        """Nový vzorek zdroje teploty → fúze, krok filtru a estimátoru vrcholu.
+
+        Detektor okna se krmí jen z ticku (`_run_update`) - pravidelné vzorky
+        a žádné míchání dvou zdrojů v jedné regresi.
+        """
+        self._temperature_fusion.update_from_state(change.entity_id, change.new_state)
+        if not change.available:
+            return
+        timestamp = change.timestamp
+        value = self._temperature_fusion.value(timestamp, self._trv_temperatures(self.snapshot))
+        if value is None:
+            return
+        if self._temperature_filter is not None:
+            self._temperature_filter.update(value, timestamp)
+        if self._state == STATE_COOLDOWN:
+            self._peak_estimator.add(value, timestamp)
+
+    def _feed_window_detector(self, value: float, timestamp: float):
+        """Vzorek pro detekci okna (jednou za tick)."""
+        if self._window_detector is None:
+            return
+        self._window_detector.add_sample(value, timestamp, self._window_tracker.opened_at)
+
+    def _smoothed_temperature(self, raw_temp: float) -> float:
+        """Teplota pro řízení - vyhlazená pokud je filtr zapnutý."""
+        if self._temperature_filter is None:
+            return raw_temp
+        
+        # Záloha pro případ, že událost ještě nedorazila (duplicitní vzorek se ignoruje)
+        updated_at = self._temperature_fusion.updated_at
+        if updated_at is not None:
+            self._temperature_filter.update(raw_temp, updated_at)
+        
+        value = self._temperature_filter.value
+        return value if value is not None else raw_temp
+
+    def _track_filter_suppression(
+        self, previous_state: str, new_state: str, raw_temp: float, target: float
+    ):
+        """Započítat přechod, který by surová teplota spustila, ale filtr ne."""
+        if self._temperature_filter is None:
+            return
+        
+        if previous_state == STATE_IDLE:
+            raw_trigger = raw_temp <= target - self._cycle_guard.hysteresis
+            transitioned = new_state == STATE_HEATING
+        elif previous_state == STATE_HEATING:
+            raw_trigger = raw_temp >= target
+            transitioned = new_state != STATE_HEATING
+        else:
+            self._filter_suppressing = False
+            return
+        
+        if raw_trigger and not transitioned:
+            if not self._filter_suppressing:
+                self._filter_suppressing = True
+                self._filter_suppressed_transitions += 1
+                _LOGGER.debug(
+                    f"TRV [{self._room_name}]: Filter suppressed {previous_state.upper()} transition "
+                    f"(raw={raw_temp:.2f}°C, filtered={self._temperature_filter.value:.2f}°C)"
+                )
+        else:
+            self._filter_suppressing = False
+
+    @property
+    def watchdog_status(self) -> dict:
+        """Stav watchdogu (circuit breakery jednotlivých TRV)."""
+        return self._watchdog.get_status()
+
+    @property
+    def performance_stats(self) -> dict:
+        """Latence jednotlivých fází update smyčky (ms)."""
+        return self._perf.get_stats()
+
+    def phase_latency(self, phase: str, q: float = 95) -> Optional[float]:
+        """Percentil latence fáze v ms (None pokud ještě neběžela)."""
+        return self._perf.percentile(phase, q)
+
+    async def async_apply_options(
+        self,
+        trv_entities: list[dict],
+        hysteresis: float,
+        window_open_delay: int,
+        learning_cycles_required: int,
+        desired_overshoot: float,
+        min_heating_duration: int,
+        max_heating_duration: int,
+        max_valid_overshoot: float,
+        cooldown_duration: int,
+        recovery_threshold: float,
+        control_mode: str,
+        pwm_period: int,
+        min_off_time: int,
+        max_cycles_per_hour: int,
+        hysteresis_auto_tune: bool,
+        learning_prior: bool,
+    ):
+        """Převzít změněné options za běhu (bez reloadu entry a ztráty cyklu)."""
+        self._desired_overshoot = desired_overshoot
+        self._min_heating_duration = min_heating_duration
+        self._max_heating_duration = max_heating_duration
+        self._max_valid_overshoot = max_valid_overshoot
+        self._cooldown_duration = cooldown_duration
+        self._recovery_threshold = recovery_threshold
+        self._learning_prior_enabled = learning_prior
+        if not learning_prior:
+            self._learning_prior = None
+        
+        if window_open_delay != self._window_open_delay:
+            self._window_open_delay = window_open_delay
+            self._window_tracker.set_open_delay(window_open_delay)
+        
+        # Performance history - zachovat nejnovější cykly v novém okně
+        learning_recheck = False
+        if learning_cycles_required != self._learning_cycles_required:
+            self._learning_cycles_required = learning_cycles_required
+            self._performance_history = deque(
+                self._performance_history, maxlen=learning_cycles_required
+            )
+            learning_recheck = self._is_learning
+        
+        # Ochrana proti krátkým cyklům - nové limity, čítače a historie startů zůstávají
+        guard = self._cycle_guard
+        if (
+            hysteresis != self._hysteresis
+            or min_off_time != guard.min_off_time
+            or max_cycles_per_hour != guard.max_cycles_per_hour
+            or hysteresis_auto_tune != guard.auto_tune
+        ):
+            guard_data = guard.to_dict()
+            if hysteresis != self._hysteresis:
+                # Nová nastavená hystereze - auto-tuner začne od ní
+                guard_data["effective_hysteresis"] = None
+            self._hysteresis = hysteresis
+            self._cycle_guard = ShortCycleGuard.from_dict(
+                self._room_name,
+                hysteresis,
+                min_off_time,
+                max_cycles_per_hour,
+                hysteresis_auto_tune,
+                guard_data,
+            )
+        
+        # PWM - změna režimu zahodí rozběhnutou periodu
+        self._pwm.set_period(pwm_period)
+        if control_mode != self._control_mode:
+            self._control_mode = control_mode
+            self._pwm.reset_period()
+        
+        # TRV - nezměněné hlavice se znovu nepřikazují
+        previous = {trv["entity"]: trv for trv in self._trv_entities}
+        changed = [
+            trv["entity"] for trv in trv_entities if previous.get(trv["entity"]) != trv
+        ]
+        self._trv_entities = trv_entities
+        self._valve_failed.difference_update(changed)
+        
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: Options applied live "
+            f"(hysteresis={hysteresis}°C, window_open_delay={window_open_delay}s, "
+            f"learning_cycles_required={learning_cycles_required}, "
+            f"{len(changed)} TRV(s) changed)"
+        )
+        
+        # Nový počet cyklů může učení ukončit hned (nečekat na další cyklus)
+        if learning_recheck:
+            self._update_learned_model()
+            if not self._is_learning:
+                await self._save_learned_params()
+        
+        await self.async_save_runtime_state()
+        if changed:
+            # Watchdog srovná jen hlavice, které neodpovídají aktuálnímu stavu
+            self._hass.async_create_task(self._async_watchdog_tick())
+
+    def _runtime_state(self) -> dict:
+        """Snapshot stavového automatu (rozpracovaný cyklus) pro warm restart."""
+        return {
+            "saved_at": time.time(),
+            "state": self._state,
+            "last_target": self._last_target_value,
+            "heating_start_time": self._heating_start_time,
+            "heating_start_temp": self._heating_start_temp,
+            "heating_target_temp": self._heating_target_temp,
+            "cooldown_start_time": self._cooldown_start_time,
+            "cooldown_max_temp": self._cooldown_max_temp,
+            "post_vent_mode": self._post_vent_mode,
+            "recovery_mode": self._recovery_mode,
+            "recovery_temp_delta": self._recovery_temp_delta,
+            "valve_opening": self._valve_opening,
+            "pwm_period": self._pwm.period_state(),
+            "current_cycle": (
+                self._current_cycle.to_dict() if self._current_cycle is not None else None
+            ),
+        }
+
+    async def async_save_runtime_state(self):
+        """Uložit snapshot stavového automatu (přechody, unload, stop HA)."""
+        with self._perf.measure("save_runtime_state"):
+            await self._runtime_store.async_save_room(self._room_name, self._runtime_state())
+
+    async def async_restore_runtime_state(self, max_age: float = WARM_RESTART_MAX_AGE) -> bool:
+        """Warm restart - obnovit čerstvý snapshot stavového automatu.
+
+        Vrací False, pokud snapshot chybí, je starší než `max_age` nebo je
+        stav neznámý (VENT/ERROR, HEATING/COOLDOWN bez cyklu) - pak platí
+        bezpečnostní reset po restartu.
+        """
+        data = await self._runtime_store.async_get_room(self._room_name)
+        if not data:
+            return False
+        
+        age = time.time() - data.get("saved_at", 0)
+        state = data.get("state")
+        cycle_data = data.get("current_cycle")
+        resumable = state == STATE_IDLE or (
+            state in (STATE_HEATING, STATE_COOLDOWN) and bool(cycle_data)
+        )
+        if age > max_age or not resumable:
+            _LOGGER.info(
+                f"TRV [{self._room_name}]: Runtime state not resumed "
+                f"(state={state}, age={age:.0f}s)"
+            )
+            if cycle_data and state in (STATE_HEATING, STATE_COOLDOWN):
+                # Cyklus přerušený restartem - jen do historie a statistik
+                await self._record_interrupted_cycle(
+                    "restart",
+                    cycle=CycleRecord.from_dict(cycle_data),
+                    heating_start=data.get("heating_start_time"),
+                    heating_end=data.get("cooldown_start_time") or data.get("saved_at"),
+                )
+            return False
+        
+        self._state = state
+        self._last_target_value = data.get("last_target")
+        self._heating_start_time = data.get("heating_start_time")
+        self._heating_start_temp = data.get("heating_start_temp")
+        self._heating_target_temp = data.get("heating_target_temp")
+        self._cooldown_start_time = data.get("cooldown_start_time")
+        self._cooldown_max_temp = data.get("cooldown_max_temp")
+        self._post_vent_mode = data.get("post_vent_mode", False)
+        self._recovery_mode = data.get("recovery_mode", False)
+        self._recovery_temp_delta = data.get("recovery_temp_delta")
+        self._valve_opening = data.get("valve_opening", 0)
+        self._pwm.restore_period(data.get("pwm_period"))
+        self._current_cycle = None
+        if cycle_data:
+            self._current_cycle = CycleRecord.from_dict(cycle_data)
+            # Výpadek v cyklu (COOLDOWN mohl minout vrchol) - pro diagnostiku
+            self._current_cycle.resumed_after = round(age)
+        
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: Warm restart - resumed {state.upper()} "
+            f"(snapshot age {age:.0f}s)"
+        )
+        return True
+
     def reset_cycle_state(self):
         """Reset any in-progress heating cycle (used after restart for safety)."""
         self._heating_start_time = None
         self._cooldown_start_time = None
-        self._current_cycle = {}
+        self._peak_estimator.reset()
+        self._current_cycle = None
+
+    async def async_post_restart_reset(self, window: float):
+        """Bezpečnostní reset po restartu - rozložený v čase.
+
+        TRV které už hlásí OFF setpoint se přeskočí, ostatní dostanou OFF
+        v náhodném okamžiku uvnitř `window` sekund. Úspěch se ověřuje podle
+        nahlášeného stavu TRV (ne pevným čekáním). TRV řízené ventilem drží
+        setpoint ON (`_trv_command`) - resetuje se jim ventil na 0 %.
+        """
+        to_reset = []
+        valves_to_close = []
+        skipped = 0
+        
+        for trv_config in self._trv_entities:
+            if not trv_config.get("enabled", True):
+                continue
+            
+            entity_id = trv_config["entity"]
+            if self._trv_command(trv_config, TRV_OFF) == TRV_ON:
+                valve_entity = self._valve_entity(trv_config)
+                if self._valve_matches(self._hass.states.get(valve_entity), 0):
+                    skipped += 1
+                else:
+                    valves_to_close.append((entity_id, valve_entity))
+                continue
+            
+            off_temp = self._resolve_setpoint(entity_id, TRV_OFF)
+            if self._trv_setpoint_matches(self._hass.states.get(entity_id), off_temp):
+                skipped += 1
+                continue
+            to_reset.append(entity_id)
+        
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: Post-restart safety: {len(to_reset)} TRV(s) "
+            f"and {len(valves_to_close)} valve(s) to reset within {window:.0f}s, "
+            f"{skipped} already in safe state"
+        )
+        
+        if not to_reset and not valves_to_close:
+            return
+        
+        self._restart_reset_pending.update(to_reset)
+        self._restart_reset_abort = asyncio.Event()
+        try:
+            await asyncio.gather(
+                *(
+                    self._async_reset_trv(entity_id, random.uniform(0, window))
+                    for entity_id in to_reset
+                ),
+                *(
+                    self._async_reset_valve(entity_id, valve_entity, random.uniform(0, window))
+                    for entity_id, valve_entity in valves_to_close
+                ),
+            )
+        finally:
+            self._restart_reset_pending.difference_update(to_reset)
+            self._restart_reset_abort = None
+
+    async def _async_reset_valve(self, entity_id: str, valve_entity: str, delay: float):
+        """Zavřít ventil TRV po `delay` sekundách (ověření jako u běžného příkazu)."""
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        # Mezitím mohl controller převzít řízení (HEATING) - jeho záměr vyhrává
+        if self._state == STATE_HEATING:
+            return
+        
+        await self._command_valve(entity_id, valve_entity, 0, COMMAND_PRIORITY_SAFETY)
+
+    async def async_close_valves(self):
+        """Zavřít ventily TRV řízených ventilem (unload).
+
+        Tyto TRV drží setpoint ON - bez běžícího controlleru by zůstaly
+        topit s poslední polohou ventilu. Bez ověření, unload nečeká.
+        """
+        valves = [
+            valve_entity
+            for trv_config in self._trv_entities
+            if trv_config.get("enabled", True)
+            and (valve_entity := self._valve_entity(trv_config)) is not None
+            and not self._valve_matches(self._hass.states.get(valve_entity), 0)
+        ]
+        if not valves:
+            return
+        
+        _LOGGER.info(f"TRV [{self._room_name}]: Closing {len(valves)} valve(s) on unload")
+        await asyncio.gather(
+            *(
+                self._send_valve_command(valve_entity, 0, COMMAND_PRIORITY_SAFETY)
+                for valve_entity in valves
+            ),
+            return_exceptions=True,
+        )
+
+    async def _async_reset_trv(self, entity_id: str, delay: float):
+        """Poslat OFF jedné TRV po `delay` sekundách a ověřit nahlášený stav."""
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        # Mezitím mohl controller převzít řízení (HEATING) - jeho záměr vyhrává
+        if self._state == STATE_HEATING:
+            _LOGGER.debug(
+                f"TRV [{self._room_name}]: Post-restart reset of {entity_id} skipped "
+                "(room already heating)"
+            )
+            return
+        
+        mode = TRV_OFF["hvac_mode"]
+        temp = self._resolve_setpoint(entity_id, TRV_OFF)
+        
+        sent = await self._send_trv_command(entity_id, mode, temp, COMMAND_PRIORITY_SAFETY)
+        if not sent:
+            self._reliability_tracker.command_superseded(entity_id)
+            return
+        self._reliability_tracker.command_sent(entity_id)
+        
+        sent_at = time.monotonic()
+        confirmed = await self._async_wait_for_setpoint(
+            entity_id, temp, POST_RESTART_VERIFY_TIMEOUT, abort=self._restart_reset_abort
+        )
+        if not confirmed and self._state == STATE_HEATING:
+            # Během čekání začalo topení - OFF už neplatí, neověřovat
+            _LOGGER.debug(
+                f"TRV [{self._room_name}]: Post-restart verification of {entity_id} aborted "
+                "(room started heating)"
+            )
+            return
+        if confirmed:
+            _LOGGER.debug(
+                f"TRV [{self._room_name}]: {entity_id} post-restart reset confirmed"
+            )
+            self._reliability_tracker.ack_received(entity_id, time.monotonic() - sent_at)
+            self._reliability_tracker.command_succeeded(entity_id)
+            return
+        
+        self._reliability_tracker.ack_timed_out(entity_id)
+        
+        trv_state = self._hass.states.get(entity_id)
+        _LOGGER.warning(
+            f"TRV [{self._room_name}]: {entity_id} did not confirm post-restart reset "
+            f"within {POST_RESTART_VERIFY_TIMEOUT}s"
+        )
+        self._reliability_tracker.command_failed(
+            entity_id,
+            expected={"hvac_mode": mode, "temperature": temp},
+            actual={
+                "hvac_mode": trv_state.state if trv_state else "unavailable",
+                "temperature": trv_state.attributes.get("temperature") if trv_state else None,
+            },
+            reason=FAILURE_REASON_TEMP_MISMATCH
+        )
+
+    def _resolve_setpoint(self, entity_id: str, command: dict[str, Any]) -> float:
+        """Vrátit ON/OFF setpoint ořezaný na schopnosti TRV (min_temp/max_temp).
+
+        Rozsah se cachuje per TRV a přepočítá se jen při změně atributů.
+        Bez vedlejších efektů - naučená ořezání řeší `_learn_setpoint_clamp`.
+        """
+        requested = command["temperature"]
+        trv_state = self._hass.states.get(entity_id)
+        
+        min_temp = max_temp = None
+        if trv_state is not None:
+            min_temp = trv_state.attributes.get("min_temp")
+            max_temp = trv_state.attributes.get("max_temp")
+        
+        cached = self._trv_capabilities.get(entity_id)
+        if cached is None or (
+            (min_temp is not None or max_temp is not None)
+            and (cached["min_temp"], cached["max_temp"]) != (min_temp, max_temp)
+        ):
+            cached = {
+                "min_temp": min_temp,
+                "max_temp": max_temp,
+                "learned_min": cached.get("learned_min") if cached else None,
+                "learned_max": cached.get("learned_max") if cached else None,
+            }
+            self._trv_capabilities[entity_id] = cached
+            if min_temp is not None or max_temp is not None:
+                _LOGGER.debug(
+                    f"TRV [{self._room_name}]: {entity_id} capabilities "
+                    f"min_temp={min_temp}, max_temp={max_temp}"
+                )
+        
+        low = cached["min_temp"] if cached["min_temp"] is not None else cached["learned_min"]
+        high = cached["max_temp"] if cached["max_temp"] is not None else cached["learned_max"]
+        
+        effective = requested
+        if high is not None and effective > high:
+            effective = high
+        if low is not None and effective < low:
+            effective = low
+        
+        return effective
+
+    def _learn_setpoint_clamp(
+        self, entity_id: str, command: dict[str, Any], requested: float, actual: Optional[float]
+    ) -> bool:
+        """Rozpoznat tiché ořezání setpointu hlavicí a zapamatovat si ho.
+
+        Hlavice bez min_temp/max_temp atributů někdy setpoint ořízne samy
+        (např. 35°C → 30°C). Takový stav není ztracený příkaz. Volat jen
+        s hodnotou nahlášenou hned po našem vlastním příkazu - ruční změna
+        na hlavici se tak za ořezání nepovažuje. Naučí se až po
+        SETPOINT_CLAMP_CONFIRMATIONS po sobě jdoucích stejných ořezáních.
+        """
+        key = "on" if command == TRV_ON else "off"
+        candidate_key = (entity_id, key)
+        
+        cached = self._trv_capabilities.setdefault(
+            entity_id,
+            {"min_temp": None, "max_temp": None, "learned_min": None, "learned_max": None},
+        )
+        
+        if actual is None or abs(actual - requested) <= TRV_TEMP_TOLERANCE:
+            # Hlavice příkaz přijala - řada ořezání se přerušila
+            self._setpoint_clamp_candidates.pop(candidate_key, None)
+            return False
+        
+        if command == TRV_ON and cached["max_temp"] is None and SETPOINT_CLAMP_ON_MIN <= actual < requested:
+            pass
+        elif command == TRV_OFF and cached["min_temp"] is None and requested < actual <= SETPOINT_CLAMP_OFF_MAX:
+            pass
+        else:
+            self._setpoint_clamp_candidates.pop(candidate_key, None)
+            return False
+        
+        value, count = self._setpoint_clamp_candidates.get(candidate_key, (actual, 0))
+        count = count + 1 if abs(value - actual) <= TRV_TEMP_TOLERANCE else 1
+        
+        if count < SETPOINT_CLAMP_CONFIRMATIONS:
+            self._setpoint_clamp_candidates[candidate_key] = (actual, count)
+            _LOGGER.debug(
+                f"TRV [{self._room_name}]: {entity_id} reported {actual}°C after "
+                f"{requested}°C command ({count}/{SETPOINT_CLAMP_CONFIRMATIONS} for clamp)"
+            )
+            return False
+        
+        del self._setpoint_clamp_candidates[candidate_key]
+        cached["learned_max" if key == "on" else "learned_min"] = actual
+        
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: {entity_id} clamps setpoint "
+            f"{requested}°C → {actual}°C, using {actual}°C from now on"
+        )
+        self._reliability_tracker.setpoint_clamped(entity_id, requested, actual)
+        return True
+
+    def _forget_setpoint_clamp(self, entity_id: str, actual: Optional[float]) -> bool:
+        """Zapomenout naučené ořezání, pokud hlavice drží setpoint mimo něj.
+
+        Hlavice hlásící vyšší ON (nižší OFF) setpoint, než je naučené
+        ořezání, ho zjevně umí - příště se pošle plný požadavek.
+        """
+        cached = self._trv_capabilities.get(entity_id)
+        if actual is None or cached is None:
+            return False
+        
+        forgotten = False
+        if cached["learned_max"] is not None and actual > cached["learned_max"] + TRV_TEMP_TOLERANCE:
+            cached["learned_max"] = None
+            self._reliability_tracker.setpoint_clamp_cleared(entity_id, "on")
+            forgotten = True
+        if cached["learned_min"] is not None and actual < cached["learned_min"] - TRV_TEMP_TOLERANCE:
+            cached["learned_min"] = None
+            self._reliability_tracker.setpoint_clamp_cleared(entity_id, "off")
+            forgotten = True
+        
+        if forgotten:
+            _LOGGER.info(
+                f"TRV [{self._room_name}]: {entity_id} accepted {actual}°C beyond "
+                "learned setpoint clamp, clamp forgotten"
+            )
+        return forgotten
+
+    @staticmethod
+    def _trv_setpoint_matches(trv_state, expected_temp: float) -> bool:
+        """Zda TRV hlásí setpoint v toleranci kolem očekávané hodnoty."""
+        if not trv_state or trv_state.state in ("unavailable", "unknown"):
+            return False
+        actual_temp = trv_state.attributes.get("temperature")
+        return actual_temp is not None and abs(actual_temp - expected_temp) <= TRV_TEMP_TOLERANCE
+
+    async def _async_wait_for_setpoint(
+        self,
+        entity_id: str,
+        expected_temp: float,
+        timeout: float,
+        abort: Optional[asyncio.Event] = None,
+    ) -> bool:
+        """Počkat až TRV nahlásí očekávaný setpoint (nebo vyprší timeout / `abort`)."""
+        if self._trv_setpoint_matches(self._hass.states.get(entity_id), expected_temp):
+            return True
+        
+        matched = asyncio.Event()
+        
+        @callback
+        def _state_listener(change: EntityChange):
+            if self._trv_setpoint_matches(change.new_state, expected_temp):
+                matched.set()
+        
+        unsub = self._subscription_hub.async_subscribe([entity_id], _state_listener)
+        waiters = [asyncio.ensure_future(matched.wait())]
+        if abort is not None:
+            waiters.append(asyncio.ensure_future(abort.wait()))
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            return matched.is_set()
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+            unsub()
 
     def get_temperature(self) -> Optional[float]:
-        """Načíst aktuální teplotu (public method)."""
+        """Teplota místnosti ze snapshotu posledního ticku (stáří viz `snapshot_age`).
+
+        Záměrně bez nového čtení - senzory tak ukazují hodnotu, se kterou
+        řídicí smyčka naposledy rozhodovala.
+        """
         return self._get_temperature()
 
     def get_target(self) -> Optional[float]:
-        """Načíst cílovou teplotu (public method)."""
+        """Cílová teplota ze snapshotu posledního ticku (stáří viz `snapshot_age`)."""
         return self._get_target()
 
     async def _load_learned_params(self):
-        """Načíst naučené parametry z úložiště."""
-        storage_path = os.path.join(
-            self._hass.config.path(STORAGE_DIR),
-            STORAGE_FILE
-        )
-        
-        if not os.path.exists(storage_path):
+        """Načíst naučené parametry ze sdíleného úložiště."""
+        room_data = await self._store.async_get_room(self._room_name)
+        if not room_data:
             _LOGGER.info(f"TRV [{self._room_name}]: No learned parameters found, starting fresh")
             return
         
         try:
-            # ✅ Async file I/O místo synchronního open():
-            data = await self._hass.async_add_executor_job(
-                load_json, storage_path
-            )
-            
-            room_data = data.get(self._room_name, {})
-            if room_data:
-                self._avg_heating_duration = room_data.get("avg_heating_duration")
-                self._time_offset = room_data.get("time_offset", 0)
-                self._is_learning = room_data.get("is_learning", True)
-                self._valid_cycles_count = room_data.get("valid_cycles_count", 0)
-                self._last_learned = room_data.get("last_learned")
-                self._avg_overshoot = room_data.get("avg_overshoot")
-                self._history = room_data.get("history", [])[-HISTORY_SIZE:]
-                self._monthly_stats = room_data.get("monthly_stats", {})
-                
-                # Načíst performance_history
-                performance_data = room_data.get("performance_history", [])
-                if len(performance_data) > self._learning_cycles_required:
-                    _LOGGER.warning(
-                        f"TRV [{self._room_name}]: Performance history truncated from "
-                        f"{len(performance_data)} to {self._learning_cycles_required} cycles "
-                        "(learning_cycles_required changed)"
-                    )
-                self._performance_history = deque(
-                    performance_data,
-                    maxlen=self._learning_cycles_required
-                )
-                
-                # Load reliability metrics
-                if "reliability_metrics" in room_data:
-                    self._reliability_tracker = ReliabilityTracker.from_dict(
-                        self._room_name,
-                        room_data["reliability_metrics"]
-                    )
-                    _LOGGER.info(
-                        f"TRV [{self._room_name}]: Loaded reliability metrics: "
-                        f"commands_sent={self._reliability_tracker._commands_sent_total}, "
-                        f"commands_failed={self._reliability_tracker._commands_failed_total}"
-                    )
-                
-                _LOGGER.info(
-                    f"TRV [{self._room_name}]: Loaded learned params: "
-                    f"avg_duration={self._avg_heating_duration}s, "
-                    f"time_offset={self._time_offset}s, "
-                    f"is_learning={self._is_learning}, "
-                    f"valid_cycles={self._valid_cycles_count}"
-                )
+            self._apply_learned_params(room_data)
         except Exception as e:
             _LOGGER.error(f"TRV [{self._room_name}]: Failed to load learned params: {e}")
 
+    def _apply_learned_params(self, room_data: dict, live: bool = True):
+        """Převzít uložená data místnosti (načtení z úložiště i import službou).
+
+        `live=False` (import) převezme jen naučený model - živé čítače
+        místnosti (spolehlivost, statistiky, srovnání režimů, čítače
+        ochrany proti krátkým cyklům) zůstanou beze změny.
+        """
+        self._avg_heating_duration = room_data.get("avg_heating_duration")
+        self._time_offset = room_data.get("time_offset", 0)
+        self._is_learning = room_data.get("is_learning", True)
+        self._valid_cycles_count = room_data.get("valid_cycles_count", 0)
+        self._last_learned = room_data.get("last_learned")
+        self._avg_overshoot = room_data.get("avg_overshoot")
+        self._history = history_from_dicts(room_data.get("history", []))
+        self._monthly_stats = room_data.get("monthly_stats", {})
+        
+        # Načíst performance_history
+        performance_data = room_data.get("performance_history", [])
+        if len(performance_data) > self._learning_cycles_required:
+            _LOGGER.warning(
+                f"TRV [{self._room_name}]: Performance history truncated from "
+                f"{len(performance_data)} to {self._learning_cycles_required} cycles "
+                "(learning_cycles_required changed)"
+            )
+        self._performance_history = deque(
+            performance_data,
+            maxlen=self._learning_cycles_required
+        )
+        self._learning_prior = LearningPrior.from_dict(room_data.get("learning_prior"))
+        if "learning_confidence" in room_data:
+            self._learning_confidence = LearningConfidence.from_dict(room_data["learning_confidence"])
+        else:
+            # Starší data - spolehlivost z uložené performance history
+            self._learning_confidence = LearningConfidence.from_cycles(self._performance_history)
+        
+        # Load reliability metrics
+        if live and "reliability_metrics" in room_data:
+            self._reliability_tracker = ReliabilityTracker.from_dict(
+                self._room_name,
+                room_data["reliability_metrics"]
+            )
+            _LOGGER.info(
+                f"TRV [{self._room_name}]: Loaded reliability metrics: "
+                f"commands_sent={self._reliability_tracker.commands_sent_total}, "
+                f"commands_failed={self._reliability_tracker.commands_failed_total}"
+            )
+            
+            # Obnovit naučené ořezání setpointů (hlavice bez min/max_temp)
+            for entity_id, setpoints in self._reliability_tracker.effective_setpoints.items():
+                self._trv_capabilities[entity_id] = {
+                    "min_temp": None,
+                    "max_temp": None,
+                    "learned_min": setpoints.get("off"),
+                    "learned_max": setpoints.get("on"),
+                }
+        
+        # PWM (tepelný zisk) a srovnání režimů
+        self._pwm = PwmController.from_dict(
+            self._room_name, self._pwm.period, room_data.get("pwm")
+        )
+        if not self._pwm.ready:
+            # Tepelný zisk lze odvodit i z historie ON/OFF cyklů
+            for cycle in self._history:
+                if cycle.valid:
+                    self._pwm.observe_cycle(cycle)
+        if live:
+            self._control_benchmark = ControlBenchmark.from_dict(
+                room_data.get("control_benchmark")
+            )
+        
+        # Ochrana proti krátkým cyklům (naladěná hystereze, čítače)
+        guard = self._cycle_guard
+        guard_data = room_data.get("cycle_guard")
+        if not live:
+            guard_data = {
+                **guard.to_dict(),
+                "effective_hysteresis": (guard_data or {}).get("effective_hysteresis"),
+            }
+        self._cycle_guard = ShortCycleGuard.from_dict(
+            self._room_name,
+            guard.base_hysteresis,
+            guard.min_off_time,
+            guard.max_cycles_per_hour,
+            guard.auto_tune,
+            guard_data,
+        )
+        
+        # Naučená baseline detekce okna z teploty
+        if self._window_detector is not None:
+            self._window_detector = TemperatureWindowDetector.from_dict(
+                self._room_name,
+                self._window_detector.active,
+                room_data.get("window_detection"),
+            )
+        
+        # Load long-term statistics state (kumulativní součty v recorderu)
+        if live:
+            self._cycle_statistics = CycleStatistics.from_dict(
+                self._hass,
+                self._room_name,
+                room_data.get("statistics"),
+            )
+        
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: Loaded learned params: "
+            f"avg_duration={self._avg_heating_duration}s, "
+            f"time_offset={self._time_offset}s, "
+            f"is_learning={self._is_learning}, "
+            f"valid_cycles={self._valid_cycles_count}"
+        )
+        
+        self._cycle_statistics.sync_commands_baseline(
+            self._reliability_tracker.commands_sent_total
+        )
+
     def _aggregate_monthly_stats(self):
         """Agregovat statistiky pro aktuální měsíc."""
         if not self._history:
@@ -298,7 +1368,7 @@ class RoomController:
         # Filtrovat cykly z aktuálního měsíce
         month_cycles = []
         for cycle in self._history:
-            cycle_time = datetime.fromtimestamp(cycle["timestamp"])
+            cycle_time = datetime.fromtimestamp(cycle.timestamp)
             if cycle_time.strftime("%Y-%m") == current_month:
                 month_cycles.append(cycle)
         
@@ -306,17 +1376,17 @@ class RoomController:
             return
         
         # Validní cykly
-        valid = [c for c in month_cycles if c.get("valid", False)]
+        valid = [c for c in month_cycles if c.valid]
         
         if not valid:
             return
         
         # Agregovat
-        durations = [c.get("heating_duration", 0) for c in valid]
-        overshoots = [c.get("overshoot", 0) for c in valid]
+        durations = [c.heating_duration or 0 for c in valid]
+        overshoots = [c.overshoot or 0 for c in valid]
         
-        first = datetime.fromtimestamp(month_cycles[0]["timestamp"])
-        last = datetime.fromtimestamp(month_cycles[-1]["timestamp"])
+        first = datetime.fromtimestamp(month_cycles[0].timestamp)
+        last = datetime.fromtimestamp(month_cycles[-1].timestamp)
         days = (last - first).days + 1
         
         self._monthly_stats[current_month] = {
@@ -339,66 +1409,71 @@ class RoomController:
 
     async def _save_learned_params(self):
         """Uložit naučené parametry do úložiště."""
-        # Agregovat měsíční statistiky
-        self._aggregate_monthly_stats()
-        
-        storage_path = os.path.join(
-            self._hass.config.path(STORAGE_DIR),
-            STORAGE_FILE
-        )
-        
-        # Načíst existující data
-        data = {}
-        if os.path.exists(storage_path):
-            try:
-                # ✅ Async file I/O:
-                data = await self._hass.async_add_executor_job(
-                    load_json, storage_path
-                )
-            except Exception as e:
-                _LOGGER.warning(f"TRV [{self._room_name}]: Failed to read existing storage: {e}")
-        
-        # Aktualizovat data pro tuto místnost
-        data[self._room_name] = {
+        with self._perf.measure("save_learned_params"):
+            await self._write_learned_params()
+
+    def _learned_params_data(self) -> dict:
+        """Data místnosti pro JSON úložiště (a export službou)."""
+        room_data = {
             "avg_heating_duration": self._avg_heating_duration,
             "time_offset": self._time_offset,
             "is_learning": self._is_learning,
             "valid_cycles_count": self._valid_cycles_count,
             "last_learned": self._last_learned,
             "avg_overshoot": self._avg_overshoot,
-            "history": self._history[-HISTORY_SIZE:],
+            "history": [cycle.to_dict() for cycle in self._history],
             "performance_history": list(self._performance_history),
             "monthly_stats": self._monthly_stats,
             "reliability_metrics": self._reliability_tracker.to_dict(),
+            "statistics": self._cycle_statistics.to_dict(),
+            "pwm": self._pwm.to_dict(),
+            "control_benchmark": self._control_benchmark.to_dict(),
+            "cycle_guard": self._cycle_guard.to_dict(),
+            "learning_prior": (
+                self._learning_prior.to_dict() if self._learning_prior is not None else None
+            ),
+            "learning_confidence": self._learning_confidence.to_dict(),
         }
+        if self._window_detector is not None:
+            room_data["window_detection"] = self._window_detector.to_dict()
+        return room_data
+
+    async def _write_learned_params(self):
+        """Zapsat naučené parametry do sdíleného úložiště."""
+        # Agregovat měsíční statistiky
+        self._aggregate_monthly_stats()
         
-        # Zajistit existenci adresáře
-        os.makedirs(os.path.dirname(storage_path), exist_ok=True)
-        
-        # ✅ Async file I/O - zápis pomocí standardního json.dump:
-        def _write_json(path, json_data):
-            """Zapsat JSON do souboru."""
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, indent=2)
-        
-        try:
-            await self._hass.async_add_executor_job(_write_json, storage_path, data)
-            _LOGGER.debug(f"TRV [{self._room_name}]: Saved learned params")
-        except Exception as e:
-            _LOGGER.error(f"TRV [{self._room_name}]: Failed to save learned params: {e}")
+        await self._store.async_save_room(self._room_name, self._learned_params_data())
+        _LOGGER.debug(f"TRV [{self._room_name}]: Saved learned params")
 
     async def async_update(self):
         """Hlavní update loop."""
+        with self._perf.measure("async_update"):
+            await self._run_update()
+
+    async def _run_update(self):
+        """Jednotlivé fáze update loopu."""
+        # 0. Jednou načíst stavy entit (sdílí všechny fáze i senzory)
+        self._take_snapshot()
+        
+        # Skončené hodiny bez cyklu → nulový duty v dlouhodobých statistikách
+        self._cycle_statistics.close_idle_hours(
+            self.snapshot.taken_at, self._heating_start_time
+        )
+        
         # 1. Kontrola dostupnosti senzoru
-        if not await self._check_sensor_availability():
+        with self._perf.measure("check_sensor_availability"):
+            sensor_ok = await self._check_sensor_availability()
+        if not sensor_ok:
             return
         
         # 2. Kontrola dostupnosti TRV
-        if not await self._check_trv_availability():
+        with self._perf.measure("check_trv_availability"):
+            trv_ok = await self._check_trv_availability()
+        if not trv_ok:
             return
         
-        # 3. Watchdog - kontrola stavu TRV
-        await self._verify_trv_state()
+        # 3. Watchdog běží s vlastní kadencí (viz async_start)
         
         # 4. Načíst aktuální hodnoty
         temp = self._get_temperature()
@@ -416,11 +1491,18 @@ class RoomController:
             await self._handle_target_change(target)
             return
         
-        # 6. Zkontrolovat okna
+        # 6. Zkontrolovat okna (kontakty, případně detekce z poklesu teploty -
+        #    jediný zdroj vzorků detektoru je tick, s časem snapshotu)
+        self._feed_window_detector(temp, self.snapshot.taken_at)
         window_open = self._any_window_open()
         
-        # 7. Vyhodnotit stavový automat
-        new_state = await self._evaluate_state(temp, target, window_open)
+        # 7. Vyhodnotit stavový automat (nad vyhlazenou teplotou, pokud je filtr zapnutý)
+        raw_temp = temp
+        temp = self._smoothed_temperature(raw_temp)
+        previous_state = self._state
+        with self._perf.measure("evaluate_state"):
+            new_state = await self._evaluate_state(temp, target, window_open)
+        self._track_filter_suppression(previous_state, new_state, raw_temp, target)
         
         # 8. Přejít do nového stavu pokud se změnil
         if new_state != self._state:
@@ -428,12 +1510,19 @@ class RoomController:
         else:
             # Pokračovat v aktuálním stavu
             await self._continue_in_state(temp, target)
+        
+        # 9. Srovnání režimů řízení (VENT/ERROR se nepočítá)
+        self._control_benchmark.tick(
+            None if self._state in (STATE_VENT, STATE_ERROR) else self.active_control_mode,
+            temp,
+            target,
+            self._reliability_tracker.commands_sent_total,
+            time.time(),
+        )
 
     async def _check_sensor_availability(self) -> bool:
-        """Zkontrolovat dostupnost teplotního senzoru."""
-        sensor_state = self._hass.states.get(self._temperature_entity)
-        
-        if sensor_state is None or sensor_state.state in ("unavailable", "unknown"):
+        """Zkontrolovat dostupnost teploty (aspoň jeden zdroj fúze)."""
+        if self.snapshot.temperature is None:
             if self._sensor_unavailable_since is None:
                 self._sensor_unavailable_since = time.time()
                 _LOGGER.warning(
@@ -454,18 +1543,27 @@ class RoomController:
         
         # Senzor je dostupný, resetovat čítač
         self._sensor_unavailable_since = None
+        
+        if self._temperature_fusion.using_fallback != self._temperature_fallback_logged:
+            self._temperature_fallback_logged = self._temperature_fusion.using_fallback
+            if self._temperature_fallback_logged:
+                _LOGGER.warning(
+                    f"TRV [{self._room_name}]: All temperature sensors unavailable, "
+                    "using TRV current_temperature as fallback"
+                )
+            else:
+                _LOGGER.info(f"TRV [{self._room_name}]: Temperature sensor back online")
         return True
 
     async def _check_trv_availability(self) -> bool:
         """Zkontrolovat dostupnost TRV hlavic."""
-        for trv_config in self._trv_entities:
-            if not trv_config.get("enabled", True):
+        for trv in self.snapshot.trvs:
+            if not trv.enabled:
                 continue
             
-            entity_id = trv_config["entity"]
-            trv_state = self._hass.states.get(entity_id)
+            entity_id = trv.entity_id
             
-            if trv_state is None or trv_state.state in ("unavailable", "unknown"):
+            if not trv.available:
                 if entity_id not in self._trv_unavailable_since:
                     self._trv_unavailable_since[entity_id] = time.time()
                     _LOGGER.warning(
@@ -519,8 +1617,7 @@ class RoomController:
                 f"TRV [{self._room_name}]: Target changed during COOLDOWN, "
                 "invalidating current cycle"
             )
-            self._current_cycle["valid"] = False
-            self._current_cycle["invalidation_reason"] = "target_changed_during_cooldown"
+            self._invalidate_current_cycle("target_changed_during_cooldown")
         
         # Reset POST-VENT flag pokud je změna targetu během HEATING nebo COOLDOWN
         if self._post_vent_mode and self._state in (STATE_HEATING, STATE_COOLDOWN):
@@ -536,6 +1633,10 @@ class RoomController:
                 f"TRV [{self._room_name}]: RECOVERY mode cancelled due to target change"
             )
         
+        # PWM: nová perioda se spočítá hned s novým targetem
+        if self._state != STATE_HEATING:
+            self._pwm.reset_period()
+        
         # Vynutit refresh pomocí callback
         if self._refresh_callback:
             await self._refresh_callback()
@@ -553,8 +1654,17 @@ class RoomController:
         # VENT má přednost
         if window_open:
             if self._window_opened_at is None:
-                self._window_opened_at = time.time()
-                _LOGGER.info(f"TRV [{self._room_name}]: Window opened")
+                # Čas prvního otevření drží tracker (z události, ne z pollu)
+                if self._window_tracker.is_open:
+                    self._window_opened_at = self._window_tracker.opened_at or time.time()
+                    _LOGGER.info(
+                        f"TRV [{self._room_name}]: Window opened "
+                        f"({self._window_tracker.open_count} contact(s))"
+                    )
+                else:
+                    # Detekce z teploty - otevření = odhadnutý začátek poklesu
+                    self._window_opened_at = self._window_detector.opened_at or time.time()
+                    _LOGGER.info(f"TRV [{self._room_name}]: Window opened (detected from temperature)")
             
             elapsed = time.time() - self._window_opened_at
             if elapsed >= self._window_open_delay:
@@ -584,23 +1694,38 @@ class RoomController:
                 if self._cooldown_max_temp is None or temp > self._cooldown_max_temp:
                     self._cooldown_max_temp = temp
                 
+                # Vzorek z ticku (drží hodnotu mezi událostmi senzoru)
+                raw_temp = self.snapshot.temperature
+                if raw_temp is not None:
+                    self._peak_estimator.add(raw_temp, self.snapshot.taken_at)
+                
                 # Ukončit cooldown pokud:
                 # 1. Uplynula doba cooldown_duration
-                # 2. NEBO teplota začala klesat (peak byl dosažen)
+                # 2. NEBO sklon teploty potvrdil, že vrchol už byl (viz _cooldown_peak_passed)
                 if elapsed >= self._cooldown_duration:
                     _LOGGER.info(
                         f"TRV [{self._room_name}]: COOLDOWN duration expired "
                         f"({elapsed:.0f}s >= {self._cooldown_duration}s)"
                     )
-                    await self._finish_cooldown(temp, target)
+                    await self._finish_cooldown(temp, target, "timeout")
                     return self._evaluate_heating(temp, target)
-                elif self._cooldown_max_temp and temp < self._cooldown_max_temp - 0.05:
+                elif self._cooldown_peak_passed():
+                    # Vrchol fitu nesmí snížit skutečně naměřené maximum
+                    peak = self._peak_estimator.peak()
+                    if peak is not None and peak > self._cooldown_max_temp:
+                        self._cooldown_max_temp = peak
                     _LOGGER.info(
-                        f"TRV [{self._room_name}]: Temperature dropping "
-                        f"(peak: {self._cooldown_max_temp:.1f}°C, current: {temp:.1f}°C), "
-                        "ending COOLDOWN early"
+                        f"TRV [{self._room_name}]: Temperature peak passed "
+                        f"(slope: {self._peak_estimator.slope:.2f}°C/h, "
+                        f"fitted peak: {peak if peak is not None else float('nan'):.2f}°C, "
+                        f"max: {self._cooldown_max_temp:.2f}°C, current: {temp:.1f}°C), "
+                        f"ending COOLDOWN early after {elapsed:.0f}s"
                     )
-                    await self._finish_cooldown(temp, target)
+                    await self._finish_cooldown(temp, target, "slope")
+                    return self._evaluate_heating(temp, target)
+                elif self._in_pwm_cycle() and self._pwm.period_elapsed:
+                    # PWM: vypnutá část periody skončila, začíná další perioda
+                    await self._finish_cooldown(temp, target, "pwm_period")
                     return self._evaluate_heating(temp, target)
             
             return STATE_COOLDOWN
@@ -644,6 +1769,16 @@ class RoomController:
                         )
                         self._recovery_mode = False  # Vypnout flag
                         return STATE_COOLDOWN
+                elif self._in_pwm_cycle():
+                    # PWM: vypnout po době zapnutí periody (nebo při překmitu nad hysterezi)
+                    planned_duration = self._current_cycle.planned_duration
+                    if elapsed >= planned_duration or temp >= target + self._hysteresis:
+                        _LOGGER.info(
+                            f"TRV [{self._room_name}]: PWM pulse finished "
+                            f"(elapsed={elapsed:.0f}s, planned={planned_duration:.0f}s, "
+                            f"temp={temp:.1f}°C)"
+                        )
+                        return STATE_COOLDOWN
                 else:
                     # LEARNED: vypnout podle času NEBO při dosažení targetu
                     # Bezpečnostní kontrola: pokud nemáme naučené parametry, fallback na čekání na target
@@ -671,9 +1806,34 @@ class RoomController:
         # IDLE nebo jiný stav - vyhodnotit regulaci
         return self._evaluate_heating(temp, target)
 
+    def _pwm_active(self) -> bool:
+        """Zda řídí PWM (nastaveno, model naučený, mimo POST-VENT/RECOVERY)."""
+        return (
+            self._control_mode == CONTROL_MODE_PWM
+            and self._pwm.ready
+            and not self._is_learning
+            and not self._post_vent_mode
+            and not self._recovery_mode
+        )
+
+    def _evaluate_pwm(self, temp: float, target: float) -> str:
+        """PWM: na začátku periody rozhodnout o pulzu, jinak čekat."""
+        if not self._pwm.period_elapsed:
+            return STATE_IDLE
+        on_time = self._pwm.start_period(temp, target)
+        return STATE_HEATING if on_time > 0 else STATE_IDLE
+
     def _evaluate_heating(self, temp: float, target: float) -> str:
         """Vyhodnotit zda zapnout/vypnout topení s asymetrickou hysterezí."""
-        lower_threshold = target - self._hysteresis
+        # PWM - velký pokles teploty (RECOVERY) řeší dál ON/OFF
+        if (
+            self._state != STATE_HEATING
+            and self._pwm_active()
+            and target - temp <= self._recovery_threshold
+        ):
+            return self._evaluate_pwm(temp, target)
+        
+        lower_threshold = target - self._cycle_guard.hysteresis
         
         if self._state == STATE_HEATING:
             # Pokud topíme: vypnout HNED při dosažení cílové teploty
@@ -688,16 +1848,35 @@ class RoomController:
         else:
             # Pokud netopíme: zapnout až při poklesu pod lower_threshold
             if temp <= lower_threshold:
+                # Ochrana proti krátkým cyklům (RECOVERY ji obchází)
+                if (
+                    target - temp <= self._recovery_threshold
+                    and self._cycle_guard.suppress_start()
+                ):
+                    return STATE_IDLE
                 _LOGGER.debug(
                     f"TRV [{self._room_name}]: Temp {temp:.1f}°C "
                     f"<= {lower_threshold:.1f}°C → HEATING"
                 )
                 return STATE_HEATING
             else:
+                self._cycle_guard.demand_cleared(self._commands_per_cycle())
                 return STATE_IDLE
 
+    def _commands_per_cycle(self) -> int:
+        """Počet příkazů jednoho cyklu (ON + OFF pro každou aktivní TRV)."""
+        return 2 * self._enabled_trv_count()
+
     async def _transition_to(self, new_state: str, temp: Optional[float], target: Optional[float]):
-        """Provést přechod do nového stavu."""
+        """Provést přechod do nového stavu (včetně odeslání a verifikace příkazů)."""
+        with self._perf.measure("transition_to"):
+            await self._apply_transition(new_state, temp, target)
+        
+        # Snapshot stavového automatu pro warm restart
+        await self.async_save_runtime_state()
+
+    async def _apply_transition(self, new_state: str, temp: Optional[float], target: Optional[float]):
+        """Akce přechodu do nového stavu."""
         old_state = self._state
         self._state = new_state
         
@@ -705,6 +1884,17 @@ class RoomController:
             f"TRV [{self._room_name}]: {old_state.upper()} → {new_state.upper()}"
         )
         
+        # Rozběhnuté ověřování post-restart resetu (OFF) přestává platit
+        if new_state == STATE_HEATING and self._restart_reset_abort is not None:
+            self._restart_reset_abort.set()
+        
+        # Starty/konce topení pro ochranu proti krátkým cyklům
+        if new_state == STATE_HEATING:
+            # PWM pulzy se počítají, ale hysterezi neladí (PWM ji nepoužívá)
+            self._cycle_guard.record_start(tune=not self._pwm_active())
+        elif old_state == STATE_HEATING:
+            self._cycle_guard.record_stop()
+        
         # Akce podle nového stavu
         if new_state == STATE_HEATING:
             # Detekovat velký teplotní rozdíl → RECOVERY mode
@@ -744,8 +1934,7 @@ class RoomController:
                     f"TRV [{self._room_name}]: Window opened during HEATING, "
                     "invalidating cycle"
                 )
-                self._current_cycle["valid"] = False
-                self._current_cycle["invalidation_reason"] = "window_opened_during_heating"
+                self._invalidate_current_cycle("window_opened_during_heating")
                 # Reset POST-VENT flag pokud byl aktivní
                 if self._post_vent_mode:
                     self._post_vent_mode = False
@@ -763,19 +1952,39 @@ class RoomController:
                     f"TRV [{self._room_name}]: Window opened during COOLDOWN, "
                     "invalidating cycle"
                 )
-                self._current_cycle["valid"] = False
-                self._current_cycle["invalidation_reason"] = "window_opened_during_cooldown"
+                self._invalidate_current_cycle("window_opened_during_cooldown")
             
+            self._pwm.reset_period()
             await self._set_all_trv(TRV_OFF)
+            await self._record_interrupted_cycle("window_opened")
         
         elif new_state == STATE_ERROR:
+            self._pwm.reset_period()
             await self._set_all_trv(TRV_OFF)
+            await self._record_interrupted_cycle("error")
 
     async def _continue_in_state(self, temp: float, target: float):
         """Pokračovat v aktuálním stavu (žádný přechod)."""
-        # V HEATING stavu neděláme nic speciálního
         # V COOLDOWN měříme teplotu (už se děje v _evaluate_state)
-        pass
+        # V HEATING jen doladit otevření ventilů (pokud je TRV mají)
+        if self._state != STATE_HEATING or not self._has_valves():
+            return
+        
+        opening = self._compute_valve_opening(temp, target)
+        if abs(opening - self._valve_opening) < VALVE_UPDATE_STEP:
+            return
+        
+        self._valve_opening = opening
+        if self._current_cycle is not None:
+            cycle_opening = self._current_cycle.valve_opening
+            self._current_cycle.valve_opening = (
+                opening if cycle_opening is None else min(cycle_opening, opening)
+            )
+        self._commands_in_flight += 1
+        try:
+            await self._set_all_valves(opening, COMMAND_PRIORITY_HEATING)
+        finally:
+            self._commands_in_flight -= 1
 
     async def _start_heating(self, temp: float, target: float):
         """Začít topení."""
@@ -784,17 +1993,35 @@ class RoomController:
         self._heating_target_temp = target
         
         # Inicializovat nový cyklus
-        self._current_cycle = {
-            "timestamp": int(self._heating_start_time),
-            "start_temp": temp,
-            "target": target,
-            "valid": True,  # Předpokládáme validitu, může být změněno
-            "post_vent": self._post_vent_mode,  # Označit POST-VENT cyklus
-        }
+        self._current_cycle = CycleRecord(
+            timestamp=int(self._heating_start_time),
+            start_temp=temp,
+            target=target,
+            valid=True,  # Předpokládáme validitu, může být změněno
+            post_vent=self._post_vent_mode,  # Označit POST-VENT cyklus
+        )
+        
+        # PWM pulz (perioda právě začala v _evaluate_pwm)
+        pwm_pulse = self._pwm_active() and not self._pwm.period_elapsed and self._pwm.on_time > 0
+        if pwm_pulse:
+            self._current_cycle.mode = CONTROL_MODE_PWM
+            self._current_cycle.planned_duration = self._pwm.on_time
+        elif self._control_mode == CONTROL_MODE_PWM:
+            # ON/OFF cyklus mimo PWM periodu (učení, RECOVERY, POST-VENT)
+            self._pwm.reset_period()
+        
+        if self._has_valves():
+            self._valve_opening = self._compute_valve_opening(temp, target)
+            self._current_cycle.valve_opening = self._valve_opening
         
         await self._set_all_trv(TRV_ON)
         
-        if self._post_vent_mode:
+        if pwm_pulse:
+            _LOGGER.info(
+                f"TRV [{self._room_name}]: Started PWM pulse "
+                f"(on_time={self._pwm.on_time:.0f}s)"
+            )
+        elif self._post_vent_mode:
             _LOGGER.info(
                 f"TRV [{self._room_name}]: Started POST-VENT cycle "
                 f"(will heat until target is reached)"
@@ -820,12 +2047,13 @@ class RoomController:
         """Začít cooldown měření."""
         self._cooldown_start_time = time.time()
         self._cooldown_max_temp = temp
+        self._peak_estimator.reset()
         
         # Uložit dobu topení
-        if self._heating_start_time:
+        if self._heating_start_time and self._current_cycle is not None:
             heating_duration = self._cooldown_start_time - self._heating_start_time
-            self._current_cycle["heating_duration"] = heating_duration
-            self._current_cycle["stop_temp"] = temp
+            self._current_cycle.heating_duration = heating_duration
+            self._current_cycle.stop_temp = temp
             
             _LOGGER.info(
                 f"TRV [{self._room_name}]: Heating stopped after {heating_duration:.0f}s, "
@@ -834,34 +2062,57 @@ class RoomController:
         
         await self._set_all_trv(TRV_OFF)
 
-    async def _finish_cooldown(self, temp: float, target: float):
+    def _cooldown_peak_passed(self) -> bool:
+        """Zda sklon teploty spolehlivě potvrzuje, že vrchol už byl.
+
+        Regrese přes PEAK_SLOPE_WINDOW odfiltruje kvantizaci senzoru (0.1°C),
+        takže jednorázový pokles o jeden krok cooldown neukončí.
+        """
+        if self._peak_estimator.count < PEAK_MIN_SAMPLES:
+            return False
+        if self._peak_estimator.span < PEAK_MIN_SPAN:
+            return False
+        slope = self._peak_estimator.slope
+        return slope is not None and slope <= -PEAK_FALL_SLOPE
+
+    async def _finish_cooldown(self, temp: float, target: float, end_reason: str):
         """Dokončit cooldown a uložit cyklus."""
-        if not self._current_cycle:
+        cycle = self._current_cycle
+        if cycle is None:
             return
         
         # Vypočítat překmit
         overshoot = (self._cooldown_max_temp or temp) - target
-        self._current_cycle["max_temp"] = self._cooldown_max_temp or temp
-        self._current_cycle["overshoot"] = overshoot
+        cycle.max_temp = self._cooldown_max_temp or temp
+        cycle.overshoot = overshoot
+        cycle.cooldown_duration = time.time() - self._cooldown_start_time
+        cycle.cooldown_end = end_reason
         
         # Validovat cyklus
-        is_valid = self._is_cycle_valid(self._current_cycle)
-        self._current_cycle["valid"] = is_valid
+        is_valid = self._is_cycle_valid(cycle)
+        cycle.valid = is_valid
         
-        # Uložit do historie
-        self._history.append(self._current_cycle)
-        if len(self._history) > HISTORY_SIZE:
-            self._history = self._history[-HISTORY_SIZE:]
+        # Uložit do historie (ring buffer - nejstarší cyklus vypadne)
+        self._history.append(cycle)
         
         _LOGGER.info(
             f"TRV [{self._room_name}]: Cycle finished - "
-            f"duration={self._current_cycle.get('heating_duration', 0):.0f}s, "
+            f"duration={cycle.heating_duration or 0:.0f}s, "
             f"overshoot={overshoot:.2f}°C, valid={is_valid}"
         )
         
+        # Předat cyklus do dlouhodobých statistik
+        self._cycle_statistics.record_cycle(
+            cycle,
+            self._reliability_tracker.commands_sent_total
+        )
+        
         # Pokud je validní, aplikovat učení
         if is_valid:
-            await self._apply_learning()
+            self._pwm.observe_cycle(cycle)
+            # PWM pulzy nemění naučenou dobu ON/OFF cyklu, jen tepelný zisk
+            if cycle.mode != CONTROL_MODE_PWM:
+                await self._apply_learning()
         
         # Uložit parametry
         await self._save_learned_params()
@@ -870,26 +2121,72 @@ class RoomController:
         self._heating_start_time = None
         self._cooldown_start_time = None
         self._cooldown_max_temp = None
-        self._current_cycle = {}
+        self._peak_estimator.reset()
+        self._current_cycle = None
+
+    async def _record_interrupted_cycle(
+        self,
+        reason: str,
+        cycle: Optional[CycleRecord] = None,
+        heating_start: Optional[float] = None,
+        heating_end: Optional[float] = None,
+    ):
+        """Uložit přerušený cyklus (okno, chyba, restart) do historie a statistik.
+
+        Bez argumentů se bere rozběhnutý cyklus; doba topení je čas od startu
+        do konce topení (případně do teď).
+        """
+        current = cycle is None
+        if current:
+            cycle = self._current_cycle
+            heating_start = self._heating_start_time
+            heating_end = self._cooldown_start_time
+        if cycle is None:
+            return
+        
+        finished_at = time.time() if current else (heating_end or time.time())
+        if cycle.heating_duration is None and heating_start:
+            cycle.heating_duration = max(0.0, (heating_end or finished_at) - heating_start)
+        cycle.invalidate(cycle.invalidation_reason or reason)
+        self._history.append(cycle)
+        
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: Cycle interrupted ({cycle.invalidation_reason}) - "
+            f"duration={cycle.heating_duration or 0:.0f}s"
+        )
+        
+        self._cycle_statistics.record_cycle(
+            cycle,
+            self._reliability_tracker.commands_sent_total,
+            finished_at=finished_at,
+        )
+        await self._save_learned_params()
+        
+        if current:
+            self._heating_start_time = None
+            self._cooldown_start_time = None
+            self._cooldown_max_temp = None
+            self._peak_estimator.reset()
+            self._current_cycle = None
 
-    def _is_cycle_valid(self, cycle: dict) -> bool:
+    def _is_cycle_valid(self, cycle: CycleRecord) -> bool:
         """Zkontrolovat zda je cyklus validní pro učení."""
         # Pokud byl manuálně invalidován (okno, změna targetu)
-        if not cycle.get("valid", True):
+        if not cycle.valid:
             return False
         
         # POST-VENT cykly nepoužívat pro učení
-        if cycle.get("post_vent", False):
+        if cycle.post_vent:
             _LOGGER.debug(
                 f"TRV [{self._room_name}]: Cycle invalid - POST-VENT recovery cycle "
                 "(not used for learning)"
             )
             return False
         
-        heating_duration = cycle.get("heating_duration", 0)
-        overshoot = cycle.get("overshoot", 0)
-        stop_temp = cycle.get("stop_temp", 0)
-        target = cycle.get("target", 0)
+        heating_duration = cycle.heating_duration or 0
+        overshoot = cycle.overshoot or 0
+        stop_temp = cycle.stop_temp or 0
+        target = cycle.target or 0
         
         # Kontroly
         if heating_duration < self._min_heating_duration:
@@ -925,75 +2222,163 @@ class RoomController:
     async def _apply_learning(self):
         """Aplikovat učení z validního cyklu s kontinuálním učením."""
         # Přidat aktuální cyklus do performance_history pokud je validní
-        if self._current_cycle.get("valid", False):
-            # Validate that required keys exist
-            if all(key in self._current_cycle for key in ["heating_duration", "overshoot", "timestamp"]):
+        cycle = self._current_cycle
+        if cycle is not None and cycle.valid:
+            # Validate that required fields are filled
+            if cycle.heating_duration is not None and cycle.overshoot is not None:
                 self._performance_history.append({
-                    "heating_duration": self._current_cycle["heating_duration"],
-                    "overshoot": self._current_cycle["overshoot"],
-                    "timestamp": self._current_cycle["timestamp"],
+                    "heating_duration": cycle.heating_duration,
+                    "overshoot": cycle.overshoot,
+                    "timestamp": cycle.timestamp,
                 })
+                if self._is_learning:
+                    self._learning_confidence.add(cycle.heating_duration, cycle.overshoot)
             else:
                 _LOGGER.warning(
-                    f"TRV [{self._room_name}]: Current cycle missing required keys, skipping learning"
+                    f"TRV [{self._room_name}]: Current cycle missing required fields, skipping learning"
                 )
         
         # Spočítat validní cykly
-        valid_cycles = [c for c in self._history if c.get("valid", False)]
-        self._valid_cycles_count = len(valid_cycles)
-        
-        # Pokud máme alespoň learning_cycles_required cyklů v performance_history
-        if len(self._performance_history) >= self._learning_cycles_required:
-            # PŘEPOČÍTAT z posledních N cyklů (klouzavý průměr)
-            durations = [c["heating_duration"] for c in self._performance_history]
-            overshoots = [c["overshoot"] for c in self._performance_history]
-            
+        self._valid_cycles_count = sum(1 for c in self._history if c.valid)
+        
+        # Warm-start: z prvního cyklu s rychlostí ohřevu sestavit prior z podobných místností
+        if self._is_learning and self._learning_prior_enabled and self._learning_prior is None:
+            self._learning_prior = self._build_learning_prior()
+        
+        self._update_learned_model()
+
+    def _update_learned_model(self):
+        """Přepočítat naučené parametry z performance history (a ukončit učení)."""
+        cycles = len(self._performance_history)
+        prior = self._learning_prior
+        use_prior = (
+            prior is not None
+            and PRIOR_MIN_CYCLES <= cycles < self._learning_cycles_required
+        )
+        
+        was_learning = self._is_learning
+        if was_learning:
+            completion = self._learning_completion(use_prior)
+            if completion is None:
+                # Stále učíme - cykly zatím nejsou dost konzistentní
+                _LOGGER.debug(
+                    f"TRV [{self._room_name}]: Learning in progress "
+                    f"({self._learning_confidence.cycles}/{self._learning_cycles_required} cycles, "
+                    f"confidence={self._learning_confidence.confidence:.0%})"
+                )
+                return
+        elif self._learning_relapsed():
+            return
+        
+        if not cycles:
+            return
+        
+        # PŘEPOČÍTAT z posledních N cyklů (klouzavý průměr, s priorem posterior)
+        durations = [c["heating_duration"] for c in self._performance_history]
+        overshoots = [c["overshoot"] for c in self._performance_history]
+        
+        if use_prior:
+            new_avg_duration, new_avg_overshoot = prior.posterior(durations, overshoots)
+        else:
             new_avg_duration = sum(durations) / len(durations)
             new_avg_overshoot = sum(overshoots) / len(overshoots)
-            
-            # Vypočítat nový time_offset
-            new_time_offset = self._calculate_time_offset(
-                new_avg_duration,
-                new_avg_overshoot
+        
+        # Vypočítat nový time_offset
+        new_time_offset = self._calculate_time_offset(
+            new_avg_duration,
+            new_avg_overshoot
+        )
+        
+        if was_learning:
+            # Učící fáze dokončena (spolehlivost, prior nebo max. počet cyklů)
+            _LOGGER.info(
+                f"TRV [{self._room_name}]: LEARNING COMPLETE ({completion})! "
+                f"avg_duration={new_avg_duration:.0f}s, "
+                f"avg_overshoot={new_avg_overshoot:.2f}°C, "
+                f"time_offset={new_time_offset:.0f}s "
+                f"(z posledních {len(self._performance_history)} cyklů"
+                + (f" + prior {prior.weight:.1f} cyklů" if use_prior else "")
+                + f", confidence={self._learning_confidence.confidence:.0%})"
             )
+            self._is_learning = False
+        elif self._avg_heating_duration is not None:
+            # Kontinuální úprava - logovat jen pokud je změna > SIGNIFICANT_*_CHANGE
+            duration_change = abs(new_avg_duration - self._avg_heating_duration)
+            offset_change = abs(new_time_offset - self._time_offset)
             
-            # Logovat změny pokud jsou významné
-            is_first_learning = (self._avg_heating_duration is None)
-            
-            if is_first_learning:
-                # První naučení - systém dokončil počáteční učící fázi
+            if duration_change > SIGNIFICANT_DURATION_CHANGE or offset_change > SIGNIFICANT_OFFSET_CHANGE:
                 _LOGGER.info(
-                    f"TRV [{self._room_name}]: LEARNING COMPLETE! "
-                    f"avg_duration={new_avg_duration:.0f}s, "
-                    f"avg_overshoot={new_avg_overshoot:.2f}°C, "
-                    f"time_offset={new_time_offset:.0f}s "
-                    f"(z posledních {len(self._performance_history)} cyklů)"
+                    f"TRV [{self._room_name}]: Parameters updated: "
+                    f"avg_duration {self._avg_heating_duration:.0f}s → {new_avg_duration:.0f}s, "
+                    f"time_offset {self._time_offset:.0f}s → {new_time_offset:.0f}s "
+                    f"(klouzavý průměr z {len(self._performance_history)} cyklů)"
                 )
-                self._is_learning = False
-            else:
-                # Kontinuální úprava - logovat jen pokud je změna > SIGNIFICANT_*_CHANGE
-                duration_change = abs(new_avg_duration - self._avg_heating_duration)
-                offset_change = abs(new_time_offset - self._time_offset)
-                
-                if duration_change > SIGNIFICANT_DURATION_CHANGE or offset_change > SIGNIFICANT_OFFSET_CHANGE:
-                    _LOGGER.info(
-                        f"TRV [{self._room_name}]: Parameters updated: "
-                        f"avg_duration {self._avg_heating_duration:.0f}s → {new_avg_duration:.0f}s, "
-                        f"time_offset {self._time_offset:.0f}s → {new_time_offset:.0f}s "
-                        f"(klouzavý průměr z {len(self._performance_history)} cyklů)"
-                    )
-            
-            # Aplikovat nové hodnoty
-            self._avg_heating_duration = new_avg_duration
-            self._avg_overshoot = new_avg_overshoot
-            self._time_offset = new_time_offset
-            self._last_learned = datetime.now().isoformat()
-        elif self._is_learning and self._avg_heating_duration is None:
-            # Stále učíme a nemáme ještě dost cyklů - neděláme nic
-            _LOGGER.debug(
-                f"TRV [{self._room_name}]: Learning in progress "
-                f"({len(self._performance_history)}/{self._learning_cycles_required} cycles)"
+        
+        # Aplikovat nové hodnoty
+        self._avg_heating_duration = new_avg_duration
+        self._avg_overshoot = new_avg_overshoot
+        self._time_offset = new_time_offset
+        self._last_learned = datetime.now().isoformat()
+
+    def _learning_completion(self, use_prior: bool) -> Optional[str]:
+        """Důvod konce učící fáze (None = učit dál).
+
+        Konzistentní cykly ukončí učení dřív než po learning_cycles_required,
+        rozptýlené ho prodlouží (max. LEARNING_MAX_CYCLES_FACTOR ×).
+        """
+        confidence = self._learning_confidence
+        required = self._learning_cycles_required
+        if confidence.cycles >= LEARNING_MIN_CYCLES and confidence.confidence >= 1.0:
+            return "confident"
+        if use_prior and len(self._performance_history) + self._learning_prior.weight >= required:
+            return "prior"
+        if confidence.cycles >= required and confidence.confidence >= LEARNING_EXTEND_CONFIDENCE:
+            return "cycles"
+        if confidence.cycles >= required * LEARNING_MAX_CYCLES_FACTOR:
+            return "max_cycles"
+        if confidence.cycles == required:
+            _LOGGER.info(
+                f"TRV [{self._room_name}]: Learning extended - cycles inconsistent "
+                f"(confidence={confidence.confidence:.0%})"
             )
+        return None
+
+    def _learning_relapsed(self) -> bool:
+        """Naučená místnost - skok rozptylu posledních cyklů vrátí učení."""
+        window = LearningConfidence.from_cycles(self._performance_history)
+        if window.cycles < LEARNING_MIN_CYCLES or window.confidence >= LEARNING_RELEARN_CONFIDENCE:
+            return False
+        
+        _LOGGER.warning(
+            f"TRV [{self._room_name}]: Recent cycles inconsistent "
+            f"(confidence={window.confidence:.0%}), returning to learning"
+        )
+        self._is_learning = True
+        self._learning_confidence = LearningConfidence()
+        self._learning_prior = None
+        # Nové učení jen z cyklů po změně (poslední cyklus se započítá)
+        last = self._performance_history[-1]
+        self._performance_history.clear()
+        self._performance_history.append(last)
+        self._learning_confidence.add(last["heating_duration"], last["overshoot"])
+        return True
+
+    def _build_learning_prior(self) -> Optional[LearningPrior]:
+        """Prior z naučených místností s podobnou rychlostí ohřevu a počtem TRV."""
+        if self._current_cycle is None:
+            return None
+        rate = heating_rate(self._current_cycle)
+        if rate is None or self._room_index is None:
+            return None
+        candidates = [
+            room.learning_profile for room in self._room_index.rooms if room is not self
+        ]
+        return build_learning_prior(
+            self._room_name,
+            self._enabled_trv_count(),
+            rate,
+            [profile for profile in candidates if profile is not None],
+        )
 
     def _calculate_time_offset(self, avg_duration: float, avg_overshoot: float) -> float:
         """Vypočítat počáteční time_offset."""
@@ -1010,24 +2395,72 @@ class RoomController:
         return time_offset
 
     async def _set_all_trv(self, command: dict[str, Any]):
-        """Nastavit všechny TRV hlavice s verifikací."""
+        """Nastavit všechny TRV hlavice (a polohy ventilů) s verifikací."""
+        if command != TRV_ON:
+            self._valve_opening = 0
+        priority = COMMAND_PRIORITY_HEATING if command == TRV_ON else COMMAND_PRIORITY_SAFETY
+        
+        self._commands_in_flight += 1
+        try:
+            _, failed_valves = await asyncio.gather(
+                self._set_all_trv_and_verify(command),
+                self._set_all_valves(self._valve_opening, priority),
+            )
+            # TRV řízené ventilem držely ON - pokud se ventil nezavřel,
+            # vypnout je hned setpointem (nečekat na watchdog)
+            if command != TRV_ON and failed_valves:
+                await self._set_all_trv_and_verify(command, failed_valves)
+        finally:
+            self._commands_in_flight -= 1
+
+    async def _set_all_trv_and_verify(
+        self, command: dict[str, Any], entity_ids: Optional[set[str]] = None
+    ):
+        """Odeslat příkaz všem aktivním TRV (nebo jen `entity_ids`) a ověřit výsledek."""
         mode = command["hvac_mode"]
         temp = command["temperature"]
         
-        active_count = sum(1 for trv in self._trv_entities if trv.get("enabled", True))
+        # Příkaz per TRV - TRV řízené ventilem drží setpoint ON, otevření určuje ventil
+        commands = {
+            trv_config["entity"]: self._trv_command(trv_config, command)
+            for trv_config in self._trv_entities
+            if trv_config.get("enabled", True)
+            and (entity_ids is None or trv_config["entity"] in entity_ids)
+        }
+        valve_held = {
+            trv_config["entity"]
+            for trv_config in self._trv_entities
+            if trv_config.get("enabled", True) and self._valve_holds_setpoint(trv_config)
+        }
+        
+        # TRV řízené ventilem, které už setpoint mají, se znovu nepřikazují.
+        # Circuit breaker platí jen pro watchdog korekce - příkazy řídicí
+        # smyčky (hlavně bezpečnostní OFF) dostane každá TRV.
+        active_entities = [
+            entity_id
+            for entity_id, trv_command in commands.items()
+            if entity_id not in valve_held
+            or not self._trv_setpoint_matches(
+                self._hass.states.get(entity_id),
+                self._resolve_setpoint(entity_id, trv_command),
+            )
+        ]
+        if not active_entities:
+            return
         
         _LOGGER.info(
-            f"TRV [{self._room_name}]: Setting {active_count} TRV(s) to "
+            f"TRV [{self._room_name}]: Setting {len(active_entities)} TRV(s) to "
             f"{mode.upper()} ({temp}°C)"
+            + (f", {len(valve_held)} held by valve control" if valve_held else "")
         )
         
         # 1️⃣ Zaznamenat last_seen PŘED příkazem
         last_seen_before = {}
         for trv_config in self._trv_entities:
-            if not trv_config.get("enabled", True):
+            entity_id = trv_config["entity"]
+            if entity_id not in active_entities:
                 continue
             
-            entity_id = trv_config["entity"]
             last_seen_sensor = trv_config.get("last_seen_sensor")
             
             if last_seen_sensor:
@@ -1039,32 +2472,62 @@ class RoomController:
                         f"TRV [{self._room_name}]: {entity_id} last_seen sensor unavailable"
                     )
         
-        # 2️⃣ Track command + poslat příkazy
-        for trv_config in self._trv_entities:
-            if not trv_config.get("enabled", True):
-                continue
-            
-            entity_id = trv_config["entity"]
-            
-            # Track command sent
-            self._reliability_tracker.command_sent(entity_id)
-            
-            await self._hass.services.async_call(
-                "climate",
-                "set_hvac_mode",
-                {"entity_id": entity_id, "hvac_mode": mode},
-                blocking=True,
+        # 2️⃣ Track command + poslat příkazy (přes centrální frontu)
+        priority = COMMAND_PRIORITY_HEATING if command == TRV_ON else COMMAND_PRIORITY_SAFETY
+        
+        # Setpoint podle schopností jednotlivých TRV (min_temp/max_temp)
+        setpoints = {
+            entity_id: self._resolve_setpoint(entity_id, commands[entity_id])
+            for entity_id in active_entities
+        }
+        
+        # Měřit latenci potvrzení (setpoint / last_seen) od odeslání příkazu
+        ack_watcher = TrvAckWatcher(
+            self._subscription_hub,
+            setpoints,
+            {
+                trv_config["entity"]: trv_config.get("last_seen_sensor")
+                for trv_config in self._trv_entities
+            },
+        )
+        
+        async def _send(entity_id: str) -> bool:
+            sent = await self._send_trv_command(
+                entity_id,
+                commands[entity_id]["hvac_mode"],
+                setpoints[entity_id],
+                priority,
+                on_dispatch=partial(ack_watcher.mark_sent, entity_id),
             )
+            # Nahrazené ve frontě se nepočítají jako odeslané
+            if sent:
+                self._reliability_tracker.command_sent(entity_id)
+            else:
+                self._reliability_tracker.command_superseded(entity_id)
+            return sent
+        
+        ack_watcher.start()
+        try:
+            results = await asyncio.gather(*(
+                _send(entity_id) for entity_id in active_entities
+            ))
             
-            await self._hass.services.async_call(
-                "climate",
-                "set_temperature",
-                {"entity_id": entity_id, "temperature": temp},
-                blocking=True,
-            )
+            # Příkazy nahrazené novějším záměrem se neverifikují
+            sent_entities = {
+                entity_id for entity_id, sent in zip(active_entities, results) if sent
+            }
+            if not sent_entities:
+                return
+            
+            # 3️⃣ Počkat na odpověď (adaptivní timeout per TRV)
+            await ack_watcher.async_wait({
+                entity_id: self._reliability_tracker.verify_timeout(entity_id)
+                for entity_id in sent_entities
+            })
+        finally:
+            ack_watcher.stop()
         
-        # 3️⃣ Počkat a ověřit stav
-        await asyncio.sleep(TRV_COMMAND_VERIFY_DELAY)
+        self._record_acks(ack_watcher, sent_entities)
         
         # 4️⃣ Verifikovat že všechny TRV přijaly příkaz
         for trv_config in self._trv_entities:
@@ -1072,6 +2535,12 @@ class RoomController:
                 continue
             
             entity_id = trv_config["entity"]
+            if entity_id not in sent_entities:
+                continue
+            
+            trv_command = commands[entity_id]
+            mode = trv_command["hvac_mode"]
+            temp = setpoints[entity_id]
             trv_state = self._hass.states.get(entity_id)
             
             if not trv_state or trv_state.state == "unavailable":
@@ -1089,6 +2558,12 @@ class RoomController:
             # Temperature check (existující logika)
             temp_ok = actual_temp is not None and abs(actual_temp - temp) <= TRV_TEMP_TOLERANCE
             
+            # TRV si setpoint sama ořízla (bez min_temp/max_temp atributu)
+            self._forget_setpoint_clamp(entity_id, actual_temp)
+            if self._learn_setpoint_clamp(entity_id, trv_command, temp, actual_temp):
+                temp = actual_temp
+                temp_ok = True
+            
             # 🆕 Last seen check
             if entity_id in last_seen_before:
                 last_seen_sensor = trv_config.get("last_seen_sensor")
@@ -1111,6 +2586,7 @@ class RoomController:
                             actual={"last_seen": last_seen_after},
                             reason=FAILURE_REASON_NO_RESPONSE
                         )
+                        self._watchdog.record_no_response(entity_id, last_seen_after)
                         continue
                     else:
                         # ✅ Last_seen se změnil = TRV odpověděla
@@ -1120,6 +2596,7 @@ class RoomController:
                         )
                         # Mark as succeeded
                         self._reliability_tracker.command_succeeded(entity_id)
+                        self._watchdog.record_response(entity_id)
             
             # Existing temperature/mode verification...
             if not temp_ok:
@@ -1151,6 +2628,21 @@ class RoomController:
                     f"TRV [{self._room_name}]: {entity_id} verified OK ({actual_mode}/{actual_temp}°C)"
                 )
 
+    async def _async_watchdog_tick(self, now=None):
+        """Watchdog tick - běží s vlastní kadencí, mimo řídicí smyčku."""
+        if self._watchdog_running:
+            return  # Předchozí tick ještě ověřuje korekce
+        
+        if self._commands_in_flight:
+            return  # Právě probíhá příkaz + verifikace z řídicí smyčky
+        
+        self._watchdog_running = True
+        try:
+            with self._perf.measure("verify_trv_state"):
+                await self._verify_trv_state()
+        finally:
+            self._watchdog_running = False
+
     async def _verify_trv_state(self):
         """Pravidelná kontrola, zda TRV odpovídají očekávanému stavu."""
         # Určit očekávaný příkaz podle aktuálního stavu
@@ -1160,91 +2652,422 @@ class RoomController:
             # IDLE, COOLDOWN, VENT, ERROR → všechny mají TRV OFF
             expected_command = TRV_OFF
         
-        expected_temp = expected_command["temperature"]
-        expected_mode = expected_command["hvac_mode"]
+        expected_opening = self._valve_opening if self._state == STATE_HEATING else 0
         
+        corrections = []
         for trv_config in self._trv_entities:
             if not trv_config.get("enabled", True):
                 continue
-            
-            entity_id = trv_config["entity"]
-            trv_state = self._hass.states.get(entity_id)
-            
-            if not trv_state or trv_state.state in ("unavailable", "unknown"):
-                continue  # TRV offline je řešeno v _check_trv_availability
-            
-            actual_temp = trv_state.attributes.get("temperature")
-            actual_mode = trv_state.state
-            
-            # Smart watchdog - check only temperature!
-            temp_mismatch = actual_temp is not None and abs(actual_temp - expected_temp) > TRV_TEMP_TOLERANCE
-            
-            if temp_mismatch:
-                # REAL mismatch - temperature is wrong!
-                _LOGGER.warning(
-                    f"TRV [{self._room_name}]: {entity_id} STATE MISMATCH detected! "
-                    f"Expected: {expected_temp}°C, Actual: {actual_temp}°C (mode: {actual_mode}) - CORRECTING NOW"
-                )
-                
-                # 🆕 Zaznamenat last_seen PŘED korekcí
-                last_seen_before = None
-                last_seen_sensor = trv_config.get("last_seen_sensor")
-                
-                if last_seen_sensor:
-                    sensor_state = self._hass.states.get(last_seen_sensor)
-                    if sensor_state and sensor_state.state not in ("unavailable", "unknown"):
-                        last_seen_before = sensor_state.state
-                
-                # Track watchdog correction
-                self._reliability_tracker.watchdog_correction(
-                    entity_id,
-                    expected={"hvac_mode": expected_mode, "temperature": expected_temp},
-                    found={"hvac_mode": actual_mode, "temperature": actual_temp},
-                    reason=FAILURE_REASON_TEMP_MISMATCH
+            if trv_config["entity"] in self._restart_reset_pending:
+                continue
+            if trv_config.get("valve_entity"):
+                corrections.append(
+                    self._verify_valve_trv(trv_config, expected_command, expected_opening)
                 )
+            else:
+                corrections.append(self._verify_single_trv(trv_config, expected_command))
+        
+        # Korekce jednotlivých TRV běží souběžně (fronta hlídá airtime)
+        await asyncio.gather(*corrections)
+
+    async def _verify_single_trv(self, trv_config: dict, expected_command: dict):
+        """Zkontrolovat jednu TRV a případně ji opravit."""
+        entity_id = trv_config["entity"]
+        expected_mode = expected_command["hvac_mode"]
+        
+        trv_state = self._hass.states.get(entity_id)
+        
+        if not trv_state or trv_state.state in ("unavailable", "unknown"):
+            return  # TRV offline je řešeno v _check_trv_availability
+        
+        # Hlavice drží setpoint za naučeným ořezáním → ořezání neplatí
+        self._forget_setpoint_clamp(entity_id, trv_state.attributes.get("temperature"))
+        expected_temp = self._resolve_setpoint(entity_id, expected_command)
+        
+        last_seen_sensor = trv_config.get("last_seen_sensor")
+        last_seen_before = None
+        if last_seen_sensor:
+            sensor_state = self._hass.states.get(last_seen_sensor)
+            if sensor_state and sensor_state.state not in ("unavailable", "unknown"):
+                last_seen_before = sensor_state.state
+        
+        # Circuit breaker / backoff
+        if not self._watchdog.allow_attempt(entity_id, last_seen_before):
+            return
+        
+        actual_temp = trv_state.attributes.get("temperature")
+        actual_mode = trv_state.state
+        
+        # Smart watchdog - check only temperature!
+        temp_mismatch = actual_temp is not None and abs(actual_temp - expected_temp) > TRV_TEMP_TOLERANCE
+        
+        if not temp_mismatch:
+            self._watchdog.record_in_sync(entity_id)
+            return
+        
+        # REAL mismatch - temperature is wrong!
+        _LOGGER.warning(
+            f"TRV [{self._room_name}]: {entity_id} STATE MISMATCH detected! "
+            f"Expected: {expected_temp}°C, Actual: {actual_temp}°C (mode: {actual_mode}) - CORRECTING NOW"
+        )
+        
+        # Track watchdog correction
+        self._reliability_tracker.watchdog_correction(
+            entity_id,
+            expected={"hvac_mode": expected_mode, "temperature": expected_temp},
+            found={"hvac_mode": actual_mode, "temperature": actual_temp},
+            reason=FAILURE_REASON_TEMP_MISMATCH
+        )
+        self._watchdog.record_correction(entity_id)
+        
+        # Okamžitě opravit
+        ack_watcher = TrvAckWatcher(
+            self._subscription_hub, {entity_id: expected_temp}, {entity_id: last_seen_sensor}
+        )
+        ack_watcher.start()
+        try:
+            sent = await self._send_trv_command(
+                entity_id,
+                expected_mode,
+                expected_temp,
+                COMMAND_PRIORITY_WATCHDOG,
+                on_dispatch=partial(ack_watcher.mark_sent, entity_id),
+            )
+            if sent:
+                await ack_watcher.async_wait({
+                    entity_id: self._reliability_tracker.verify_timeout(entity_id)
+                })
+        finally:
+            ack_watcher.stop()
+        
+        if sent:
+            self._record_acks(ack_watcher, [entity_id])
+            # Nesoulad (ruční změna) se za ořezání nepočítá, hodnota hned po korekci ano
+            trv_state = self._hass.states.get(entity_id)
+            if trv_state and self._learn_setpoint_clamp(
+                entity_id, expected_command, expected_temp, trv_state.attributes.get("temperature")
+            ):
+                expected_temp = trv_state.attributes.get("temperature")
+        
+        # Bez last_seen senzoru: přetrvávající mismatch po korekci = neodpověděla
+        if sent and not last_seen_before:
+            if self._trv_setpoint_matches(self._hass.states.get(entity_id), expected_temp):
+                self._watchdog.record_response(entity_id)
+            else:
+                self._watchdog.record_no_response(entity_id)
+        
+        # 🆕 Zkontrolovat last_seen
+        if sent and last_seen_before:
+            sensor_state = self._hass.states.get(last_seen_sensor)
+            if sensor_state and sensor_state.state not in ("unavailable", "unknown"):
+                last_seen_after = sensor_state.state
                 
-                # Okamžitě opravit
-                await self._hass.services.async_call(
-                    "climate",
-                    "set_hvac_mode",
-                    {"entity_id": entity_id, "hvac_mode": expected_mode},
-                    blocking=True,
+                if last_seen_after == last_seen_before:
+                    # ❌ Last_seen NEZMĚNĚN - TRV neodpověděla na korekci
+                    _LOGGER.warning(
+                        f"TRV [{self._room_name}]: {entity_id} did NOT respond to "
+                        f"watchdog correction (last_seen unchanged)"
+                    )
+                    self._reliability_tracker.command_failed(
+                        entity_id,
+                        expected={"hvac_mode": expected_mode, "temperature": expected_temp},
+                        actual={"last_seen": last_seen_after},
+                        reason=FAILURE_REASON_NO_RESPONSE
+                    )
+                    self._watchdog.record_no_response(entity_id, last_seen_after)
+                else:
+                    # ✅ Last_seen ZMĚNĚN - TRV odpověděla
+                    _LOGGER.debug(
+                        f"TRV [{self._room_name}]: {entity_id} responded to "
+                        f"watchdog correction"
+                    )
+                    self._reliability_tracker.command_succeeded(entity_id)
+                    self._watchdog.record_response(entity_id)
+
+    async def _verify_valve_trv(
+        self, trv_config: dict, expected_command: dict, expected_opening: int
+    ):
+        """TRV s ventilem: nejdřív poloha ventilu, pak setpoint.
+
+        Pokud se ventil nepodaří ověřit, `_trv_command` už vrátí skutečný
+        příkaz a setpoint se opraví v témže ticku.
+        """
+        await self._verify_single_valve(trv_config, expected_opening)
+        await self._verify_single_trv(trv_config, self._trv_command(trv_config, expected_command))
+
+    async def _verify_single_valve(self, trv_config: dict, expected_opening: int):
+        """Zkontrolovat polohu ventilu jedné TRV a případně ji opravit."""
+        entity_id = trv_config["entity"]
+        valve_entity = self._valve_entity(trv_config)
+        if valve_entity is None:
+            return  # Ventil offline - TRV řídí setpoint (_trv_command)
+        
+        # Backoff / circuit breaker zvlášť pro ventil
+        if not self._watchdog.allow_attempt(valve_entity):
+            return
+        
+        valve_state = self._hass.states.get(valve_entity)
+        if self._valve_matches(valve_state, expected_opening):
+            self._watchdog.record_in_sync(valve_entity)
+            return
+        
+        actual = self._valve_position(valve_state)
+        _LOGGER.warning(
+            f"TRV [{self._room_name}]: {valve_entity} VALVE MISMATCH detected! "
+            f"Expected: {expected_opening}%, Actual: {actual}% - CORRECTING NOW"
+        )
+        self._reliability_tracker.watchdog_correction(
+            entity_id,
+            expected={"valve_opening": expected_opening},
+            found={"valve_opening": actual},
+            reason=FAILURE_REASON_VALVE_MISMATCH
+        )
+        self._watchdog.record_correction(valve_entity)
+        
+        verified = await self._command_valve(
+            entity_id, valve_entity, expected_opening, COMMAND_PRIORITY_WATCHDOG
+        )
+        
+        # Ventil nemá last_seen - přetrvávající mismatch po korekci = neodpověděl
+        if verified:
+            self._watchdog.record_response(valve_entity)
+        elif verified is False:
+            self._watchdog.record_no_response(valve_entity)
+
+    def _has_valves(self) -> bool:
+        """Zda má místnost aspoň jednu aktivní TRV s entitou polohy ventilu."""
+        return any(
+            trv_config.get("enabled", True) and trv_config.get("valve_entity")
+            for trv_config in self._trv_entities
+        )
+
+    def _valve_entity(self, trv_config: dict) -> Optional[str]:
+        """Number entita polohy ventilu TRV, pokud je nakonfigurovaná a dostupná."""
+        valve_entity = trv_config.get("valve_entity")
+        if not valve_entity:
+            return None
+        valve_state = self._hass.states.get(valve_entity)
+        if not valve_state or valve_state.state in ("unavailable", "unknown"):
+            return None
+        return valve_entity
+
+    def _valve_holds_setpoint(self, trv_config: dict) -> bool:
+        """Zda TRV drží setpoint ON a teplo dávkuje poloha ventilu.
+
+        VENT, ERROR a TRV s nedostupným/neověřeným ventilem (nebo ventilem
+        s otevřeným circuit breakerem) se řídí setpointem jako dřív
+        (bezpečný fallback).
+        """
+        valve_entity = self._valve_entity(trv_config)
+        return (
+            self._state not in (STATE_VENT, STATE_ERROR)
+            and trv_config["entity"] not in self._valve_failed
+            and valve_entity is not None
+            and not self._watchdog.is_open(valve_entity)
+        )
+
+    def _trv_command(self, trv_config: dict, command: dict[str, Any]) -> dict[str, Any]:
+        """Setpoint příkaz pro konkrétní TRV (TRV řízené ventilem zůstávají ON)."""
+        return TRV_ON if self._valve_holds_setpoint(trv_config) else command
+
+    @staticmethod
+    def _valve_position(valve_state) -> Optional[float]:
+        """Nahlášená poloha ventilu (%) nebo None."""
+        if not valve_state or valve_state.state in ("unavailable", "unknown"):
+            return None
+        try:
+            return float(valve_state.state)
+        except ValueError:
+            return None
+
+    @classmethod
+    def _valve_matches(cls, valve_state, expected_opening: float) -> bool:
+        """Zda ventil hlásí polohu v toleranci kolem očekávané hodnoty."""
+        actual = cls._valve_position(valve_state)
+        return actual is not None and abs(actual - expected_opening) <= VALVE_TOLERANCE
+
+    def _compute_valve_opening(self, temp: float, target: float) -> int:
+        """Otevření ventilu (%) z naučeného tepelného zisku.
+
+        Při učení, RECOVERY, POST-VENT a PWM pulzu plné otevření (učení
+        potřebuje plný výkon, PWM moduluje samo). Jinak úměrně zbývající
+        chybě - 100 % odpovídá dorovnání za VALVE_FULL_RATE_HORIZON.
+        """
+        if (
+            self._is_learning
+            or self._post_vent_mode
+            or self._recovery_mode
+            or not self._pwm.ready
+            or self._in_pwm_cycle()
+        ):
+            return 100
+        
+        error = target + self._desired_overshoot - temp
+        fraction = error / (self._pwm.gain * VALVE_FULL_RATE_HORIZON)
+        fraction = min(1.0, max(0.0, fraction))
+        return round(VALVE_MIN_OPENING + (100 - VALVE_MIN_OPENING) * fraction)
+
+    async def _set_all_valves(self, opening: int, priority: int) -> set[str]:
+        """Nastavit polohu ventilů všech TRV, které ji podporují (a ověřit).
+
+        Vrací TRV, jejichž ventil polohu nepotvrdil.
+        """
+        pending = []
+        for trv_config in self._trv_entities:
+            if not trv_config.get("enabled", True):
+                continue
+            valve_entity = self._valve_entity(trv_config)
+            if valve_entity is None:
+                continue
+            if self._valve_matches(self._hass.states.get(valve_entity), opening):
+                continue
+            pending.append((trv_config["entity"], valve_entity))
+        
+        if not pending:
+            return set()
+        
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: Setting {len(pending)} valve(s) to {opening}%"
+        )
+        results = await asyncio.gather(*(
+            self._command_valve(entity_id, valve_entity, opening, priority)
+            for entity_id, valve_entity in pending
+        ))
+        return {
+            entity_id
+            for (entity_id, _), verified in zip(pending, results)
+            if verified is False
+        }
+
+    async def _command_valve(
+        self, entity_id: str, valve_entity: str, opening: int, priority: int
+    ) -> Optional[bool]:
+        """Odeslat polohu ventilu a ověřit ji (stejně jako setpoint).
+
+        Vrací True/False podle ověření, None pokud byl příkaz nahrazen.
+        """
+        sent = await self._send_valve_command(valve_entity, opening, priority)
+        if not sent:
+            self._reliability_tracker.command_superseded(entity_id)
+            return None  # Nahrazeno novějším záměrem
+        self._reliability_tracker.command_sent(entity_id)
+        
+        sent_at = time.monotonic()
+        timeout = self._reliability_tracker.verify_timeout(entity_id)
+        if await self._async_wait_for_valve(valve_entity, opening, timeout):
+            self._reliability_tracker.ack_received(entity_id, time.monotonic() - sent_at)
+            self._reliability_tracker.command_succeeded(entity_id)
+            if entity_id in self._valve_failed:
+                self._valve_failed.discard(entity_id)
+                _LOGGER.info(
+                    f"TRV [{self._room_name}]: {valve_entity} confirmed {opening}%, "
+                    "valve control restored"
                 )
-                
-                await self._hass.services.async_call(
-                    "climate",
-                    "set_temperature",
-                    {"entity_id": entity_id, "temperature": expected_temp},
-                    blocking=True,
+            else:
+                _LOGGER.debug(
+                    f"TRV [{self._room_name}]: {valve_entity} verified OK ({opening}%)"
                 )
-                
-                # 🆕 Počkat a zkontrolovat last_seen
-                if last_seen_before:
-                    await asyncio.sleep(TRV_COMMAND_VERIFY_DELAY)
-                    
-                    sensor_state = self._hass.states.get(last_seen_sensor)
-                    if sensor_state and sensor_state.state not in ("unavailable", "unknown"):
-                        last_seen_after = sensor_state.state
-                        
-                        if last_seen_after == last_seen_before:
-                            # ❌ Last_seen NEZMĚNĚN - TRV neodpověděla na korekci
-                            _LOGGER.warning(
-                                f"TRV [{self._room_name}]: {entity_id} did NOT respond to "
-                                f"watchdog correction (last_seen unchanged)"
-                            )
-                            self._reliability_tracker.command_failed(
-                                entity_id,
-                                expected={"hvac_mode": expected_mode, "temperature": expected_temp},
-                                actual={"last_seen": last_seen_after},
-                                reason=FAILURE_REASON_NO_RESPONSE
-                            )
-                        else:
-                            # ✅ Last_seen ZMĚNĚN - TRV odpověděla
-                            _LOGGER.debug(
-                                f"TRV [{self._room_name}]: {entity_id} responded to "
-                                f"watchdog correction"
-                            )
-                            self._reliability_tracker.command_succeeded(entity_id)
+            return True
+        
+        self._reliability_tracker.ack_timed_out(entity_id)
+        actual = self._valve_position(self._hass.states.get(valve_entity))
+        _LOGGER.error(
+            f"TRV [{self._room_name}]: {valve_entity} FAILED to apply valve opening! "
+            f"Expected: {opening}%, Got: {actual}% - falling back to setpoint control"
+        )
+        self._reliability_tracker.command_failed(
+            entity_id,
+            expected={"valve_opening": opening},
+            actual={"valve_opening": actual},
+            reason=FAILURE_REASON_VALVE_MISMATCH
+        )
+        self._valve_failed.add(entity_id)
+        return False
+
+    async def _async_wait_for_valve(
+        self, valve_entity: str, expected_opening: float, timeout: float
+    ) -> bool:
+        """Počkat až ventil nahlásí očekávanou polohu (nebo vyprší timeout)."""
+        if self._valve_matches(self._hass.states.get(valve_entity), expected_opening):
+            return True
+        
+        matched = asyncio.Event()
+        
+        @callback
+        def _state_listener(change: EntityChange):
+            if self._valve_matches(change.new_state, expected_opening):
+                matched.set()
+        
+        unsub = self._subscription_hub.async_subscribe([valve_entity], _state_listener)
+        try:
+            await asyncio.wait_for(matched.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            unsub()
+
+    async def _send_valve_command(self, valve_entity: str, opening: int, priority: int) -> bool:
+        """Odeslat polohu ventilu (přes centrální frontu pokud existuje).
+
+        Vrací False pokud byl příkaz nahrazen novějším záměrem.
+        """
+        if self._command_scheduler is not None:
+            return await self._command_scheduler.async_send_number(
+                valve_entity, opening, priority, room=self._room_name
+            )
+        
+        await self._hass.services.async_call(
+            "number",
+            "set_value",
+            {"entity_id": valve_entity, "value": opening},
+            blocking=True,
+        )
+        return True
+
+    def _record_acks(self, ack_watcher: TrvAckWatcher, entity_ids):
+        """Předat naměřené latence potvrzení do reliability trackeru."""
+        for entity_id in entity_ids:
+            latency = ack_watcher.latency(entity_id)
+            if latency is not None:
+                self._reliability_tracker.ack_received(entity_id, latency)
+            elif not ack_watcher.is_settled(entity_id):
+                self._reliability_tracker.ack_timed_out(entity_id)
+
+    async def _send_trv_command(
+        self,
+        entity_id: str,
+        mode: str,
+        temp: float,
+        priority: int,
+        on_dispatch: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """Odeslat příkaz jedné TRV (přes centrální frontu pokud existuje).
+
+        Vrací False pokud byl příkaz nahrazen novějším záměrem.
+        `on_dispatch` se zavolá těsně před service callem (čas odeslání).
+        """
+        if self._command_scheduler is not None:
+            return await self._command_scheduler.async_send(
+                entity_id, mode, temp, priority, room=self._room_name, on_dispatch=on_dispatch
+            )
+        
+        if on_dispatch is not None:
+            on_dispatch()
+        await self._hass.services.async_call(
+            "climate",
+            "set_hvac_mode",
+            {"entity_id": entity_id, "hvac_mode": mode},
+            blocking=True,
+        )
+        
+        await self._hass.services.async_call(
+            "climate",
+            "set_temperature",
+            {"entity_id": entity_id, "temperature": temp},
+            blocking=True,
+        )
+        return True
 
     def _should_log_no_response_error(self, entity_id: str) -> bool:
         """Rozhodnout jestli logovat NO_RESPONSE ERROR (max 1x/30min)."""
@@ -1258,36 +3081,21 @@ class RoomController:
         return True  # Log
 
     def _get_temperature(self) -> Optional[float]:
-        """Načíst aktuální teplotu."""
-        state = self._hass.states.get(self._temperature_entity)
-        if state and state.state not in ("unavailable", "unknown"):
-            try:
-                return float(state.state)
-            except ValueError:
-                _LOGGER.error(
-                    f"TRV [{self._room_name}]: Invalid temperature value: {state.state}"
-                )
-        return None
+        """Aktuální teplota (ze snapshotu ticku)."""
+        return self.snapshot.temperature
 
     def _get_target(self) -> Optional[float]:
-        """Načíst cílovou teplotu."""
-        state = self._hass.states.get(self._target_entity)
-        if state and state.state not in ("unavailable", "unknown"):
-            try:
-                return float(state.state)
-            except ValueError:
-                _LOGGER.error(
-                    f"TRV [{self._room_name}]: Invalid target value: {state.state}"
-                )
-        return None
+        """Cílová teplota (ze snapshotu ticku)."""
+        return self.snapshot.target
+
+    def _window_detected(self) -> bool:
+        """Zda aktivní detekce z teploty hlásí otevřené okno."""
+        detector = self._window_detector
+        return detector is not None and detector.active and detector.is_open
 
     def _any_window_open(self) -> bool:
-        """Zkontrolovat zda je nějaké okno otevřeno."""
-        for entity_id in self._window_entities:
-            state = self._hass.states.get(entity_id)
-            if state and state.state == "on":
-                return True
-        return False
+        """Zda je nějaké okno otevřeno (kontakty ze snapshotu nebo detekce z teploty)."""
+        return self.snapshot.window_open or self._window_detected()
 
     async def reset_learned_params(self):
         """Manuálně resetovat naučené parametry."""
@@ -1303,6 +3111,8 @@ class RoomController:
         self._is_learning = True
         self._valid_cycles_count = 0
         self._last_learned = None
+        self._learning_prior = None
+        self._learning_confidence = LearningConfidence()
         
         # Smazat historii
         self._history.clear()
@@ -1315,3 +3125,22 @@ class RoomController:
             f"TRV [{self._room_name}]: Reset complete, learning mode activated "
             f"({self._learning_cycles_required} cycles required)"
         )
+
+    def export_learned_params(self) -> dict:
+        """Naučené parametry místnosti ve formátu úložiště (služba export/snapshot)."""
+        self._aggregate_monthly_stats()
+        return self._learned_params_data()
+
+    def import_learned_params(self, room_data: dict):
+        """Převzít (už zvalidované) naučené parametry - služba import.
+
+        Neukládá - služba nejdřív převezme data všech místností a pak je
+        uloží jedním zápisem (`async_save_learned_params`). Živé čítače
+        místnosti se nepřepisují.
+        """
+        self._apply_learned_params(room_data, live=False)
+        _LOGGER.info(f"TRV [{self._room_name}]: Learned parameters applied")
+
+    async def async_save_learned_params(self):
+        """Uložit naučené parametry (služba import, v dávce úložiště)."""
+        await self._save_learned_params()
@@ -1,6 +1,7 @@
 """Sensor platform pro TRV Regulator diagnostiku."""
 import logging
 from datetime import datetime
+from itertools import islice
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
@@ -9,7 +10,15 @@ from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity import EntityCategory
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    DATA_COMMAND_SCHEDULER,
+    DATA_DEMAND_AGGREGATOR,
+    DATA_SUBSCRIPTION_HUB,
+    PHASE_SLOW_THRESHOLD_MS,
+    CONTROL_MODE_PWM,
+)
+from .snapshot import entity_snapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,6 +40,7 @@ async def async_setup_entry(
         TrvStatsSensor(coordinator, room_name, entry.entry_id),
         TrvDiagnosticsSensor(coordinator, room_name, entry.entry_id),
         TrvReliabilitySensor(coordinator, room_name, entry.entry_id),
+        TrvPerformanceSensor(coordinator, room_name, entry.entry_id),
     ]
     
     async_add_entities(sensors)
@@ -44,6 +54,11 @@ async def async_setup_entry(
         summary = TrvSummarySensor(hass, entry_ids)
         async_add_entities([summary])
         hass.data[DOMAIN]["summary_sensor_created"] = True
+    
+    # Poptávka tepla celého domu - také jen jednou
+    if "demand_sensor_created" not in hass.data[DOMAIN]:
+        async_add_entities([TrvHeatDemandSensor(hass.data[DOMAIN][DATA_DEMAND_AGGREGATOR])])
+        hass.data[DOMAIN]["demand_sensor_created"] = True
 
 
 class TrvBaseSensor(CoordinatorEntity, SensorEntity):
@@ -79,6 +94,9 @@ class TrvStateSensor(TrvBaseSensor):
         self._attr_name = "State"
         self._attr_icon = "mdi:state-machine"
 
+    # Příspěvky teplotních zdrojů se mění každý tick, do Recorderu je neukládat
+    _unrecorded_attributes = frozenset({"temperature_sources"})
+
     @property
     def native_value(self):
         """Vrací aktuální stav."""
@@ -89,15 +107,38 @@ class TrvStateSensor(TrvBaseSensor):
         """Vrací dodatečné atributy."""
         room = self.coordinator.room
         
-        # Načíst aktuální teploty
+        # Teploty z posledního ticku řídicí smyčky
         temp = room.get_temperature()
         target = room.get_target()
         
         attrs = {
-            "current_temp": temp,
+            "current_temp": round(temp, 2) if temp is not None else None,
             "target_temp": target,
+            "snapshot_age": round(room.snapshot_age, 1),
         }
         
+        # Režim řízení (PWM až po naučení tepelného zisku)
+        attrs["control_mode"] = room.active_control_mode
+        if room.control_mode == CONTROL_MODE_PWM:
+            attrs["pwm"] = room.pwm_stats
+        
+        # Poloha ventilů (TRV s valve_entity)
+        valve_positions = room.valve_positions
+        if valve_positions:
+            attrs["valves"] = valve_positions
+        
+        # Fúze více teplotních senzorů / záloha z TRV
+        contributions = room.temperature_contributions
+        if len(contributions) > 1 or room.temperature_fallback_active:
+            attrs["temperature_sources"] = contributions
+            attrs["temperature_fallback"] = room.temperature_fallback_active
+        
+        # Filtr teploty (pokud je zapnutý)
+        if room.filtered_temperature is not None:
+            attrs["filtered_temp"] = round(room.filtered_temperature, 2)
+            attrs["temperature_slope"] = round(room.temperature_slope, 2)
+            attrs["filter_suppressed_transitions"] = room.filter_suppressed_transitions
+        
         # Přidat informace o topení pokud probíhá
         if room.state == "heating":
             if room._heating_start_time:
@@ -145,6 +186,14 @@ class TrvLearningSensor(TrvBaseSensor):
         if room.avg_overshoot is not None:
             attrs["avg_overshoot"] = round(room.avg_overshoot, 2)
         
+        confidence = room.learning_confidence
+        attrs["confidence"] = confidence["confidence"]
+        attrs["confidence_duration_ci"] = confidence["duration_ci"]
+        attrs["confidence_overshoot_ci"] = confidence["overshoot_ci"]
+        
+        if room.learning_prior is not None:
+            attrs["prior"] = room.learning_prior
+        
         return attrs
 
 
@@ -189,6 +238,12 @@ class TrvLastCycleSensor(TrvBaseSensor):
         if "max_temp" in cycle:
             attrs["max_temp"] = round(cycle["max_temp"], 1)
         
+        if "cooldown_duration" in cycle:
+            attrs["cooldown_duration"] = int(cycle["cooldown_duration"])
+        
+        if "cooldown_end" in cycle:
+            attrs["cooldown_end"] = cycle["cooldown_end"]
+        
         if "valid" in cycle:
             attrs["valid"] = cycle["valid"]
         
@@ -201,6 +256,9 @@ class TrvLastCycleSensor(TrvBaseSensor):
 class TrvHistorySensor(TrvBaseSensor):
     """Senzor pro historii cyklů."""
 
+    # Grafy cyklů jdou přes long-term statistics, atribut nenahrávat
+    _unrecorded_attributes = frozenset({"cycles"})
+
     def __init__(self, coordinator, room_name: str, entry_id: str):
         """Inicializace history senzoru."""
         super().__init__(coordinator, room_name, entry_id, "history")
@@ -219,7 +277,10 @@ class TrvHistorySensor(TrvBaseSensor):
         
         # Omezit na 20 posledních cyklů (kvůli 16 KB Recorder limitu)
         return {
-            "cycles": history[-20:] if len(history) > 20 else history
+            "cycles": [
+                cycle.to_dict()
+                for cycle in islice(history, max(0, len(history) - 20), None)
+            ]
         }
 
 
@@ -251,8 +312,8 @@ class TrvStatsSensor(TrvBaseSensor):
             }
         
         # Základní počty
-        valid_cycles = [c for c in history if c.get("valid", False)]
-        invalid_cycles = [c for c in history if not c.get("valid", True)]
+        valid_cycles = [c for c in history if c.valid]
+        invalid_cycles = [c for c in history if not c.valid]
         total = len(history)
         valid_count = len(valid_cycles)
         invalid_count = len(invalid_cycles)
@@ -266,8 +327,8 @@ class TrvStatsSensor(TrvBaseSensor):
         
         # Statistiky z validních cyklů
         if valid_cycles:
-            durations = [c.get("heating_duration", 0) for c in valid_cycles]
-            overshoots = [c.get("overshoot", 0) for c in valid_cycles]
+            durations = [c.heating_duration or 0 for c in valid_cycles]
+            overshoots = [c.overshoot or 0 for c in valid_cycles]
             
             attrs.update({
                 "avg_heating_time": int(sum(durations) / len(durations)),
@@ -280,8 +341,8 @@ class TrvStatsSensor(TrvBaseSensor):
         
         # Časové info
         if history:
-            first = datetime.fromtimestamp(history[0]["timestamp"])
-            last = datetime.fromtimestamp(history[-1]["timestamp"])
+            first = datetime.fromtimestamp(history[0].timestamp)
+            last = datetime.fromtimestamp(history[-1].timestamp)
             days = (last - first).days + 1
             
             attrs.update({
@@ -308,27 +369,30 @@ class TrvDiagnosticsSensor(TrvBaseSensor):
     def native_value(self):
         """Vrací celkový stav (healthy/warning/error)."""
         room = self.coordinator.room
+        snapshot = room.snapshot
         
-        # Zkontrolovat dostupnost komponent
-        temp_state = room._hass.states.get(room._temperature_entity)
-        target_state = room._hass.states.get(room._target_entity)
-        
-        if not temp_state or temp_state.state in ("unknown", "unavailable"):
+        # Zkontrolovat dostupnost komponent (teplota = aspoň jeden zdroj fúze)
+        if snapshot.temperature is None:
             return "error"
-        if not target_state or target_state.state in ("unknown", "unavailable"):
+        if not snapshot.target_sensor.available:
             return "error"
         
         # Zkontrolovat TRV
-        for trv in room._trv_entities:
-            trv_state = room._hass.states.get(trv["entity"])
-            if not trv_state or trv_state.state in ("unknown", "unavailable"):
-                if trv.get("enabled", True):
-                    return "error"
+        for trv in snapshot.trvs:
+            if trv.enabled and not trv.available:
+                return "error"
         
         # Zkontrolovat warnings
+        if room.temperature_fallback_active or any(
+            source["status"] != "ok" for source in room.temperature_contributions.values()
+        ):
+            return "warning"
+        
         history = room.history
         if history:
-            recent_invalid = sum(1 for c in history[-10:] if not c.get("valid", True))
+            recent_invalid = sum(
+                1 for c in islice(history, max(0, len(history) - 10), None) if not c.valid
+            )
             if recent_invalid > 5:
                 return "warning"
         
@@ -338,71 +402,62 @@ class TrvDiagnosticsSensor(TrvBaseSensor):
     def extra_state_attributes(self):
         """Vrací diagnostické atributy."""
         room = self.coordinator.room
-        hass = room._hass
+        snapshot = room.snapshot
+        
+        def _component(entity):
+            return {
+                "entity_id": entity.entity_id,
+                "state": entity.state,
+                "status": "online" if entity.available else "offline",
+                "last_update": entity.last_updated.isoformat() if entity.last_updated else None,
+            }
         
         # === Stav komponent ===
         components = {}
         
         # Temperature sensor
-        temp_state = hass.states.get(room._temperature_entity)
-        if temp_state:
-            components["temperature_sensor"] = {
-                "entity_id": room._temperature_entity,
-                "state": temp_state.state,
-                "status": "online" if temp_state.state not in ("unknown", "unavailable") else "offline",
-                "last_update": temp_state.last_updated.isoformat() if temp_state.last_updated else None,
-            }
+        if snapshot.temperature_sensor.exists:
+            components["temperature_sensor"] = _component(snapshot.temperature_sensor)
+        
+        # Další teplotní zdroje (fúze)
+        contributions = room.temperature_contributions
+        if len(contributions) > 1 or room.temperature_fallback_active:
+            components["temperature_sources"] = contributions
         
         # Target sensor
-        target_state = hass.states.get(room._target_entity)
-        if target_state:
-            components["target_sensor"] = {
-                "entity_id": room._target_entity,
-                "state": target_state.state,
-                "status": "online" if target_state.state not in ("unknown", "unavailable") else "offline",
-                "last_update": target_state.last_updated.isoformat() if target_state.last_updated else None,
-            }
+        if snapshot.target_sensor.exists:
+            components["target_sensor"] = _component(snapshot.target_sensor)
         
-        # Window sensors
-        if room._window_entities:
-            window_data = []
-            for window_entity in room._window_entities:
-                window_state = hass.states.get(window_entity)
-                if window_state:
-                    window_data.append({
-                        "entity_id": window_entity,
-                        "state": window_state.state,
-                        "status": "online" if window_state.state not in ("unknown", "unavailable") else "offline",
-                        "last_update": window_state.last_updated.isoformat() if window_state.last_updated else None,
-                    })
-            if window_data:
-                components["window_sensors"] = window_data
+        # Window sensors (tick je nečte, stav oken drží tracker z událostí)
+        windows = [entity_snapshot(self.hass, entity_id) for entity_id in room.window_entities]
+        window_data = [_component(window) for window in windows if window.exists]
+        if window_data:
+            components["window_sensors"] = window_data
         
         # TRV devices
-        trv_data = []
-        for trv in room._trv_entities:
-            trv_state = hass.states.get(trv["entity"])
-            if trv_state:
-                trv_data.append({
-                    "entity_id": trv["entity"],
-                    "state": trv_state.state,
-                    "current_temp": trv_state.attributes.get("current_temperature"),
-                    "status": "online" if trv_state.state not in ("unknown", "unavailable") else "offline",
-                    "enabled": trv.get("enabled", True),
-                })
-        components["trv_devices"] = trv_data
+        components["trv_devices"] = [
+            {
+                "entity_id": trv.entity_id,
+                "state": trv.state,
+                "current_temp": trv.current_temperature,
+                "status": "online" if trv.available else "offline",
+                "enabled": trv.enabled,
+            }
+            for trv in snapshot.trvs
+            if trv.exists
+        ]
         
         # === Invalidace cyklů ===
         history = room.history
-        invalid_cycles = [c for c in history if not c.get("valid", True)]
+        invalid_cycles = [c for c in history if not c.valid]
         
         invalidation_reasons = {}
         for cycle in invalid_cycles:
-            reason = cycle.get("invalidation_reason", "unknown")
+            reason = cycle.invalidation_reason or "unknown"
             invalidation_reasons[reason] = invalidation_reasons.get(reason, 0) + 1
         
         # POST-VENT cykly (jsou validní, ale nepoužité pro učení)
-        post_vent_count = sum(1 for c in history if c.get("post_vent", False))
+        post_vent_count = sum(1 for c in history if c.post_vent)
         
         cycle_invalidations = {
             "total_invalid_cycles": len(invalid_cycles),
@@ -422,6 +477,10 @@ class TrvDiagnosticsSensor(TrvBaseSensor):
             "components": components,
             "cycle_invalidations": cycle_invalidations,
             "config": config,
+            "watchdog": room.watchdog_status,
+            "window_detection": room.window_detection_stats,
+            "control_benchmark": room.control_benchmark,
+            "short_cycle_guard": room.cycle_guard_stats,
             "current_state": room.state,
         }
 
@@ -486,18 +545,75 @@ class TrvSummarySensor(SensorEntity):
             else:
                 rooms_learned += 1
         
-        return {
+        attrs = {
             "rooms": rooms_data,
             "total_cycles": total_cycles,
             "rooms_learned": rooms_learned,
             "rooms_learning": rooms_learning,
         }
+        
+        # Metriky centrální fronty příkazů
+        command_scheduler = self._hass.data[DOMAIN].get(DATA_COMMAND_SCHEDULER)
+        if command_scheduler is not None:
+            attrs["command_queue"] = command_scheduler.get_metrics()
+
+        # Metriky sdílených odběrů entit
+        subscription_hub = self._hass.data[DOMAIN].get(DATA_SUBSCRIPTION_HUB)
+        if subscription_hub is not None:
+            attrs["subscription_hub"] = subscription_hub.get_metrics()
+        
+        return attrs
 
     async def async_update(self):
         """Update je handled automaticky přes coordinatory."""
         pass
 
 
+class TrvHeatDemandSensor(SensorEntity):
+    """Poptávka tepla celého domu (push z agregátoru, debounced)."""
+
+    _unrecorded_attributes = frozenset({"rooms"})
+
+    def __init__(self, aggregator):
+        """Inicializace senzoru poptávky."""
+        self._aggregator = aggregator
+        self._attr_unique_id = f"{DOMAIN}_heat_demand"
+        self._attr_name = "TRV Regulator Heat Demand"
+        self._attr_icon = "mdi:fire"
+        self._attr_native_unit_of_measurement = "%"
+        self._attr_state_class = "measurement"
+        self._attr_should_poll = False
+        self._attr_has_entity_name = True
+
+    @property
+    def device_info(self):
+        """Informace o zařízení (sdílí summary zařízení)."""
+        return {
+            "identifiers": {(DOMAIN, "summary")},
+            "name": "TRV Regulator Summary",
+            "manufacturer": "Custom",
+            "model": "TRV Regulator Summary",
+            "via_device": None,
+        }
+
+    async def async_added_to_hass(self):
+        """Přihlásit se k aktualizacím agregátoru."""
+        self.async_on_remove(self._aggregator.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def native_value(self):
+        """Poptávka vůči všem místnostem (%)."""
+        return self._aggregator.demand_percent
+
+    @property
+    def extra_state_attributes(self):
+        """Souhrn a poptávka jednotlivých místností."""
+        return {
+            **self._aggregator.get_stats(),
+            "rooms": self._aggregator.room_demands,
+        }
+
+
 class TrvReliabilitySensor(TrvBaseSensor):
     """Aggregate room reliability sensor."""
 
@@ -535,3 +651,30 @@ class TrvReliabilitySensor(TrvBaseSensor):
         """Return state class."""
         return None  # Qualitative value
 
+
+class TrvPerformanceSensor(TrvBaseSensor):
+    """Latence fází update smyčky (diagnostika výkonu)."""
+
+    _unrecorded_attributes = frozenset({"phases"})
+
+    def __init__(self, coordinator, room_name: str, entry_id: str):
+        """Inicializace performance senzoru."""
+        super().__init__(coordinator, room_name, entry_id, "performance")
+        self._attr_name = "Update Latency"
+        self._attr_icon = "mdi:timer-outline"
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_native_unit_of_measurement = "ms"
+
+    @property
+    def native_value(self):
+        """p95 latence celého async_update (ms)."""
+        p95 = self.coordinator.room.phase_latency("async_update", 95)
+        return round(p95, 1) if p95 is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        """Histogramy jednotlivých fází (count, avg, p50/p95/p99, max, slow_calls)."""
+        return {
+            "slow_threshold_ms": PHASE_SLOW_THRESHOLD_MS,
+            "phases": self.coordinator.room.performance_stats,
+        }
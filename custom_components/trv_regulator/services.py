@@ -0,0 +1,346 @@
+"""Služby domény TRV Regulator (registrované jednou pro všechny místnosti)."""
+import asyncio
+import logging
+from typing import Optional
+
+import voluptuous as vol
+from voluptuous.humanize import humanize_error
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse, callback
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers import entity_registry as er
+
+from .const import DOMAIN, DATA_LEARNED_PARAMS_STORE, DATA_ROOM_INDEX
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_RESET_LEARNED_PARAMS = "reset_learned_params"
+SERVICE_EXPORT_LEARNED_PARAMS = "export_learned_params"
+SERVICE_IMPORT_LEARNED_PARAMS = "import_learned_params"
+SERVICE_SNAPSHOT_LEARNED_PARAMS = "snapshot_learned_params"
+
+ATTR_ROOM = "room"
+ATTR_ENTRY_ID = "entry_id"
+ATTR_ALL = "all"
+ATTR_PARAMS = "params"
+ATTR_FROM_SNAPSHOT = "from_snapshot"
+
+# Výběr místností - společný pro všechny služby (seznamy i jednotlivé hodnoty)
+TARGET_SCHEMA = {
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Optional(ATTR_ROOM): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_ALL, default=False): cv.boolean,
+}
+
+TARGET_SERVICE_SCHEMA = vol.Schema(TARGET_SCHEMA)
+
+IMPORT_SERVICE_SCHEMA = vol.Schema(
+    {
+        **TARGET_SCHEMA,
+        vol.Exclusive(ATTR_PARAMS, "source"): {cv.string: dict},
+        vol.Exclusive(ATTR_FROM_SNAPSHOT, "source"): cv.boolean,
+    }
+)
+
+# Naučené parametry jedné místnosti (import) - typy, rozsahy a povinné klíče.
+# Neznámé klíče (jiná verze integrace) se propustí beze změny.
+_NUMBER = vol.Any(int, float)
+_OPTIONAL_NUMBER = vol.Any(None, int, float)
+
+CYCLE_SCHEMA = vol.Schema(
+    {
+        vol.Required("timestamp"): vol.All(_NUMBER, vol.Range(min=0)),
+        vol.Optional("valid"): bool,
+        vol.Optional("post_vent"): bool,
+        **{
+            vol.Optional(field): _OPTIONAL_NUMBER
+            for field in (
+                "start_temp", "target", "planned_duration", "valve_opening",
+                "heating_duration", "stop_temp", "max_temp", "overshoot",
+                "cooldown_duration", "resumed_after",
+            )
+        },
+        **{
+            vol.Optional(field): vol.Any(None, cv.string)
+            for field in ("mode", "cooldown_end", "invalidation_reason")
+        },
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+PERFORMANCE_CYCLE_SCHEMA = vol.Schema(
+    {
+        vol.Required("heating_duration"): vol.All(_NUMBER, vol.Range(min=0, max=86400)),
+        vol.Required("overshoot"): vol.All(_NUMBER, vol.Range(min=-10, max=10)),
+        vol.Optional("timestamp"): vol.Any(None, vol.All(_NUMBER, vol.Range(min=0))),
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+# Živé čítače místnosti (reliability_metrics, statistics, control_benchmark)
+# import ignoruje, proto se ani nevalidují.
+LEARNED_PARAMS_SCHEMA = vol.Schema(
+    {
+        vol.Required("avg_heating_duration"): vol.Any(
+            None, vol.All(_NUMBER, vol.Range(min=0, max=86400))
+        ),
+        vol.Optional("time_offset"): vol.All(_NUMBER, vol.Range(min=-86400, max=86400)),
+        vol.Required("is_learning"): bool,
+        vol.Required("valid_cycles_count"): vol.All(int, vol.Range(min=0)),
+        vol.Optional("last_learned"): vol.Any(None, cv.string),
+        vol.Optional("avg_overshoot"): vol.Any(None, vol.All(_NUMBER, vol.Range(min=-10, max=10))),
+        vol.Required("history"): [CYCLE_SCHEMA],
+        vol.Optional("performance_history"): [PERFORMANCE_CYCLE_SCHEMA],
+        vol.Optional("monthly_stats"): dict,
+        **{
+            vol.Optional(section): vol.Any(None, dict)
+            for section in (
+                "pwm", "cycle_guard", "learning_prior", "learning_confidence",
+                "window_detection",
+            )
+        },
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+# Starý formát entity_id ze služby reset_learned_params (climate.trv_regulator_{room})
+LEGACY_ENTITY_PREFIX = "trv_regulator_"
+
+
+class RoomIndex:
+    """Index RoomControllerů podle názvu místnosti, entry_id a entit (O(1) dotaz).
+
+    Entity integrace se mapují přes entity registry (entity_id → config
+    entry), takže index platí i po přejmenování entity uživatelem.
+    Nakonfigurované entity místnosti (TRV, senzory, okna, last_seen,
+    ventily) se indexují při registraci; sdílená entita vybere všechny
+    místnosti, které ji používají.
+    """
+
+    def __init__(self, hass):
+        """Inicializace indexu."""
+        self._hass = hass
+        self._by_entry: dict = {}  # entry_id → RoomController
+        self._by_name: dict = {}  # room_name → RoomController
+        self._by_config_entity: dict[str, list] = {}  # entity_id → [RoomController]
+
+    def register(self, entry_id: str, room):
+        """Přidat místnost (setup config entry) nebo přeindexovat její entity (options)."""
+        self._drop_config_entities(self._by_entry.get(entry_id))
+        self._by_entry[entry_id] = room
+        self._by_name[room._room_name] = room
+        for entity_id in room.config_entities:
+            self._by_config_entity.setdefault(entity_id, []).append(room)
+
+    def unregister(self, entry_id: str):
+        """Odebrat místnost (unload config entry)."""
+        room = self._by_entry.pop(entry_id, None)
+        if room is not None and self._by_name.get(room._room_name) is room:
+            del self._by_name[room._room_name]
+        self._drop_config_entities(room)
+
+    def _drop_config_entities(self, room):
+        """Odebrat místnost z indexu nakonfigurovaných entit."""
+        if room is None:
+            return
+        for entity_id in list(self._by_config_entity):
+            rooms = [other for other in self._by_config_entity[entity_id] if other is not room]
+            if rooms:
+                self._by_config_entity[entity_id] = rooms
+            else:
+                del self._by_config_entity[entity_id]
+
+    @property
+    def rooms(self) -> list:
+        """Všechny registrované místnosti."""
+        return list(self._by_entry.values())
+
+    def by_name(self, room_name: str):
+        """Místnost podle názvu."""
+        return self._by_name.get(room_name)
+
+    def by_entry(self, entry_id: str):
+        """Místnost podle config entry."""
+        return self._by_entry.get(entry_id)
+
+    def by_entity(self, entity_id: str) -> list:
+        """Místnosti entity (senzor integrace, nakonfigurovaná entita, starý climate formát)."""
+        rooms = self._by_config_entity.get(entity_id)
+        if rooms:
+            return list(rooms)
+
+        entity = er.async_get(self._hass).async_get(entity_id)
+        if entity is not None and entity.config_entry_id is not None:
+            # Doménové entity (summary, poptávka tepla) patří první místnosti - přeskočit
+            if (entity.unique_id or "").startswith(f"{DOMAIN}_{entity.config_entry_id}_"):
+                room = self._by_entry.get(entity.config_entry_id)
+                return [room] if room is not None else []
+            return []
+
+        object_id = entity_id.split(".")[-1]
+        if object_id.startswith(LEGACY_ENTITY_PREFIX):
+            room = self._by_name.get(object_id[len(LEGACY_ENTITY_PREFIX):])
+            return [room] if room is not None else []
+        return []
+
+    def resolve(self, data: dict, default_all: bool) -> Optional[list]:
+        """Místnosti vybrané v datech služby (None = nic nevybráno ani nenalezeno)."""
+        if data.get(ATTR_ALL):
+            return self.rooms
+
+        selectors = (
+            [(self.by_entity, value) for value in data.get(ATTR_ENTITY_ID, [])]
+            + [(self._single(self.by_name), value) for value in data.get(ATTR_ROOM, [])]
+            + [(self._single(self.by_entry), value) for value in data.get(ATTR_ENTRY_ID, [])]
+        )
+        if not selectors:
+            return self.rooms if default_all else None
+
+        rooms = {}
+        for lookup, value in selectors:
+            found = lookup(value)
+            if not found:
+                _LOGGER.error(f"TRV Regulator: Room for '{value}' not found")
+                continue
+            rooms.update((id(room), room) for room in found)
+        return list(rooms.values()) or None
+
+    @staticmethod
+    def _single(lookup):
+        """Dotaz vracející jednu místnost → seznam (jako `by_entity`)."""
+        def _lookup(value):
+            room = lookup(value)
+            return [room] if room is not None else []
+        return _lookup
+
+
+@callback
+def async_setup_services(hass: HomeAssistant):
+    """Registrovat služby domény (jednou v async_setup)."""
+    room_index: RoomIndex = hass.data[DOMAIN][DATA_ROOM_INDEX]
+    store = hass.data[DOMAIN][DATA_LEARNED_PARAMS_STORE]
+
+    async def handle_reset_learned_params(call: ServiceCall):
+        """Resetovat naučené parametry vybraných místností (jeden zápis)."""
+        rooms = room_index.resolve(call.data, default_all=False)
+        if not rooms:
+            _LOGGER.error("reset_learned_params: room, entity_id, entry_id or all required")
+            return
+
+        async with store.async_batch():
+            await asyncio.gather(*(room.reset_learned_params() for room in rooms))
+
+        _LOGGER.info(
+            f"TRV Regulator: Learned parameters manually reset via service "
+            f"({', '.join(room._room_name for room in rooms)})"
+        )
+
+    async def handle_export_learned_params(call: ServiceCall) -> dict:
+        """Vrátit naučené parametry vybraných (výchozí všech) místností."""
+        rooms = room_index.resolve(call.data, default_all=True) or []
+        return {
+            "rooms": {room._room_name: room.export_learned_params() for room in rooms}
+        }
+
+    async def handle_import_learned_params(call: ServiceCall):
+        """Převzít naučené parametry z dat služby nebo ze zálohy (jeden zápis).
+
+        Nejdřív se zvaliduje celý payload (všechny vybrané místnosti), teprve
+        pak se data převezmou a uloží - chybná místnost neimportuje nic.
+        """
+        if call.data.get(ATTR_FROM_SNAPSHOT):
+            params = (await store.async_read_snapshot()).get("rooms", {})
+        else:
+            params = call.data.get(ATTR_PARAMS, {})
+        if not params:
+            _LOGGER.error("import_learned_params: params or from_snapshot required")
+            return
+
+        rooms = room_index.resolve(call.data, default_all=True) or []
+        rooms = [room for room in rooms if room._room_name in params]
+        unknown = set(params) - {room._room_name for room in room_index.rooms}
+        if unknown:
+            _LOGGER.warning(
+                f"import_learned_params: unknown room(s) skipped: {', '.join(sorted(unknown))}"
+            )
+        if not rooms:
+            _LOGGER.error("import_learned_params: no matching room to import")
+            return
+
+        validated = {}
+        errors = []
+        for room in rooms:
+            room_params = params[room._room_name]
+            try:
+                validated[room._room_name] = LEARNED_PARAMS_SCHEMA(room_params)
+            except vol.Invalid as err:
+                errors.append(f"{room._room_name}: {humanize_error(room_params, err)}")
+        if errors:
+            raise ServiceValidationError(
+                f"import_learned_params: invalid params, nothing imported ({'; '.join(errors)})"
+            )
+
+        # Převzít všechny místnosti; při chybě vrátit už převzaté do původního stavu
+        backups = {}
+        try:
+            for room in rooms:
+                backups[room._room_name] = (room, room.export_learned_params())
+                room.import_learned_params(validated[room._room_name])
+        except Exception as err:
+            for room, backup in backups.values():
+                room.import_learned_params(backup)
+            raise ServiceValidationError(
+                f"import_learned_params: failed to apply params, nothing imported ({err})"
+            ) from err
+
+        async with store.async_batch():
+            await asyncio.gather(*(room.async_save_learned_params() for room in rooms))
+        _LOGGER.info(
+            f"TRV Regulator: Learned parameters imported "
+            f"({', '.join(room._room_name for room in rooms)})"
+        )
+
+    async def handle_snapshot_learned_params(call: ServiceCall) -> dict:
+        """Zálohovat naučené parametry vybraných (výchozí všech) místností."""
+        rooms = room_index.resolve(call.data, default_all=True) or []
+        snapshot_rooms = (await store.async_read_snapshot()).get("rooms", {})
+        snapshot_rooms.update(
+            {room._room_name: room.export_learned_params() for room in rooms}
+        )
+        snapshot = await store.async_write_snapshot(snapshot_rooms)
+
+        _LOGGER.info(f"TRV Regulator: Learned parameters snapshot saved ({len(rooms)} room(s))")
+        return {
+            "created": snapshot["created"],
+            "rooms": sorted(room._room_name for room in rooms),
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RESET_LEARNED_PARAMS,
+        handle_reset_learned_params,
+        schema=TARGET_SERVICE_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_LEARNED_PARAMS,
+        handle_export_learned_params,
+        schema=TARGET_SERVICE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_IMPORT_LEARNED_PARAMS,
+        handle_import_learned_params,
+        schema=IMPORT_SERVICE_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SNAPSHOT_LEARNED_PARAMS,
+        handle_snapshot_learned_params,
+        schema=TARGET_SERVICE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
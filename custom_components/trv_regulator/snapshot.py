@@ -0,0 +1,140 @@
+"""Neměnný snapshot stavů entit místnosti pro jeden tick řídicí smyčky."""
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+UNAVAILABLE_STATES = ("unavailable", "unknown")
+
+
+@dataclass(frozen=True)
+class EntitySnapshot:
+    """Stav jedné entity v okamžiku snapshotu."""
+
+    entity_id: str
+    state: Optional[str]  # None = entita v HA neexistuje
+    last_updated: Optional[datetime]
+
+    @property
+    def exists(self) -> bool:
+        """Zda entita v HA existuje."""
+        return self.state is not None
+
+    @property
+    def available(self) -> bool:
+        """Zda entita existuje a má platný stav."""
+        return self.state is not None and self.state not in UNAVAILABLE_STATES
+
+
+@dataclass(frozen=True)
+class TrvSnapshot(EntitySnapshot):
+    """Stav TRV hlavice (setpoint a teplota už naparsované)."""
+
+    enabled: bool
+    setpoint: Optional[float]
+    current_temperature: Optional[float]
+    last_seen: Optional[str]  # None = bez last_seen senzoru nebo nedostupný
+
+
+@dataclass(frozen=True)
+class RoomSnapshot:
+    """Všechny stavy, které řídicí smyčka a senzory v jednom ticku potřebují."""
+
+    taken_at: float
+    temperature_sensor: EntitySnapshot
+    temperature: Optional[float]  # controller nahradí fúzí všech teplotních zdrojů
+    target_sensor: EntitySnapshot
+    target: Optional[float]
+    windows: tuple[EntitySnapshot, ...]  # prázdné, pokud window_open dodal tracker
+    window_open: bool
+    trvs: tuple[TrvSnapshot, ...]
+
+    def trv(self, entity_id: str) -> Optional[TrvSnapshot]:
+        """Snapshot konkrétní TRV."""
+        for trv in self.trvs:
+            if trv.entity_id == entity_id:
+                return trv
+        return None
+
+
+def entity_snapshot(hass, entity_id: str) -> EntitySnapshot:
+    """Snapshot jedné entity."""
+    state = hass.states.get(entity_id)
+    if state is None:
+        return EntitySnapshot(entity_id, None, None)
+    return EntitySnapshot(entity_id, state.state, state.last_updated)
+
+
+def _parse_float(entity: EntitySnapshot, room_name: str, label: str) -> Optional[float]:
+    """Naparsovat stav entity na float (None pokud nedostupný/neplatný)."""
+    if not entity.available:
+        return None
+    try:
+        return float(entity.state)
+    except ValueError:
+        _LOGGER.error(f"TRV [{room_name}]: Invalid {label} value: {entity.state}")
+        return None
+
+
+def _trv(hass, trv_config: dict) -> TrvSnapshot:
+    """Snapshot jedné TRV včetně last_seen."""
+    entity_id = trv_config["entity"]
+    state = hass.states.get(entity_id)
+
+    last_seen = None
+    last_seen_sensor = trv_config.get("last_seen_sensor")
+    if last_seen_sensor:
+        sensor_state = hass.states.get(last_seen_sensor)
+        if sensor_state and sensor_state.state not in UNAVAILABLE_STATES:
+            last_seen = sensor_state.state
+
+    if state is None:
+        return TrvSnapshot(
+            entity_id, None, None, trv_config.get("enabled", True), None, None, last_seen
+        )
+
+    return TrvSnapshot(
+        entity_id,
+        state.state,
+        state.last_updated,
+        trv_config.get("enabled", True),
+        state.attributes.get("temperature"),
+        state.attributes.get("current_temperature"),
+        last_seen,
+    )
+
+
+def build_room_snapshot(
+    hass,
+    room_name: str,
+    temperature_entity: str,
+    target_entity: str,
+    window_entities: list[str],
+    trv_entities: list[dict],
+    window_open: Optional[bool] = None,
+) -> RoomSnapshot:
+    """Jednou načíst všechny relevantní stavy z HA state machine.
+
+    `window_open` lze předat z trackeru kontaktů (udržovaný z událostí),
+    pak se stavy oken v ticku vůbec nečtou. Jinak se spočítá ze stavů oken.
+    """
+    temperature_sensor = entity_snapshot(hass, temperature_entity)
+    target_sensor = entity_snapshot(hass, target_entity)
+    windows: tuple[EntitySnapshot, ...] = ()
+    if window_open is None:
+        windows = tuple(entity_snapshot(hass, entity_id) for entity_id in window_entities)
+        window_open = any(window.state == "on" for window in windows)
+
+    return RoomSnapshot(
+        taken_at=time.time(),
+        temperature_sensor=temperature_sensor,
+        temperature=_parse_float(temperature_sensor, room_name, "temperature"),
+        target_sensor=target_sensor,
+        target=_parse_float(target_sensor, room_name, "target"),
+        windows=windows,
+        window_open=window_open,
+        trvs=tuple(_trv(hass, trv_config) for trv_config in trv_entities),
+    )
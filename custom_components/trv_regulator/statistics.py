@@ -0,0 +1,316 @@
+"""Dlouhodobé statistiky (HA long-term statistics) z dokončených cyklů."""
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from homeassistant.util import slugify
+
+from .const import DOMAIN, STATISTICS_KEEP_HOURS
+from .cycles import CycleRecord
+
+_LOGGER = logging.getLogger(__name__)
+
+# Klíče statistik (statistic_id = trv_regulator:{room}_{klíč})
+STAT_HEATING_DUTY = "heating_duty"
+STAT_OVERSHOOT = "overshoot"
+STAT_CYCLES = "cycles"
+STAT_TRV_COMMANDS = "trv_commands"
+
+
+def _split_hours(start: float, end: float):
+    """Rozdělit interval na hodinové úseky (hour_ts, sekundy)."""
+    t = start
+    while t < end:
+        hour = int(t // 3600) * 3600
+        segment_end = min(end, hour + 3600)
+        yield hour, segment_end - t
+        t = segment_end
+
+
+class CycleStatistics:
+    """Agreguje cykly do hodinových external statistics.
+
+    Hodinové buckety (UTC) drží dobu topení, překmit, počet cyklů a počet
+    příkazů pro TRV. Po každém cyklu (i přerušeném) se přepočítané hodiny
+    importují do Recorderu přes `async_add_external_statistics` - import
+    je upsert, takže opakovaný import stejné hodiny jen přepíše řádek.
+    Hodiny bez cyklu se po skončení importují s nulovým duty, aby
+    dlouhodobý průměr nebyl nadsazený.
+    """
+
+    def __init__(self, hass, room_name: str):
+        """Inicializace agregátoru."""
+        self._hass = hass
+        self._room_name = room_name
+        self._object_id = slugify(room_name)
+
+        # hour_ts -> bucket
+        self._hours: dict[int, dict] = {}
+
+        # Kumulativní součty pro sum statistiky
+        self._cycles_total = 0
+        self._commands_total = 0
+        self._last_commands_sent = None
+
+        # Začátek první neuzavřené hodiny (hodiny před ní jsou naimportované)
+        self._closed_until: Optional[int] = None
+
+    def statistic_id(self, key: str) -> str:
+        """Vrátí statistic_id pro daný klíč."""
+        return f"{DOMAIN}:{self._object_id}_{key}"
+
+    def _bucket(self, hour: int) -> dict:
+        """Vrátí (případně založí) hodinový bucket."""
+        bucket = self._hours.get(hour)
+        if bucket is None:
+            bucket = {
+                "heating_seconds": 0.0,
+                "overshoot_sum": 0.0,
+                "overshoot_count": 0,
+                "overshoot_min": None,
+                "overshoot_max": None,
+                "cycles": 0,
+                "commands": 0,
+            }
+            self._hours[hour] = bucket
+        return bucket
+
+    def sync_commands_baseline(self, commands_sent_total: int):
+        """Nastavit výchozí hodnotu čítače příkazů (po prvním načtení)."""
+        if self._last_commands_sent is None:
+            self._last_commands_sent = commands_sent_total
+
+    def record_cycle(
+        self,
+        cycle: CycleRecord,
+        commands_sent_total: int,
+        finished_at: Optional[float] = None,
+    ):
+        """Započítat cyklus (dokončený i přerušený) a naimportovat dotčené hodiny."""
+        if finished_at is None:
+            finished_at = time.time()
+        touched = set()
+
+        # Doba topení se rozdělí do hodin, přes které cyklus topil
+        start = cycle.timestamp
+        duration = cycle.heating_duration or 0
+        if start is not None and duration > 0:
+            for hour, seconds in _split_hours(float(start), float(start) + duration):
+                self._bucket(hour)["heating_seconds"] += seconds
+                touched.add(hour)
+
+        # Počet cyklů a překmit patří do hodiny dokončení
+        hour = int(finished_at // 3600) * 3600
+        bucket = self._bucket(hour)
+        touched.add(hour)
+
+        bucket["cycles"] += 1
+        self._cycles_total += 1
+
+        # Překmit jen z validních cyklů (okno/změna cíle ho zkreslí)
+        overshoot = cycle.overshoot
+        if cycle.valid and overshoot is not None:
+            bucket["overshoot_sum"] += overshoot
+            bucket["overshoot_count"] += 1
+            if bucket["overshoot_min"] is None or overshoot < bucket["overshoot_min"]:
+                bucket["overshoot_min"] = overshoot
+            if bucket["overshoot_max"] is None or overshoot > bucket["overshoot_max"]:
+                bucket["overshoot_max"] = overshoot
+
+        # Příkazy se rozdělí do hodin cyklu (od startu do dokončení) podle času
+        if self._last_commands_sent is not None:
+            delta = max(0, commands_sent_total - self._last_commands_sent)
+            self._commands_total += delta
+            span_start = float(start) if start is not None else finished_at
+            touched.update(self._split_commands(delta, span_start, finished_at))
+        self._last_commands_sent = commands_sent_total
+
+        self._cleanup(finished_at)
+        self._import_hours(min(touched), max(self._hours), finished_at)
+
+    def _split_commands(self, delta: int, start: float, end: float) -> set:
+        """Rozdělit počet příkazů do hodin intervalu úměrně času (celá čísla)."""
+        if delta <= 0:
+            return set()
+        span = end - start
+        if span <= 0:
+            hour = int(end // 3600) * 3600
+            self._bucket(hour)["commands"] += delta
+            return {hour}
+
+        touched = set()
+        elapsed = 0.0
+        allocated = 0
+        for hour, seconds in _split_hours(start, end):
+            elapsed += seconds
+            share = round(delta * elapsed / span) - allocated
+            allocated += share
+            self._bucket(hour)["commands"] += share
+            touched.add(hour)
+        return touched
+
+    def close_idle_hours(self, now: float, active_since: Optional[float] = None):
+        """Naimportovat skončené hodiny bez cyklu (nulový duty).
+
+        Hodiny od začátku rozběhnutého cyklu (`active_since`) se neuzavírají -
+        naimportuje je až record_cycle s jejich skutečnou dobou topení.
+        """
+        limit = int(now // 3600) * 3600
+        if active_since is not None:
+            limit = min(limit, int(active_since // 3600) * 3600)
+        if self._closed_until is None:
+            self._closed_until = limit
+            return
+        if limit <= self._closed_until:
+            return
+        self._import_hours(self._closed_until, limit - 3600, now)
+        self._closed_until = limit
+
+    def _import_hours(self, first_hour: int, last_hour: int, now: float):
+        """Doplnit prázdné hodiny a naimportovat hodiny first_hour..last_hour.
+
+        Sum řádky jsou kumulativní, takže změna starší hodiny mění i
+        všechny pozdější - volající proto importuje až po poslední hodinu.
+        """
+        first_hour = max(
+            first_hour, int(now // 3600) * 3600 - STATISTICS_KEEP_HOURS * 3600
+        )
+        hours = list(range(first_hour, last_hour + 1, 3600))
+        for hour in hours:
+            self._bucket(hour)
+        self._async_import(hours)
+
+    def _cleanup(self, now: float):
+        """Zahodit buckety starší než STATISTICS_KEEP_HOURS."""
+        cutoff = now - STATISTICS_KEEP_HOURS * 3600
+        for hour in [h for h in self._hours if h < cutoff]:
+            del self._hours[hour]
+
+    def _running_sums(self, key: str) -> dict[int, float]:
+        """Kumulativní součet `key` na konci každé hodiny (pro sum statistiky)."""
+        total = self._cycles_total if key == "cycles" else self._commands_total
+        sums = {}
+        for hour in sorted(self._hours, reverse=True):
+            sums[hour] = total
+            total -= self._hours[hour][key]
+        return sums
+
+    def _async_import(self, hours: list[int]):
+        """Naimportovat hodinové řádky do Recorderu."""
+        if not hours or "recorder" not in self._hass.config.components:
+            return
+
+        from homeassistant.components.recorder.models import (
+            StatisticData,
+            StatisticMetaData,
+        )
+        from homeassistant.components.recorder.statistics import (
+            async_add_external_statistics,
+        )
+
+        try:
+            from homeassistant.components.recorder.models import StatisticMeanType
+        except ImportError:  # HA < 2025.6 - jen has_mean
+            StatisticMeanType = None
+
+        def _start(hour: int) -> datetime:
+            return datetime.fromtimestamp(hour, tz=timezone.utc)
+
+        cycles_sums = self._running_sums("cycles")
+        commands_sums = self._running_sums("commands")
+
+        duty_rows = []
+        overshoot_rows = []
+        cycles_rows = []
+        commands_rows = []
+
+        for hour in hours:
+            bucket = self._hours[hour]
+            duty = round(min(100.0, bucket["heating_seconds"] / 36), 1)
+            duty_rows.append(
+                StatisticData(start=_start(hour), mean=duty, min=duty, max=duty)
+            )
+            if bucket["overshoot_count"]:
+                overshoot_rows.append(
+                    StatisticData(
+                        start=_start(hour),
+                        mean=round(bucket["overshoot_sum"] / bucket["overshoot_count"], 3),
+                        min=round(bucket["overshoot_min"], 3),
+                        max=round(bucket["overshoot_max"], 3),
+                    )
+                )
+            cycles_rows.append(
+                StatisticData(
+                    start=_start(hour), state=bucket["cycles"], sum=cycles_sums[hour]
+                )
+            )
+            commands_rows.append(
+                StatisticData(
+                    start=_start(hour), state=bucket["commands"], sum=commands_sums[hour]
+                )
+            )
+
+        series = (
+            (STAT_HEATING_DUTY, "Heating duty", "%", True, False, duty_rows),
+            (STAT_OVERSHOOT, "Overshoot", "°C", True, False, overshoot_rows),
+            (STAT_CYCLES, "Cycles", None, False, True, cycles_rows),
+            (STAT_TRV_COMMANDS, "TRV commands", None, False, True, commands_rows),
+        )
+
+        for key, name, unit, has_mean, has_sum, rows in series:
+            if not rows:
+                continue
+            if StatisticMeanType is not None:
+                mean = {
+                    "mean_type": (
+                        StatisticMeanType.ARITHMETIC if has_mean else StatisticMeanType.NONE
+                    )
+                }
+            else:
+                mean = {"has_mean": has_mean}
+            metadata = StatisticMetaData(
+                **mean,
+                has_sum=has_sum,
+                name=f"TRV Regulator {self._room_name} {name}",
+                source=DOMAIN,
+                statistic_id=self.statistic_id(key),
+                unit_of_measurement=unit,
+            )
+            try:
+                async_add_external_statistics(self._hass, metadata, rows)
+            except Exception as e:
+                _LOGGER.warning(
+                    f"TRV [{self._room_name}]: Failed to import statistics {key}: {e}"
+                )
+                return
+
+        _LOGGER.debug(
+            f"TRV [{self._room_name}]: Imported long-term statistics for {len(hours)} hour(s)"
+        )
+
+    def to_dict(self) -> dict:
+        """Serializace pro JSON."""
+        return {
+            "hours": {str(hour): bucket for hour, bucket in self._hours.items()},
+            "cycles_total": self._cycles_total,
+            "commands_total": self._commands_total,
+            "last_commands_sent": self._last_commands_sent,
+            "closed_until": self._closed_until,
+        }
+
+    @classmethod
+    def from_dict(cls, hass, room_name: str, data: Optional[dict]):
+        """Deserializace z JSON."""
+        stats = cls(hass, room_name)
+        if not data:
+            return stats
+
+        stats._hours = {
+            int(hour): bucket for hour, bucket in data.get("hours", {}).items()
+        }
+        stats._cycles_total = data.get("cycles_total", 0)
+        stats._commands_total = data.get("commands_total", 0)
+        stats._last_commands_sent = data.get("last_commands_sent")
+        stats._closed_until = data.get("closed_until")
+        return stats
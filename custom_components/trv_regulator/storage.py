@@ -0,0 +1,168 @@
+"""Sdílená úložiště místností (naučené parametry, běhový stav) - JSON soubory."""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from homeassistant.util.json import load_json
+
+from .const import STORAGE_DIR, STORAGE_FILE, STORAGE_SNAPSHOT_FILE, STORAGE_RUNTIME_FILE
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _write_json(path: str, content: str):
+    """Zapsat už serializovaný JSON do souboru (běží v executoru).
+
+    Serializace (`json.dumps`) běží v event loopu - data místností se tam
+    mění, v executoru by se četla rozpracovaná. Zápis do dočasného souboru
+    a `os.replace` - pád uprostřed zápisu nenechá poškozený soubor (čtení
+    by ho zahodilo jako prázdná data).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RoomDataStore:
+    """Jeden soubor pro doménu (klíč = místnost), data v paměti, serializované zápisy.
+
+    Soubor se načte jednou, místnosti mění jen svůj klíč v paměti a zápis
+    celého souboru je chráněný zámkem. V `async_batch()` se zápisy odkládají
+    na jeden flush na konci (hromadné operace přes víc místností).
+    """
+
+    def __init__(self, hass, filename: str):
+        """Inicializace úložiště."""
+        self._hass = hass
+        self._path = os.path.join(hass.config.path(STORAGE_DIR), filename)
+        self._data: Optional[dict] = None
+        self._load_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._writes = 0
+
+    async def async_load(self) -> dict:
+        """Načíst soubor (jen poprvé, dál se vrací data z paměti)."""
+        async with self._load_lock:
+            if self._data is None:
+                self._data = await self._async_read(self._path)
+        return self._data
+
+    async def _async_read(self, path: str) -> dict:
+        """Načíst JSON soubor v executoru (chybějící/poškozený = prázdná data)."""
+        if not os.path.exists(path):
+            return {}
+        try:
+            data = await self._hass.async_add_executor_job(load_json, path)
+        except Exception as e:
+            _LOGGER.warning(f"TRV Regulator: Failed to read storage {path}: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    async def async_get_room(self, room_name: str) -> Optional[dict]:
+        """Uložená data místnosti (None = místnost ještě nic neuložila)."""
+        data = await self.async_load()
+        return data.get(room_name)
+
+    async def async_remove_room(self, room_name: str):
+        """Smazat data místnosti."""
+        data = await self.async_load()
+        if data.pop(room_name, None) is not None:
+            self._dirty = True
+            if self._batch_depth == 0:
+                await self.async_flush()
+
+    async def async_save_room(self, room_name: str, room_data: dict):
+        """Uložit data místnosti (v dávce až při flushi na jejím konci)."""
+        data = await self.async_load()
+        data[room_name] = room_data
+        self._dirty = True
+        if self._batch_depth == 0:
+            await self.async_flush()
+
+    @asynccontextmanager
+    async def async_batch(self):
+        """Odložit zápisy do souboru na jeden flush na konci bloku."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                await self.async_flush()
+
+    async def async_flush(self):
+        """Zapsat data z paměti do souboru (pokud se od posledního zápisu změnila)."""
+        async with self._write_lock:
+            if not self._dirty or self._data is None:
+                return
+            self._dirty = False
+            try:
+                content = json.dumps(self._data, indent=2)
+                await self._hass.async_add_executor_job(_write_json, self._path, content)
+                self._writes += 1
+            except Exception as e:
+                self._dirty = True
+                _LOGGER.error(f"TRV Regulator: Failed to save {self._path}: {e}")
+
+    def get_metrics(self) -> dict:
+        """Metriky úložiště pro diagnostiku."""
+        return {
+            "rooms": len(self._data) if self._data is not None else None,
+            "writes": self._writes,
+            "pending": self._dirty,
+            "batching": self._batch_depth > 0,
+        }
+
+
+class LearnedParamsStore(RoomDataStore):
+    """Naučené parametry všech místností + záloha přes službu.
+
+    Dřív každá místnost při uložení celý soubor načetla, upravila svůj klíč
+    a zapsala zpět - souběžná uložení si mohla přepsat data.
+    """
+
+    def __init__(self, hass):
+        """Inicializace úložiště."""
+        super().__init__(hass, STORAGE_FILE)
+        self._snapshot_path = os.path.join(
+            hass.config.path(STORAGE_DIR), STORAGE_SNAPSHOT_FILE
+        )
+
+    async def async_write_snapshot(self, rooms: dict) -> dict:
+        """Uložit zálohu naučených parametrů (přepíše předchozí zálohu)."""
+        snapshot = {"created": time.time(), "rooms": rooms}
+        await self._hass.async_add_executor_job(
+            _write_json, self._snapshot_path, json.dumps(snapshot, indent=2)
+        )
+        return snapshot
+
+    async def async_read_snapshot(self) -> dict:
+        """Načíst poslední zálohu (prázdný dict = žádná záloha)."""
+        return await self._async_read(self._snapshot_path)
+
+
+class RuntimeStateStore(RoomDataStore):
+    """Běhový stav stavových automatů místností (warm restart).
+
+    Malý soubor oddělený od naučených parametrů - zapisuje se při každém
+    přechodu stavu, takže nesmí tahat historii cyklů.
+    """
+
+    def __init__(self, hass):
+        """Inicializace úložiště."""
+        super().__init__(hass, STORAGE_RUNTIME_FILE)
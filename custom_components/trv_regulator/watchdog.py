@@ -0,0 +1,177 @@
+"""Watchdog TRV - backoff korekcí a circuit breaker pro každou hlavici."""
+import logging
+import time
+from typing import Optional
+
+from .const import (
+    WATCHDOG_BACKOFF_BASE,
+    WATCHDOG_BACKOFF_MAX,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_OPEN_TIMEOUT,
+    BREAKER_OPEN_TIMEOUT_MAX,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class TrvCircuitBreaker:
+    """Stav watchdogu pro jednu TRV.
+
+    CLOSED    - normální provoz, korekce s exponenciálním backoffem
+    OPEN      - TRV opakovaně neodpovídá, watchdog ji nechává být
+    HALF_OPEN - po vypršení OPEN (nebo změně last_seen) jeden zkušební pokus
+    """
+
+    def __init__(self, entity_id: str):
+        """Inicializace breakeru."""
+        self.entity_id = entity_id
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.consecutive_corrections = 0
+        self.next_attempt = 0.0
+        self.open_timeout = BREAKER_OPEN_TIMEOUT
+        self.opened_at: Optional[float] = None
+        self.last_seen_at_open: Optional[str] = None
+
+    def allow_attempt(self, now: float, last_seen: Optional[str] = None) -> bool:
+        """Zda smí watchdog teď TRV zkontrolovat/opravit."""
+        if self.state == BREAKER_OPEN:
+            # Hlavice se sama ozvala (last_seen změněn) → zkusit hned
+            recovered = (
+                last_seen is not None
+                and self.last_seen_at_open is not None
+                and last_seen != self.last_seen_at_open
+            )
+            if not recovered and now < self.next_attempt:
+                return False
+            self.state = BREAKER_HALF_OPEN
+            self.next_attempt = 0.0
+
+        return now >= self.next_attempt
+
+    def record_correction(self, now: float):
+        """Watchdog odeslal korekci - naplánovat další pokus s backoffem."""
+        self.consecutive_corrections += 1
+        backoff = WATCHDOG_BACKOFF_BASE * 2 ** (self.consecutive_corrections - 1)
+        self.next_attempt = now + min(backoff, WATCHDOG_BACKOFF_MAX)
+
+    def record_in_sync(self) -> bool:
+        """TRV má očekávaný setpoint - vynulovat backoff.
+
+        Úspěšná kontrola v HALF_OPEN breaker zavře. Vrací True pokud se
+        breaker právě zavřel.
+        """
+        self.consecutive_corrections = 0
+        self.next_attempt = 0.0
+        if self.state == BREAKER_HALF_OPEN:
+            return self.record_response()
+        self.consecutive_failures = 0
+        return False
+
+    def record_response(self) -> bool:
+        """TRV odpověděla. Vrací True pokud se breaker právě zavřel."""
+        was_open = self.state != BREAKER_CLOSED
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.open_timeout = BREAKER_OPEN_TIMEOUT
+        self.opened_at = None
+        self.last_seen_at_open = None
+        return was_open
+
+    def record_no_response(self, now: float, last_seen: Optional[str] = None) -> bool:
+        """TRV neodpověděla. Vrací True pokud se breaker právě otevřel."""
+        self.consecutive_failures += 1
+
+        if self.state == BREAKER_HALF_OPEN:
+            # Zkušební pokus selhal → znovu OPEN s delším timeoutem
+            self.open_timeout = min(self.open_timeout * 2, BREAKER_OPEN_TIMEOUT_MAX)
+        elif self.consecutive_failures < BREAKER_FAILURE_THRESHOLD:
+            return False
+
+        self.state = BREAKER_OPEN
+        self.opened_at = now
+        self.next_attempt = now + self.open_timeout
+        self.last_seen_at_open = last_seen
+        return True
+
+    def as_dict(self, now: float) -> dict:
+        """Stav pro atributy senzorů."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "consecutive_corrections": self.consecutive_corrections,
+            "retry_in": max(0, int(self.next_attempt - now)),
+        }
+
+
+class TrvWatchdog:
+    """Circuit breakery pro všechny TRV v místnosti."""
+
+    def __init__(self, room_name: str):
+        """Inicializace watchdogu."""
+        self._room_name = room_name
+        self._breakers: dict[str, TrvCircuitBreaker] = {}
+
+    def breaker(self, entity_id: str) -> TrvCircuitBreaker:
+        """Vrátí (případně založí) breaker pro TRV."""
+        breaker = self._breakers.get(entity_id)
+        if breaker is None:
+            breaker = TrvCircuitBreaker(entity_id)
+            self._breakers[entity_id] = breaker
+        return breaker
+
+    def allow_attempt(self, entity_id: str, last_seen: Optional[str] = None) -> bool:
+        """Zda smí watchdog teď TRV kontrolovat."""
+        breaker = self.breaker(entity_id)
+        previous = breaker.state
+        allowed = breaker.allow_attempt(time.time(), last_seen)
+        if previous == BREAKER_OPEN and breaker.state == BREAKER_HALF_OPEN:
+            _LOGGER.info(
+                f"Watchdog [{self._room_name}]: {entity_id} circuit HALF-OPEN, probing"
+            )
+        return allowed
+
+    def record_correction(self, entity_id: str):
+        """Zaznamenat odeslanou korekci."""
+        self.breaker(entity_id).record_correction(time.time())
+
+    def is_open(self, entity_id: str) -> bool:
+        """Zda je breaker TRV otevřený (příkazy se jí neposílají)."""
+        breaker = self._breakers.get(entity_id)
+        return breaker is not None and breaker.state == BREAKER_OPEN
+
+    def record_in_sync(self, entity_id: str):
+        """Zaznamenat že TRV má očekávaný setpoint."""
+        if self.breaker(entity_id).record_in_sync():
+            _LOGGER.info(
+                f"Watchdog [{self._room_name}]: {entity_id} back in sync, circuit CLOSED"
+            )
+
+    def record_response(self, entity_id: str):
+        """Zaznamenat odpověď TRV (last_seen změněn)."""
+        if self.breaker(entity_id).record_response():
+            _LOGGER.info(
+                f"Watchdog [{self._room_name}]: {entity_id} responded, circuit CLOSED"
+            )
+
+    def record_no_response(self, entity_id: str, last_seen: Optional[str] = None):
+        """Zaznamenat že TRV neodpověděla (no_response, bez last_seen i přetrvávající mismatch)."""
+        breaker = self.breaker(entity_id)
+        if breaker.record_no_response(time.time(), last_seen):
+            _LOGGER.warning(
+                f"Watchdog [{self._room_name}]: {entity_id} circuit OPEN after "
+                f"{breaker.consecutive_failures} failure(s), next probe in "
+                f"{breaker.open_timeout}s"
+            )
+
+    def get_status(self) -> dict:
+        """Stav všech breakerů."""
+        now = time.time()
+        return {
+            entity_id: breaker.as_dict(now)
+            for entity_id, breaker in self._breakers.items()
+        }
@@ -0,0 +1,260 @@
+"""Detekce otevřeného okna z prudkého poklesu teploty (bez okenních kontaktů)."""
+import logging
+import math
+from typing import Optional
+
+from .const import (
+    WINDOW_DETECT_WINDOW,
+    WINDOW_DETECT_MIN_SAMPLES,
+    WINDOW_DETECT_MIN_SPAN,
+    WINDOW_DETECT_MIN_RATE,
+    WINDOW_DETECT_MIN_DROP,
+    WINDOW_DETECT_SIGMA,
+    WINDOW_DETECT_BASELINE_ALPHA,
+    WINDOW_DETECT_BASELINE_MIN_SAMPLES,
+    WINDOW_DETECT_CLOSE_RATE,
+    WINDOW_DETECT_MIN_OPEN,
+    WINDOW_DETECT_MAX_OPEN,
+    WINDOW_DETECT_FP_DROP,
+    WINDOW_DETECT_LATENCY_BUCKETS,
+    WINDOW_DETECT_HISTOGRAM_WINDOW,
+)
+from .filters import SlopeEstimator
+from .perf import LatencyHistogram
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TemperatureWindowDetector:
+    """Odhad otevřeného okna ze sklonu teploty.
+
+    Okno je "otevřené", když sklon přes WINDOW_DETECT_WINDOW klesne pod
+    naučenou baseline (EWMA průměr - SIGMA × odchylka, nejvýš -MIN_RATE)
+    a teplota zároveň spadla o MIN_DROP pod maximum okna. "Zavře" se,
+    jakmile se pokles zmírní, nejpozději po WINDOW_DETECT_MAX_OPEN.
+
+    active=False je stínový režim pro místnosti s kontakty: detekce neřídí
+    VENT, jen se porovnává s kontakty (zásahy, falešné poplachy, latence).
+    """
+
+    def __init__(self, room_name: str, active: bool):
+        """Inicializace detektoru."""
+        self._room_name = room_name
+        self._active = active
+        self._estimator = SlopeEstimator(WINDOW_DETECT_WINDOW)
+
+        # Naučená baseline sklonu (°C/h) mimo detekované epizody
+        self._baseline_mean = 0.0
+        self._baseline_var = 0.0
+        self._baseline_samples = 0
+
+        # Probíhající epizoda
+        self._detected_at: Optional[float] = None
+        self._onset_at: Optional[float] = None
+        self._episode_start_temp: Optional[float] = None
+        self._episode_min_temp: Optional[float] = None
+
+        # Stínový režim - probíhající otevření kontaktu
+        self._contact_opened_at: Optional[float] = None
+        self._contact_detected = False
+
+        # Statistiky
+        self._detections = 0
+        self._false_positives = 0
+        self._true_positives = 0
+        self._missed = 0
+        self._last_detection: Optional[float] = None
+        self._latency = LatencyHistogram(
+            WINDOW_DETECT_LATENCY_BUCKETS, WINDOW_DETECT_HISTOGRAM_WINDOW
+        )
+
+    @property
+    def active(self) -> bool:
+        """Zda detekce řídí VENT (False = jen stínové statistiky)."""
+        return self._active
+
+    @property
+    def is_open(self) -> bool:
+        """Zda je okno podle teploty otevřené."""
+        return self._detected_at is not None
+
+    @property
+    def opened_at(self) -> Optional[float]:
+        """Odhad okamžiku otevření (začátek poklesu), None pokud zavřeno."""
+        return self._onset_at if self._detected_at is not None else None
+
+    def threshold(self) -> float:
+        """Aktuální práh sklonu pro detekci (°C/h, záporný)."""
+        threshold = -WINDOW_DETECT_MIN_RATE
+        if self._baseline_samples >= WINDOW_DETECT_BASELINE_MIN_SAMPLES:
+            learned = self._baseline_mean - WINDOW_DETECT_SIGMA * math.sqrt(self._baseline_var)
+            threshold = min(threshold, learned)
+        return threshold
+
+    def add_sample(
+        self, value: float, timestamp: float, contact_opened_at: Optional[float] = None
+    ) -> bool:
+        """Zpracovat vzorek teploty. Vrací True, pokud se změnil stav detekce.
+
+        contact_opened_at = čas otevření kontaktu (jen stínový režim, None = zavřeno).
+        """
+        if not self._active:
+            self._track_contact(contact_opened_at, timestamp)
+
+        if not self._estimator.add(value, timestamp):
+            return False
+
+        slope = self._estimator.slope
+        ready = (
+            slope is not None
+            and self._estimator.count >= WINDOW_DETECT_MIN_SAMPLES
+            and self._estimator.span >= WINDOW_DETECT_MIN_SPAN
+        )
+        if not ready:
+            return False
+
+        if self._detected_at is None:
+            if slope <= self.threshold():
+                peak = self._estimator.maximum()
+                if peak is not None and peak[1] - value >= WINDOW_DETECT_MIN_DROP:
+                    self._open_episode(timestamp, peak, value, slope, contact_opened_at)
+                    return True
+            self._update_baseline(slope)
+            return False
+
+        self._episode_min_temp = min(self._episode_min_temp, value)
+        open_for = timestamp - self._detected_at
+        if open_for >= WINDOW_DETECT_MAX_OPEN or (
+            open_for >= WINDOW_DETECT_MIN_OPEN and slope > -WINDOW_DETECT_CLOSE_RATE
+        ):
+            self._close_episode(timestamp, slope)
+            return True
+        return False
+
+    def _update_baseline(self, slope: float):
+        """EWMA průměru a rozptylu sklonu (mimo epizody)."""
+        if self._baseline_samples == 0:
+            self._baseline_mean = slope
+        else:
+            delta = slope - self._baseline_mean
+            self._baseline_mean += WINDOW_DETECT_BASELINE_ALPHA * delta
+            self._baseline_var = (1 - WINDOW_DETECT_BASELINE_ALPHA) * (
+                self._baseline_var + WINDOW_DETECT_BASELINE_ALPHA * delta * delta
+            )
+        self._baseline_samples += 1
+
+    def _open_episode(
+        self,
+        timestamp: float,
+        peak: tuple[float, float],
+        value: float,
+        slope: float,
+        contact_opened_at: Optional[float],
+    ):
+        """Okno detekováno."""
+        self._detected_at = timestamp
+        self._onset_at = peak[0]
+        self._episode_start_temp = peak[1]
+        self._episode_min_temp = value
+        self._detections += 1
+        self._last_detection = timestamp
+
+        if self._active:
+            # Bez kontaktu je nejlepší odhad začátku poslední maximum před poklesem
+            self._latency.add(timestamp - self._onset_at)
+        elif contact_opened_at is not None:
+            self._true_positives += 1
+            self._contact_detected = True
+            self._latency.add(max(0.0, timestamp - contact_opened_at))
+        else:
+            self._false_positives += 1
+
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: Open window detected from temperature drop "
+            f"(slope={slope:.2f}°C/h, threshold={self.threshold():.2f}°C/h, "
+            f"drop={peak[1] - value:.2f}°C{'' if self._active else ', shadow mode'})"
+        )
+
+    def _close_episode(self, timestamp: float, slope: float):
+        """Konec detekované epizody."""
+        drop = self._episode_start_temp - self._episode_min_temp
+        if self._active and drop < WINDOW_DETECT_FP_DROP:
+            self._false_positives += 1
+
+        _LOGGER.info(
+            f"TRV [{self._room_name}]: Detected window considered closed after "
+            f"{timestamp - self._detected_at:.0f}s (slope={slope:.2f}°C/h, total drop={drop:.2f}°C)"
+        )
+
+        self._detected_at = None
+        self._onset_at = None
+        self._episode_start_temp = None
+        self._episode_min_temp = None
+        # Vzorky z epizody nesmí hned spustit další detekci
+        self._estimator.reset()
+
+    def _track_contact(self, contact_opened_at: Optional[float], timestamp: float):
+        """Stínový režim: započítat otevření kontaktu, které detekce minula."""
+        if contact_opened_at is not None and self._contact_opened_at is None:
+            self._contact_opened_at = contact_opened_at
+            self._contact_detected = self._detected_at is not None
+        elif contact_opened_at is None and self._contact_opened_at is not None:
+            # Krátká otevření (pod rozsah regrese) detekce zachytit nemůže
+            if not self._contact_detected and timestamp - self._contact_opened_at >= WINDOW_DETECT_MIN_SPAN:
+                self._missed += 1
+            self._contact_opened_at = None
+            self._contact_detected = False
+
+    def get_stats(self) -> dict:
+        """Statistiky detekce pro senzory a diagnostiku."""
+        stats = {
+            "mode": "active" if self._active else "shadow",
+            "is_open": self.is_open,
+            "threshold": round(self.threshold(), 2),
+            "baseline_slope": round(self._baseline_mean, 2),
+            "baseline_samples": self._baseline_samples,
+            "detections": self._detections,
+            "false_positives": self._false_positives,
+            "detection_latency": self._latency.summary(digits=0),
+            "last_detection": self._last_detection,
+        }
+        if not self._active:
+            stats["true_positives"] = self._true_positives
+            stats["missed"] = self._missed
+        return stats
+
+    def to_dict(self) -> dict:
+        """Serializace baseline a statistik."""
+        return {
+            "baseline_mean": self._baseline_mean,
+            "baseline_var": self._baseline_var,
+            "baseline_samples": self._baseline_samples,
+            "detections": self._detections,
+            "false_positives": self._false_positives,
+            "true_positives": self._true_positives,
+            "missed": self._missed,
+            "last_detection": self._last_detection,
+            "latency": self._latency.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, room_name: str, active: bool, data: Optional[dict]) -> "TemperatureWindowDetector":
+        """Obnovit detektor z persistence."""
+        detector = cls(room_name, active)
+        if not data:
+            return detector
+
+        detector._baseline_mean = data.get("baseline_mean", 0.0)
+        detector._baseline_var = data.get("baseline_var", 0.0)
+        detector._baseline_samples = data.get("baseline_samples", 0)
+        detector._detections = data.get("detections", 0)
+        detector._false_positives = data.get("false_positives", 0)
+        detector._true_positives = data.get("true_positives", 0)
+        detector._missed = data.get("missed", 0)
+        detector._last_detection = data.get("last_detection")
+        detector._latency = LatencyHistogram.from_dict(
+            WINDOW_DETECT_LATENCY_BUCKETS,
+            WINDOW_DETECT_HISTOGRAM_WINDOW,
+            data.get("latency"),
+        )
+        return detector
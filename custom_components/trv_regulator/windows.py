@@ -0,0 +1,142 @@
+"""Agregace okenních/dveřních kontaktů místnosti udržovaná z událostí."""
+import logging
+import time
+from typing import Callable, Optional
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+
+from .hub import EntityChange, EntitySubscriptionHub
+
+_LOGGER = logging.getLogger(__name__)
+
+# Přesah plánovaného vyhodnocení za window_open_delay (float zaokrouhlení timeru)
+WINDOW_DELAY_GRACE = 0.05
+
+
+class WindowContactTracker:
+    """Množina otevřených kontaktů udržovaná ze state-change událostí.
+
+    Dotaz "je něco otevřené" stojí O(1) bez ohledu na počet kontaktů.
+    Při prvním otevření se zapamatuje čas a naplánuje se vyhodnocení
+    přesně po `window_open_delay`, místo čekání na další 30s poll.
+    """
+
+    def __init__(
+        self,
+        hass,
+        hub: EntitySubscriptionHub,
+        room_name: str,
+        entity_ids: list[str],
+        open_delay: float,
+        on_delay_expired: Optional[Callable[[], None]] = None,
+    ):
+        """Inicializace trackeru."""
+        self._hass = hass
+        self._hub = hub
+        self._room_name = room_name
+        self._entity_ids = list(entity_ids)
+        self._open_delay = open_delay
+        self._on_delay_expired = on_delay_expired
+
+        self._open: set[str] = set()
+        self._opened_at: Optional[float] = None
+        self._unsub_state = None
+        self._unsub_timer = None
+
+    @property
+    def is_open(self) -> bool:
+        """Zda je otevřený alespoň jeden kontakt."""
+        return bool(self._open)
+
+    @property
+    def open_count(self) -> int:
+        """Počet otevřených kontaktů."""
+        return len(self._open)
+
+    @property
+    def opened_at(self) -> Optional[float]:
+        """Čas prvního otevření (None pokud je vše zavřené)."""
+        return self._opened_at
+
+    def async_start(self):
+        """Načíst výchozí stav a začít poslouchat události."""
+        now = time.time()
+        for entity_id in self._entity_ids:
+            state = self._hass.states.get(entity_id)
+            if state is not None and state.state == "on":
+                self._open.add(entity_id)
+
+        if self._open:
+            # Skutečný čas otevření neznáme - nejstarší last_changed je nejlepší odhad
+            self._opened_at = min(
+                (self._hass.states.get(e).last_changed.timestamp() for e in self._open),
+                default=now,
+            )
+            self._schedule_delay_check()
+
+        if self._entity_ids:
+            self._unsub_state = self._hub.async_subscribe(
+                self._entity_ids, self._async_contact_changed
+            )
+
+    def async_stop(self):
+        """Přestat poslouchat a zrušit naplánované vyhodnocení."""
+        if self._unsub_state is not None:
+            self._unsub_state()
+            self._unsub_state = None
+        self._cancel_timer()
+
+    def set_open_delay(self, open_delay: float):
+        """Změnit window_open_delay (přeplánuje běžící odpočet)."""
+        self._open_delay = open_delay
+        if self._open:
+            self._schedule_delay_check()
+
+    @callback
+    def _async_contact_changed(self, change: EntityChange):
+        """Aktualizovat množinu otevřených kontaktů."""
+        entity_id = change.entity_id
+        is_open = change.is_on
+
+        was_open = bool(self._open)
+        if is_open:
+            self._open.add(entity_id)
+        else:
+            self._open.discard(entity_id)
+
+        if self._open and not was_open:
+            self._opened_at = time.time()
+            self._schedule_delay_check()
+        elif was_open and not self._open:
+            self._opened_at = None
+            self._cancel_timer()
+
+    def _schedule_delay_check(self):
+        """Naplánovat vyhodnocení na okamžik vypršení window_open_delay."""
+        self._cancel_timer()
+        if self._opened_at is None or self._on_delay_expired is None:
+            return
+
+        remaining = self._opened_at + self._open_delay - time.time()
+        self._unsub_timer = async_call_later(
+            self._hass, max(0.0, remaining) + WINDOW_DELAY_GRACE, self._async_delay_expired
+        )
+
+    @callback
+    def _async_delay_expired(self, _now):
+        """window_open_delay vypršel - vyžádat vyhodnocení."""
+        self._unsub_timer = None
+        if not self._open:
+            return
+        _LOGGER.debug(
+            f"TRV [{self._room_name}]: Window open delay expired "
+            f"({self.open_count} contact(s) open), requesting evaluation"
+        )
+        self._on_delay_expired()
+
+    def _cancel_timer(self):
+        """Zrušit naplánované vyhodnocení."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None